@@ -2,6 +2,8 @@
 ASGI config for Grand_Slams project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+With an ASGI server (e.g. ``uvicorn Grand_Slams.asgi:application``) the async views, like /api/dashboard/,
+run in the event loop of the server instead of a thread for each request.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
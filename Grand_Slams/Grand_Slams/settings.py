@@ -43,13 +43,42 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
 ]
 
+# FastJSONRenderer (tennis/renderers.py) encodes the responses with orjson when it is installed, with the
+# JSONRenderer of DRF otherwise
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
-    ]
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'tennis.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# MetricsMiddleware keeps the last TENNIS_METRICS_WINDOW requests of each url for the percentiles of /api/_metrics/,
+# and logs the requests slower than TENNIS_SLOW_REQUEST_MS (None to disable it) with their TENNIS_SLOW_REQUEST_QUERIES
+# slowest queries, in a single record
+TENNIS_METRICS_WINDOW = 1000
+TENNIS_SLOW_REQUEST_MS = 500
+TENNIS_SLOW_REQUEST_QUERIES = 10
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'tennis.slow_requests': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
+# number of players in each page of /api/players/list/ and /api/players/by-letter/ (changed with ?page_size=)
+TENNIS_PAGE_SIZE = 50
+
 MIDDLEWARE = [
+    'tennis.middleware.MetricsMiddleware',
+    'tennis.cache.TableVersionsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,6 +107,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'Grand_Slams.wsgi.application'
+ASGI_APPLICATION = 'Grand_Slams.asgi.application'
 
 
 # Database
@@ -91,6 +121,64 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# The 'tennis' cache stores the responses of the analytics endpoints (tennis/cache.py). TENNIS_CACHE_BACKEND is
+# 'locmem' (one cache in each process) or 'file' (one cache shared by all the processes, so a response computed by
+# a worker is reused by the others). The versions of the tables are in the database, so with both of them a change
+# made by a worker invalidates the responses of every worker. Both evict the least recently used entries when
+# MAX_ENTRIES is reached.
+
+TENNIS_CACHE_BACKEND = os.environ.get('TENNIS_CACHE_BACKEND', 'locmem')
+
+TENNIS_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tennis',
+    },
+    'file': {
+        'BACKEND': 'tennis.cache_backends.LRUFileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'tennis': {
+        **TENNIS_CACHE_BACKENDS[TENNIS_CACHE_BACKEND],
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+
+
+# Engine of the leaderboards (most aces, wins by country, performance by hand): 'sql' or 'numpy' for the
+# in-memory columnar engine of tennis/columnar.py. 'numpy' needs NumPy installed, without it the SQL queries are used
+TENNIS_ANALYTICS_ENGINE = os.environ.get('TENNIS_ANALYTICS_ENGINE', 'sql')
+
+# /api/dashboard/ (tennis/dashboard.py): threads that run the sections at the same time and seconds the view waits
+# for each section before returning it with the status 'timeout'
+TENNIS_DASHBOARD_WORKERS = 4
+TENNIS_DASHBOARD_TIMEOUT = 2.0
+
+# maximum number of requests in a POST to /api/batch/ (tennis/batch.py)
+TENNIS_BATCH_MAX_REQUESTS = 20
+
+# ids of the new players reserved at a time by each process (tennis/sequences.py)
+TENNIS_ID_BLOCK_SIZE = 20
+
+# maximum number of players in a POST to /api/players/bulk/ (tennis/bulk.py)
+TENNIS_BULK_MAX_ROWS = 1000
+
+# Elo ratings (tennis/ratings.py) on each surface, besides the overall ones
+TENNIS_ELO_SURFACES = True
+
+# snapshot of the columns written by the export_snapshot command, mapped by every worker when it starts
+TENNIS_SNAPSHOT_PATH = os.environ.get('TENNIS_SNAPSHOT_PATH', os.path.join(BASE_DIR, 'snapshot', 'tennis.columns'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
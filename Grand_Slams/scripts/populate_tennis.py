@@ -3,13 +3,14 @@ Some reference: https://python.plainenglish.io/importing-csv-data-into-django-mo
 Each script read the csv file located in the data folder and it creates a new object using Django's ORM where each field
 correspond to the model's fields. It also uses helper functions for parsing dates and convert NULL or None string values
 to python None type values.
+Run it with --bulk to load the files with the bulk loader in tennis/loader.py (batched bulk_create, one transaction
+per file), which is much faster than creating one object per row.
 '''
 
 import os
 import sys
 import django
 import csv
-from datetime import datetime
 
 # Add the project directory to the sys.path
 sys.path.append("/home/veronica/Documents/AWD/files/Grand_Slams")
@@ -20,18 +21,15 @@ django.setup()
 
 # Import the models after setting up Django
 from tennis.models import *
+from tennis.csv_parsing import parse_date, nullify
 
 data_folder = '/home/veronica/Documents/AWD/files/Grand_Slams/data'
 
-# Helper function to parse dates
-def parse_date(date_str):
-    return datetime.strptime(date_str, '%Y%m%d').date()
-
-# Helper function to convert 'NULL' or 'None' strings to python NoneType
-def nullify(value):
-    if value == 'NULL' or value == 'None' or value == '':
-        return None
-    return value
+# bulk mode: the loader prints the rows per second of each table
+if '--bulk' in sys.argv:
+    from tennis.loader import bulk_load
+    bulk_load(data_folder)
+    sys.exit()
 
 
 # Load Tournament.csv
@@ -33,7 +33,11 @@ class MatchesAdmin(admin.ModelAdmin):
                     'score', 
                     'best_of', 
                     'round', 
-                    'minutes')
+                    'minutes',
+                    'num_sets',
+                    'retired',
+                    'walkover',
+                    'straight_sets')
 
 
 class MatchStatsAdmin(admin.ModelAdmin):
@@ -47,7 +51,8 @@ class MatchStatsAdmin(admin.ModelAdmin):
                    'secondWon', 
                    'SvGms', 
                    'bpSaved', 
-                   'bpFaced')
+                   'bpFaced',
+                   'player_role')
 
 
 class PlayerMatchAdmin(admin.ModelAdmin):
@@ -0,0 +1,251 @@
+'''
+Tables derived from the data (e.g. the number of players for each letter), built with grouped queries and
+then kept up to date when the data changes, so the API can read them instead of recomputing them on every request.
+Some reference: https://docs.djangoproject.com/en/4.2/topics/db/aggregation/
+https://docs.djangoproject.com/en/4.2/ref/models/expressions/#f-expressions
+'''
+
+import string
+from collections import Counter
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Left, Upper
+from .models import (Players, Matches, PlayerMatch, MatchStats, PlayerLetterCount, PlayerCareerStats, MatchSets,
+                     HeadToHead)
+from .ratings import update_ratings, rated_matches, match_order
+from .scores import parse_score
+from . import sequences
+
+LETTERS = string.ascii_uppercase
+
+
+# it returns the letter of the grid a name belongs to, or None if the name doesn't start with a letter from A to Z.
+# Like the LIKE 'X%' filter in SQLite, the first letter is not case sensitive
+def first_letter(name):
+    letter = (name or '')[:1].upper()
+    return letter if letter and letter in LETTERS else None
+
+# it counts the players for each letter with a single grouped query and it stores the counts, letters without
+# players included, so the table always has 26 rows
+def rebuild_letter_counts():
+    grouped = (Players.objects.annotate(letter=Upper(Left('player_name', 1)))
+               .values('letter').annotate(count=Count('player_id')))
+    counts = {row['letter']: row['count'] for row in grouped}
+    with transaction.atomic():
+        PlayerLetterCount.objects.all().delete()
+        PlayerLetterCount.objects.bulk_create(
+            [PlayerLetterCount(letter=letter, count=counts.get(letter, 0)) for letter in LETTERS])
+
+# it moves the players from the letters of their old names to the letters of the new ones, with one UPDATE for each
+# letter changed. changes are (old_name, new_name) pairs: old_name is None when a player is added and new_name is None
+# when a player is deleted. It has to be called in the same transaction as the change of the players
+def change_letter_counts(changes):
+    deltas = Counter()
+    for old_name, new_name in changes:
+        old_letter = first_letter(old_name)
+        new_letter = first_letter(new_name)
+        if old_letter == new_letter:
+            continue
+        if old_letter:
+            deltas[old_letter] -= 1
+        if new_letter:
+            deltas[new_letter] += 1
+    for letter, delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        updated = PlayerLetterCount.objects.filter(letter=letter).update(count=F('count') + delta)
+        if not updated and delta > 0:
+            PlayerLetterCount.objects.create(letter=letter, count=delta)
+
+# it moves a player from the letter of the old name to the letter of the new one
+def update_letter_counts(old_name=None, new_name=None):
+    change_letter_counts([(old_name, new_name)])
+
+# it returns the count of players for each letter from A to Z, reading the table (filled by the migrations, the
+# loader and the ingest command, never by a request). A letter without a row counts 0
+def letter_counts():
+    counts = dict(PlayerLetterCount.objects.order_by('letter').values_list('letter', 'count'))
+    return [{'letter': letter, 'count': counts.get(letter, 0)} for letter in LETTERS]
+
+# it links the MatchStats rows to their PlayerMatch row (same match, same role) with a single UPDATE.
+# Only the rows not linked yet are updated, of the given matches or of all the matches when match_ids is None.
+# The role is set from the suffix of match_stats_id for the rows written without it
+def link_match_stats(match_ids=None):
+    stats = MatchStats.objects.filter(player_match_id__isnull=True)
+    if match_ids is not None:
+        stats = stats.filter(match_id__in=match_ids)
+    stats.filter(player_role__isnull=True, match_stats_id__endswith='-w').update(player_role='winner')
+    stats.filter(player_role__isnull=True, match_stats_id__endswith='-l').update(player_role='loser')
+    player_match = PlayerMatch.objects.filter(match_id=OuterRef('match_id'), player_role=OuterRef('player_role'))
+    stats.filter(player_role__isnull=False).update(player_match_id=Subquery(player_match.values('id')[:1]))
+
+# it computes the career totals of the given players (of all the players when player_ids is None) with two
+# grouped queries: one for the matches won and lost and one for the stats of each match, joined to the
+# player through the player_match_id foreign key
+def career_totals(player_ids=None):
+    players = Players.objects.all()
+    matches = PlayerMatch.objects.values('player_id').annotate(
+        played=Count('id'),
+        wins=Count('id', filter=Q(player_role='winner')),
+        losses=Count('id', filter=Q(player_role='loser')))
+    stats = MatchStats.objects.filter(player_match_id__isnull=False).values(
+        player=F('player_match_id__player_id')).annotate(
+        aces=Sum('ace'),
+        double_faults=Sum('df'),
+        serve_points=Sum('svpt'))
+    if player_ids is not None:
+        players = players.filter(player_id__in=player_ids)
+        matches = matches.filter(player_id__in=player_ids)
+        stats = stats.filter(player_match_id__player_id__in=player_ids)
+
+    matches = {row['player_id']: row for row in matches}
+    stats = {row['player']: row for row in stats}
+    totals = []
+    for player_id in players.values_list('player_id', flat=True):
+        played = matches.get(player_id, {})
+        served = stats.get(player_id, {})
+        totals.append(PlayerCareerStats(
+            player_id_id=player_id,
+            aces=served.get('aces') or 0,
+            double_faults=served.get('double_faults') or 0,
+            serve_points=served.get('serve_points') or 0,
+            matches=played.get('played', 0),
+            wins=played.get('wins', 0),
+            losses=played.get('losses', 0)))
+    return totals
+
+# it rebuilds the career stats of the given players, or of all the players when player_ids is None.
+# The players are processed in groups, so the IN lists stay small when many matches are ingested
+def update_career_stats(player_ids=None, group_size=500):
+    with transaction.atomic():
+        if player_ids is None:
+            link_match_stats()
+            PlayerCareerStats.objects.all().delete()
+            PlayerCareerStats.objects.bulk_create(career_totals(), batch_size=500)
+            return
+        player_ids = sorted(player_ids)
+        for i in range(0, len(player_ids), group_size):
+            group = player_ids[i:i + group_size]
+            PlayerCareerStats.objects.filter(player_id__in=group).delete()
+            PlayerCareerStats.objects.bulk_create(career_totals(group), batch_size=500)
+
+# it returns the players with the most aces, reading the career stats table (filled by the migrations, the loader,
+# the ingest command and build_career_stats, never by a request). Players with the same aces are ordered by
+# player_id (descending, the order of the aces index), so the result doesn't depend on the query plan
+def most_aces(limit=10):
+    return list(PlayerCareerStats.objects.order_by('-aces', '-player_id').values(
+        player_name=F('player_id__player_name'), total_aces=F('aces'))[:limit])
+
+# it returns the MatchSets rows of the given (match_id, score, best_of) rows
+def match_sets(matches):
+    return [MatchSets(match_id_id=match_id, **played)
+            for match_id, score, best_of in matches for played in parse_score(score, best_of)['sets']]
+
+# it rebuilds the sets (MatchSets) of the given matches, or of all the matches when match_ids is None,
+# parsing the score of each match. The matches are read in groups (after the last match_id of the previous group
+# for a full rebuild), so the memory used doesn't grow with the number of matches
+def update_match_sets(match_ids=None, group_size=500):
+    fields = ('match_id', 'score', 'best_of')
+    with transaction.atomic():
+        if match_ids is not None:
+            match_ids = sorted(match_ids)
+            for i in range(0, len(match_ids), group_size):
+                group = match_ids[i:i + group_size]
+                MatchSets.objects.filter(match_id__in=group).delete()
+                MatchSets.objects.bulk_create(match_sets(Matches.objects.filter(match_id__in=group)
+                                                         .values_list(*fields)), batch_size=500)
+            return
+        MatchSets.objects.all().delete()
+        last = ''
+        while True:
+            group = list(Matches.objects.filter(match_id__gt=last).order_by('match_id').values_list(*fields)[:group_size])
+            if not group:
+                break
+            MatchSets.objects.bulk_create(match_sets(group), batch_size=500)
+            last = group[-1][0]
+
+# it returns the primary key of the head-to-head of two players, the same in both orders
+def pair_key(player, opponent):
+    return '-'.join(str(player_id) for player_id in sorted((player, opponent)))
+
+# it returns the HeadToHead rows of the matches, given in the order they were played (ratings.rated_matches)
+def head_to_head_rows(matches):
+    rows = {}
+    for match in matches:
+        a, b = sorted((match['winner'], match['loser']))
+        row = rows.get((a, b))
+        if row is None:
+            row = rows[(a, b)] = HeadToHead(pair=pair_key(a, b), player_a_id=a, player_b_id=b, surfaces={})
+        if match['winner'] == a:
+            row.player_a_wins += 1
+        else:
+            row.player_b_wins += 1
+        surface = match['tourney_id__surface']
+        if surface:
+            row.surfaces[surface] = row.surfaces.get(surface, 0) + 1
+        row.last_match_id = match['match_id']
+        row.last_date = match['tourney_id__tourney_date']
+        row.last_winner_id = match['winner']
+    return list(rows.values())
+
+# it rebuilds the head-to-head of all the pairs of players
+def rebuild_head_to_head():
+    with transaction.atomic():
+        HeadToHead.objects.all().delete()
+        HeadToHead.objects.bulk_create(head_to_head_rows(rated_matches()), batch_size=500)
+
+# it rebuilds the head-to-head of the pairs of players of the given matches (new or changed matches ingested),
+# counting all the matches between them again, so a match ingested twice is not counted twice
+def update_head_to_head(match_ids, group_size=500):
+    match_ids = sorted(match_ids)
+    pairs = set()
+    for i in range(0, len(match_ids), group_size):
+        pairs.update(tuple(sorted((match['winner'], match['loser'])))
+                     for match in rated_matches(match_ids[i:i + group_size]))
+    if not pairs:
+        return
+    # the matches of the players of those pairs, then only the ones between the two players of a pair
+    player_ids = sorted({player_id for pair in pairs for player_id in pair})
+    played = set()
+    for i in range(0, len(player_ids), group_size):
+        played.update(PlayerMatch.objects.filter(player_id__in=player_ids[i:i + group_size])
+                      .values_list('match_id', flat=True))
+    played = sorted(played)
+    matches = []
+    for i in range(0, len(played), group_size):
+        matches.extend(match for match in rated_matches(played[i:i + group_size])
+                       if tuple(sorted((match['winner'], match['loser']))) in pairs)
+    matches.sort(key=match_order)
+    rows = head_to_head_rows(matches)
+    with transaction.atomic():
+        HeadToHead.objects.bulk_create(rows, batch_size=500, update_conflicts=True, unique_fields=['pair'],
+                                       update_fields=['player_a_wins', 'player_b_wins', 'surfaces', 'last_match',
+                                                      'last_date', 'last_winner'])
+
+# it refreshes the tables derived from a model after a file of that model has been loaded or ingested.
+# rows are the converted csv rows written (None after a full load, when the tables are rebuilt)
+def refresh_after_load(model_name, rows=None):
+    if model_name == 'Players':
+        rebuild_letter_counts()
+        # the ids of the files can be after the ids reserved by the allocator
+        sequences.player_ids.sync()
+    elif model_name == 'Matches':
+        update_match_sets(None if rows is None else [row['match_id'] for row in rows])
+    elif model_name in ('PlayerMatch', 'MatchStats'):
+        # the stats are linked to the players by the second of the two files written
+        if rows is None:
+            update_career_stats()
+            if model_name == 'PlayerMatch':
+                update_ratings()
+                rebuild_head_to_head()
+            return
+        match_ids = sorted({row['match_id_id'] for row in rows})
+        player_ids = set()
+        for i in range(0, len(match_ids), 500):
+            group = match_ids[i:i + 500]
+            link_match_stats(group)
+            player_ids.update(PlayerMatch.objects.filter(match_id__in=group).values_list('player_id', flat=True))
+        update_career_stats(player_ids)
+        if model_name == 'PlayerMatch':
+            update_ratings(match_ids)
+            update_head_to_head(match_ids)
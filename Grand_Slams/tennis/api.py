@@ -1,14 +1,36 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, parser_classes
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Sum, Case, When, IntegerField
+from django.db.models import Sum, Case, When, IntegerField, Count, F, Q
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
 from django.db.models.functions import Left
 from .models import *
 from .serializers import *
+from .aggregates import letter_counts, update_letter_counts, pair_key
+from .cache import cached_view, cache_stats
+from .pagination import keyset_page, get_limit, name_prefix
+from .ratings import OVERALL, top_ratings, rating_history
+from .middleware import metrics, prometheus_text
+from .search import player_index
+from .bulk import bulk_save_players
+from .parsers import NDJSONParser
+from .dashboard import top_aces, country_wins, hand_performance
 
+# name and id of a player row of PlayerRowSerializer, for the cursor of the pages
+PLAYER_CURSOR = PlayerRowSerializer.getter('player_name', 'player_id')
+
+'''
+The GET requests that only read the data are decorated with cached_view (tennis/cache.py), with the models they read:
+their response is cached until one of those tables changes, so repeated requests don't run the queries again, and
+it has ETag and Last-Modified headers, so a client that already has the data gets a 304 Not Modified
+'''
 # get request to return the tournament's names without duplicates
 #similar to SELECT DISTINCT in SQL
 @api_view(['GET'])
+@cached_view(Tournament)
 def tournaments(request):
     data = list(Tournament.objects.values('tourney_name').distinct())
     return Response(data)
@@ -16,77 +38,159 @@ def tournaments(request):
 '''
 players and players_by_letter GET requests work together in showing the list of players selected by letters
 '''
-# this GET request iterates through all trhe letters in the alphabet, including Z (+ 1) and it returns the numbers of 
-# recors who's name is starting with each letter of the alphabet in JSON format
+# this GET request returns the numbers of records whose name is starting with each letter of the alphabet in JSON format.
+# The counts are read from the PlayerLetterCount table (26 rows), which is updated every time a player is added,
+# updated or deleted, so the request doesn't count the players table
 @api_view(['GET'])
+@cached_view(Players)
 def players(request):
-    letters = []
-    for letter in range(ord('A'), ord('Z') + 1):
-        letters.append({'letter': chr(letter), 'count': Players.objects.filter(player_name__startswith=chr(letter)).count()})
-    return Response(letters)
+    return Response(letter_counts())
 
-# it retrieves a list of names starting with the selected letter, calling the PlayerSerialzer or displaying a message if any players are found
-# PlayerSerializer used to convert the model instance 'players' in dictionaries.
+# it retrieves a page of the names starting with the selected letter, calling the PlayerRowSerializer or displaying a message if any players are found
+# PlayerRowSerializer converts the rows read with values_list in dictionaries, with the same fields as PlayerSerializer.
+# The names from the letter to the next one are read as ranges (player_name >= 'A' AND player_name < 'B', and the same for
+# 'a', as the letter counts don't depend on the case), so the index on player_name is used. The pages follow each other with the cursor in the 'next' link, ?page_size= changes the size of the pages.
+# The hand and the country of the players are read from the reference cache (tennis/references.py), without a join
 @api_view(['GET'])
+@cached_view(Players, Hand, Country)
 def players_by_letter(request, letter):
-    players = Players.objects.filter(player_name__startswith=letter.upper())
-    if not players.exists():
-        return Response({'message': f"There aren't any players with names starting with the letter {letter.upper()}"})
-    serializer = PlayerSerializer(players, many=True)
-    return Response(serializer.data)
+    players = Players.objects.filter(name_prefix(letter))
+    letter = letter.upper()
+    page, next_link = keyset_page(PlayerRowSerializer.values(players), request, PLAYER_CURSOR)
+    if not page and 'cursor' not in request.query_params:
+        return Response({'message': f"There aren't any players with names starting with the letter {letter}"})
+    return Response({'results': PlayerRowSerializer.serialize(page), 'next': next_link})
+
+# GET request to list all the players in pages, ordered by name, with the same pagination of players_by_letter
+@api_view(['GET'])
+@cached_view(Players, Hand, Country)
+def players_list(request):
+    page, next_link = keyset_page(PlayerRowSerializer.values(Players.objects.all()), request, PLAYER_CURSOR)
+    return Response({'results': PlayerRowSerializer.serialize(page), 'next': next_link})
 
 # GET request to retrieve the tournament's years without duplicates.
 @api_view(['GET'])
+@cached_view(Tournament)
 def years(request):
     data = list(Tournament.objects.annotate(year=Left('tourney_date', 4)).values('year').distinct().order_by('year'))
     return Response(data)
 
 
-# Some Reference: https://stackoverflow.com/questions/68557002/using-djangos-case-when-queryset-conditions-to-set-more-than-one-value
-# https://forum.djangoproject.com/t/using-case-when-value-with-annotate-on-related-object/15355
-# in this GET request, the total number of aces are returned only when the conditions of the player role in the PlayerMatch and 
-# the match_stats_id ending with the corresponding letter (w for winner and l for loser) are met. This ensure that for each match, 
-#only aces of the same player (either for matches won or lost) are summed.
+# in this GET request, the total number of aces of each player is read from the PlayerCareerStats table, where the aces are summed
+# from the MatchStats rows linked to the player's PlayerMatch rows (the -w row for the winner and the -l row for the loser).
+# This ensure that for each match, only aces of the same player (either for matches won or lost) are summed.
+# The table is updated when matches are ingested, so the request is an indexed ORDER BY ... LIMIT
 @api_view(['GET'])
+@cached_view(Players, PlayerMatch, MatchStats)
 def players_with_most_aces(request):
-    players = Players.objects.annotate(
-        total_aces=Sum(
-            Case(
-                When(
-                    playermatch__player_role='winner',
-                    playermatch__match_id__matchstats__match_stats_id__endswith='-w',
-                    then='playermatch__match_id__matchstats__ace'
-                ),
-                When(
-                    playermatch__player_role='loser',
-                    playermatch__match_id__matchstats__match_stats_id__endswith='-l',
-                    then='playermatch__match_id__matchstats__ace'
-                ),
-                output_field=IntegerField(),
-                default=0
-            )
-        )
-    ).values('player_name', 'total_aces').order_by('-total_aces')[:10]
-    return Response(players)
-
-# For each match won, it's counted 1 and later added to get the total number of matched won by country
+    return Response(top_aces(10))
+
+# For each match won, it's counted 1 and later added to get the total number of matched won by country.
+# The leaderboards of the home page are computed in tennis/dashboard.py, with the SQL queries or with the
+# columnar engine (tennis/columnar.py) when TENNIS_ANALYTICS_ENGINE is 'numpy'
 @api_view(['GET'])
+@cached_view(PlayerMatch, Players, Country)
 def countries_with_most_wins(request):
-    countries = PlayerMatch.objects.select_related('player_id__ioc').values(
-        'player_id__ioc__country_name').annotate(
-        wins=Sum(Case(When(player_role='winner', then=1), output_field=IntegerField()))
-    ).order_by('-wins')[:10]
-    return Response(countries)
+    return Response(country_wins(10))
 
 # similar to the previous GET request, it counts 1 for each match won or lost. It returns
 # the number of matches won and lost associated to the dominant hand reported in the dataset
 @api_view(['GET'])
+@cached_view(PlayerMatch, Players, Hand)
 def performance_by_hand(request):
-    hand_performance = PlayerMatch.objects.select_related('player_id__hand').values(
-        'player_id__hand__hand_description').annotate(
-        wins=Sum(Case(When(player_role='winner', then=1), output_field=IntegerField())),
-        losses=Sum(Case(When(player_role='loser', then=1), output_field=IntegerField())))
-    return Response(hand_performance)
+    return Response(hand_performance())
+
+# players with the most tiebreaks won. The tiebreaks are the MatchSets rows with tiebreak set (parsed from the score
+# when the matches are loaded), a tiebreak is won by the player whose role in the match is the set_winner of the set
+@api_view(['GET'])
+@cached_view(Matches, PlayerMatch, Players)
+def tiebreak_records(request):
+    records = MatchSets.objects.filter(tiebreak=True).values(
+        player_id=F('match_id__playermatch__player_id'),
+        player_name=F('match_id__playermatch__player_id__player_name')).annotate(
+        played=Count('id'),
+        won=Count('id', filter=Q(set_winner=F('match_id__playermatch__player_role')))
+    ).order_by('-won', '-played', 'player_id')[:10]
+    return Response(records)
+
+# players with the most five-set matches won, with the five-set matches played and lost.
+# Only the matches played to the end are counted (num_sets and retired come from the score)
+@api_view(['GET'])
+@cached_view(Matches, PlayerMatch, Players)
+def five_set_performance(request):
+    performance = PlayerMatch.objects.filter(match_id__num_sets=5, match_id__retired=False).values(
+        'player_id', player_name=F('player_id__player_name')).annotate(
+        played=Count('id'),
+        wins=Count('id', filter=Q(player_role='winner')),
+        losses=Count('id', filter=Q(player_role='loser'))
+    ).order_by('-wins', '-played', 'player_id')[:10]
+    return Response(performance)
+
+# players with the highest Elo rating (tennis/ratings.py), overall or on the surface given with ?surface=.
+# ?limit= changes the number of players (10 by default)
+@api_view(['GET'])
+@cached_view(Tournament, Players, Matches, PlayerMatch)
+def elo_top(request):
+    surface = request.query_params.get('surface', OVERALL)
+    return Response(top_ratings(surface, get_limit(request)))
+
+# Elo rating of a player before and after every match, overall or on the surface given with ?surface=
+@api_view(['GET'])
+@cached_view(Tournament, Players, Matches, PlayerMatch)
+def elo_history(request, player_id):
+    try:
+        player = Players.objects.get(player_id=player_id)
+    except Players.DoesNotExist:
+        return Response({'status': 'error', 'message': 'Player not found'}, status=status.HTTP_404_NOT_FOUND)
+    surface = request.query_params.get('surface', OVERALL)
+    return Response({'player_id': player.player_id, 'player_name': player.player_name, 'surface': surface,
+                     'history': rating_history(player.player_id, surface)})
+
+# typeahead search of the players by name (tennis/search.py): accents and case are ignored and the surname can come
+# first ('nadal raf'). ?limit= changes the number of players (10 by default). The response is not cached with
+# cached_view, every query typed would be a different entry of the cache and the index is already in memory
+@api_view(['GET'])
+def players_search(request):
+    return Response(player_index.search(request.query_params.get('q', ''), get_limit(request, maximum=50)))
+
+# head-to-head of two players, read from the HeadToHead table with one primary key lookup (the players are joined).
+# The table is built by the migrations, the loader and the ingest command, the request only reads it.
+# The record is given in the order of the url: player_a is the first player_id
+@api_view(['GET'])
+@cached_view(Tournament, Players, Matches, PlayerMatch)
+def head_to_head(request, player_a, player_b):
+    row = HeadToHead.objects.select_related('player_a', 'player_b').filter(pk=pair_key(player_a, player_b)).first()
+    if row is None:
+        players = {player.player_id: player for player in Players.objects.filter(player_id__in=[player_a, player_b])}
+        if player_a not in players or player_b not in players:
+            return Response({'status': 'error', 'message': 'Player not found'}, status=status.HTTP_404_NOT_FOUND)
+        row = HeadToHead(player_a=players[min(player_a, player_b)], player_b=players[max(player_a, player_b)])
+    first, second = (row.player_a, row.player_b) if row.player_a_id == player_a else (row.player_b, row.player_a)
+    wins = {row.player_a_id: row.player_a_wins, row.player_b_id: row.player_b_wins}
+    return Response({
+        'player_a': {'player_id': first.player_id, 'player_name': first.player_name, 'wins': wins[first.player_id]},
+        'player_b': {'player_id': second.player_id, 'player_name': second.player_name, 'wins': wins[second.player_id]},
+        'matches': row.player_a_wins + row.player_b_wins,
+        'surfaces': row.surfaces,
+        'last_match': row.last_match_id,
+        'last_date': row.last_date,
+        'last_winner': row.last_winner_id,
+    })
+
+# GET request to check the response cache: hits and misses of this process and the current dataset version
+@api_view(['GET'])
+def response_cache_stats(request):
+    return Response(cache_stats())
+
+# GET requests with the measures of the requests taken by MetricsMiddleware (tennis/middleware.py):
+# percentiles of the time, database time, number of queries, serialization time and size for each url name,
+# in JSON or in the Prometheus text format
+@api_view(['GET'])
+def request_metrics(request):
+    return Response(metrics.summary())
+
+def request_metrics_prometheus(request):
+    return HttpResponse(prometheus_text(metrics.summary()), content_type='text/plain; version=0.0.4')
 
 # Some reference: https://www.django-rest-framework.org/tutorial/2-requests-and-responses/
 # the POST requet retrieves the data inputted in the form by the user. Player data are passed
@@ -114,7 +218,10 @@ def manage_player(request, player_id=None):
         player_serializer = PlayerSerializer(data=player_data)
         if not player_serializer.is_valid():
             return Response({'error': player_serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
-        player_instance = player_serializer.save()
+        # the player and the count of its letter are saved in the same transaction
+        with transaction.atomic():
+            player_instance = player_serializer.save()
+            update_letter_counts(new_name=player_instance.player_name)
 
         # Prepare response data with newly created player details
         response_data = {
@@ -130,8 +237,10 @@ def manage_player(request, player_id=None):
     elif request.method == 'DELETE':
         try:
             # it fetches the player with the given player_id. If the player exists, it deletes the record and returns a 204 No Content response
-            player = Players.objects.get(player_id=player_id)
-            player.delete()
+            with transaction.atomic():
+                player = Players.objects.get(player_id=player_id)
+                player.delete()
+                update_letter_counts(old_name=player.player_name)
             return Response({'status': 'success', 'message': 'Player deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
         # If the player doesn't exist, it returns a not found response. any other error has a 500 Internal Server Error response
         except Players.DoesNotExist:
@@ -141,6 +250,24 @@ def manage_player(request, player_id=None):
     # this error when the request is not POST or DELETE
     return Response({'error': 'Method not allowed'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
+# POST request with many players to create or update (tennis/bulk.py), as a JSON array or as NDJSON, with the
+# fields of PlayerSerializer and player_id for the players to update. The valid rows are saved even if other rows
+# have errors, the response has the result of every row in the order of the request
+@api_view(['POST'])
+@parser_classes([JSONParser, NDJSONParser])
+def players_bulk(request):
+    rows = request.data
+    if not isinstance(rows, list):
+        return Response({'status': 'error', 'message': 'A list of players is required'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    maximum = getattr(settings, 'TENNIS_BULK_MAX_ROWS', 1000)
+    if len(rows) > maximum:
+        return Response({'status': 'error', 'message': f'At most {maximum} players in a request'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    results = bulk_save_players(rows)
+    counts = {name: sum(result['status'] == name for result in results) for name in ('created', 'updated', 'error')}
+    return Response({'status': 'success' if not counts['error'] else 'partial', **counts, 'results': results})
+
 # Some reference: https://medium.com/@sinturana250/django-post-put-get-delete-requests-example-rest-apis-chapter-19-c449b6260b2a
 # https://djangogrpcframework.readthedocs.io/en/latest/patterns/partial_update.html
 # It uses the PUT and PATCH methods to update a player. The serializer is set to pass not all the fields for partial updates
@@ -154,7 +281,10 @@ def update_player(request, player_id):
     serializer = PlayerSerializer(player, data=request.data, partial=True)
 
     if serializer.is_valid():
-        serializer.save()
+        old_name = player.player_name
+        with transaction.atomic():
+            serializer.save()
+            update_letter_counts(old_name, player.player_name)
         return Response({'status': 'success', 'message': 'Player updated successfully', 'data': serializer.data})
     else:
         return Response({'status': 'error', 'message': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
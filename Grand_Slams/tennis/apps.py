@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TennisAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tennis'
+
+    # the signal receivers change the dataset version used by the response cache when the data changes
+    def ready(self):
+        from . import signals
@@ -0,0 +1,103 @@
+'''
+POST /api/batch/ runs many GET requests of the API in one HTTP request, so the page doesn't pay the middleware,
+the CSRF check and the round trip for each one. The body is {"requests": {"key": "/api/path/?query", ...}} (or a list
+of paths, then every path is its own key) and the response has, for each key, the status and the body of its request:
+{"key": {"status": 200, "body": ...}}.
+Only the GET routes of tennis/urls.py are run, as GET requests, with the user, the cookies and the headers of the
+batch request but without its conditional headers (If-None-Match...), so the cached responses (tennis/cache.py) are
+used but a 304 without body is never returned. The same path asked twice, even with the parameters in another order,
+runs once. Requests that change data (POST, PUT, DELETE) can't be sent in a batch: the write views answer 405.
+Some reference: https://docs.djangoproject.com/en/4.2/ref/urlresolvers/#resolve
+https://developers.facebook.com/docs/graph-api/batch-requests/
+'''
+
+import copy
+import json
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.http import Http404, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+# headers of the batch request that are not passed to the requests it runs
+CONDITIONAL_HEADERS = ['HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_MATCH', 'HTTP_IF_UNMODIFIED_SINCE',
+                       'CONTENT_TYPE', 'CONTENT_LENGTH']
+
+
+# views that can be run in a batch: the routes of tennis/urls.py, the batch itself excluded.
+# The views are compared and not the url names, the admin site has an 'index' too
+def batch_views():
+    from .urls import urlpatterns
+    return {pattern.callback for pattern in urlpatterns if pattern.name != 'batch'}
+
+# it returns the path with the parameters sorted, so the same request is run once
+def normalize_path(path):
+    parts = urlsplit(path)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{parts.path}?{query}" if query else parts.path
+
+# it returns the GET request of path, a copy of the Django request of the batch
+def sub_request(request, path):
+    parts = urlsplit(path)
+    sub = copy.copy(request)
+    sub.method = 'GET'
+    sub.path = sub.path_info = parts.path
+    sub.META = {key: value for key, value in request.META.items() if key not in CONDITIONAL_HEADERS}
+    sub.META.update({'REQUEST_METHOD': 'GET', 'PATH_INFO': parts.path, 'QUERY_STRING': parts.query})
+    sub.GET = QueryDict(parts.query)
+    sub.POST = QueryDict()
+    sub._body = b''
+    return sub
+
+def error(code, message):
+    return {'status': code, 'body': {'status': 'error', 'message': message}}
+
+# it runs a GET request and it returns its status and its data
+def run(request, path):
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return error(status.HTTP_404_NOT_FOUND, 'Not found')
+    if match.func not in batch_views():
+        return error(status.HTTP_400_BAD_REQUEST, 'Only the GET routes of the API can be run in a batch')
+    sub = sub_request(request, path)
+    sub.resolver_match = match
+    view = async_to_sync(match.func) if iscoroutinefunction(match.func) else match.func
+    try:
+        response = view(sub, *match.args, **match.kwargs)
+    except Http404:
+        return error(status.HTTP_404_NOT_FOUND, 'Not found')
+    # DRF responses have the data before they are rendered to JSON
+    if isinstance(response, Response):
+        return {'status': response.status_code, 'body': response.data}
+    if hasattr(response, 'render'):
+        response.render()
+    content = response.content.decode(response.charset)
+    if response.get('Content-Type', '').startswith('application/json'):
+        content = json.loads(content)
+    return {'status': response.status_code, 'body': content}
+
+# the body is {"requests": {key: path}} or {"requests": [path, ...]}, with at most TENNIS_BATCH_MAX_REQUESTS paths
+@api_view(['POST'])
+def batch(request):
+    requests = request.data.get('requests') if isinstance(request.data, dict) else None
+    if isinstance(requests, list):
+        requests = {path: path for path in requests}
+    if not isinstance(requests, dict) or not all(isinstance(path, str) for path in requests.values()):
+        return Response({'status': 'error', 'message': 'requests must be a list of paths or an object of paths'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    maximum = getattr(settings, 'TENNIS_BATCH_MAX_REQUESTS', 20)
+    if len(requests) > maximum:
+        return Response({'status': 'error', 'message': f'At most {maximum} requests in a batch'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    results = {}
+    responses = {}
+    for key, path in requests.items():
+        normalized = normalize_path(path)
+        if normalized not in results:
+            results[normalized] = run(request._request, path)
+        responses[key] = results[normalized]
+    return Response(responses)
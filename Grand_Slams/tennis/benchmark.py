@@ -0,0 +1,317 @@
+'''
+Benchmark of the loader and of the API on synthetic datasets larger than the bundled one.
+The generator writes csv files in the same format as the data folder, using the factories of model_factories.py
+for the values of the rows, at a scale of the bundled data (39 tournaments of 127 matches, 462 players):
+with scale 100 there are 3900 tournaments, 495300 matches, 990600 MatchStats (-w and -l) and 990600 PlayerMatch
+(winner and loser) rows. Hand.csv and Country.csv are copied from the data folder.
+The same scale and seed always give the same files, so two reports of the same scale can be compared.
+The files are loaded with the bulk loader (loader.py) and then every GET endpoint of tennis/urls.py is timed,
+once with an empty response cache and then a few times from the cache. The cost of each row of the player lists is
+measured too, with PlayerSerializer and JSONRenderer and with the values_list fast path (PlayerRowSerializer) and
+FastJSONRenderer.
+Some reference: https://factoryboy.readthedocs.io/en/stable/reference.html#factory.Factory.stub
+https://docs.djangoproject.com/en/4.2/topics/testing/tools/#the-test-client
+'''
+
+import csv
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+import django
+import factory.random
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from . import renderers, urls
+from .cache import bump_dataset_version
+from .loader import bulk_load
+from .middleware import QueryRecorder
+from .model_factories import TournamentFactory, PlayersFactory, MatchesFactory, MatchStatsFactory, PlayerMatchFactory
+from .models import Players
+from .pagination import MAX_PAGE_SIZE
+from .serializers import PlayerSerializer, PlayerRowSerializer
+
+# size of the bundled data, multiplied by the scale
+TOURNAMENTS = 39
+PLAYERS = 462
+# rounds of a draw of 128 players and the number of matches of each one (127 matches for each tournament)
+ROUNDS = [('R128', 64), ('R64', 32), ('R32', 16), ('R16', 8), ('QF', 4), ('SF', 2), ('F', 1)]
+SURFACES = ['Hard', 'Clay', 'Grass', 'Hard']
+FIRST_PLAYER_ID = 200000
+
+# header of each csv file, as in the data folder
+HEADERS = {
+    'Tournament.csv': ['tourney_id', 'tourney_name', 'surface', 'draw_size', 'tourney_level', 'tourney_date'],
+    'Players.csv': ['player_id', 'player_name', 'hand', 'height', 'ioc'],
+    'Matches.csv': ['match_id', 'tourney_id', 'match_num', 'score', 'best_of', 'round', 'minutes'],
+    'Match_Stats.csv': ['match_stats_id', 'match_id', 'ace', 'df', 'svpt', '1stIn', '1stWon', '2ndWon', 'SvGms',
+                        'bpSaved', 'bpFaced'],
+    'Player_Match.csv': ['player_id', 'match_id', 'player_role', 'seed', 'entry', 'ranking', 'ranking_points', 'age'],
+}
+
+# endpoints without GET requests: they write data or, like the batch, run other requests, they are not timed
+WRITE_URLS = {'manage_player', 'update_player', 'players_bulk', 'batch'}
+# arguments of the endpoints with parameters in the url
+ENDPOINT_ARGS = {
+    'players_by_letter': {'letter': 'R'},
+    'elo_history': {'player_id': FIRST_PLAYER_ID},
+    'head_to_head': {'player_a': FIRST_PLAYER_ID, 'player_b': FIRST_PLAYER_ID + 1},
+}
+# endpoints that return a status for each section (tennis/dashboard.py): the response is a 200 even when some
+# sections timed out or failed, so the statuses of the sections are read from the body
+SECTIONED_URLS = {'dashboard'}
+
+
+# it returns the number of rows of each table for a scale
+def dataset_size(scale):
+    tournaments = max(1, round(TOURNAMENTS * scale))
+    matches = tournaments * sum(count for _, count in ROUNDS)
+    return {'tournaments': tournaments, 'players': max(2, round(PLAYERS * scale)), 'matches': matches,
+            'match_stats': matches * 2, 'player_match': matches * 2}
+
+# it returns a score in the format of Matches.csv (e.g. 7-6(4) 3-6 6-2 6-4), seen from the winner of the match
+def random_score(rand, best_of):
+    needed = best_of // 2 + 1
+    won = lost = 0
+    sets = []
+    while won < needed and lost < needed:
+        kind = rand.random()
+        if kind < 0.15:
+            games = (7, 6, f"({rand.randint(0, 10)})")
+        elif kind < 0.3:
+            games = (7, 5, '')
+        else:
+            games = (6, rand.randint(0, 4), '')
+        # the winner of the match takes about two sets out of three
+        if rand.random() < 0.65 or lost == needed - 1:
+            sets.append(f"{games[0]}-{games[1]}{games[2]}")
+            won += 1
+        else:
+            sets.append(f"{games[1]}-{games[0]}{games[2]}")
+            lost += 1
+        if won < needed and rand.random() < 0.005:
+            sets.append(f"{rand.randint(0, 5)}-{rand.randint(0, 5)} RET")
+            break
+    return ' '.join(sets)
+
+# it writes the csv files of a synthetic dataset in folder and it returns the number of rows of each table.
+# data_folder is the folder with Hand.csv and Country.csv
+def generate_dataset(folder, scale, data_folder, seed=0):
+    os.makedirs(folder, exist_ok=True)
+    # the factories use the random generator of factory_boy (Faker included), seeded for repeatable files
+    factory.random.reseed_random(seed)
+    rand = factory.random.randgen
+    size = dataset_size(scale)
+    for file_name in ('Hand.csv', 'Country.csv'):
+        shutil.copy(os.path.join(data_folder, file_name), os.path.join(folder, file_name))
+    hands = read_keys(os.path.join(data_folder, 'Hand.csv'))
+    countries = read_keys(os.path.join(data_folder, 'Country.csv'))
+    writers = {}
+    files = []
+    try:
+        for file_name, header in HEADERS.items():
+            csv_file = open(os.path.join(folder, file_name), 'w', newline='')
+            files.append(csv_file)
+            writers[file_name] = csv.writer(csv_file)
+            writers[file_name].writerow(header)
+
+        player_ids = [FIRST_PLAYER_ID + i for i in range(size['players'])]
+        for player_id in player_ids:
+            player = PlayersFactory.stub(player_id=player_id, hand=rand.choice(hands), ioc=rand.choice(countries))
+            writers['Players.csv'].writerow([player.player_id, player.player_name, player.hand, player.height,
+                                             player.ioc])
+
+        first_day = date(1990, 1, 1)
+        for t in range(size['tournaments']):
+            tourney_date = first_day + timedelta(weeks=t)
+            tournament = TournamentFactory.stub(tourney_id=f"{tourney_date.year}-S{t}", surface=SURFACES[t % 4],
+                                                draw_size=128, tourney_level='G', tourney_date=tourney_date)
+            writers['Tournament.csv'].writerow([tournament.tourney_id, tournament.tourney_name, tournament.surface,
+                                                tournament.draw_size, tournament.tourney_level,
+                                                tourney_date.strftime('%Y%m%d')])
+            match_num = 0
+            for round_name, count in ROUNDS:
+                for _ in range(count):
+                    match_num += 1
+                    write_match(writers, rand, tournament.tourney_id, match_num, round_name, player_ids)
+    finally:
+        for csv_file in files:
+            csv_file.close()
+    return size
+
+# it writes a match with the stats and the PlayerMatch rows of its winner and loser
+def write_match(writers, rand, tourney_id, match_num, round_name, player_ids):
+    match = MatchesFactory.stub(match_id=f"{tourney_id}-{match_num}", tourney_id=tourney_id, match_num=match_num,
+                                score=random_score(rand, 5), best_of='5', round=round_name)
+    writers['Matches.csv'].writerow([match.match_id, match.tourney_id, match.match_num, match.score, match.best_of,
+                                     match.round, match.minutes])
+    players = rand.sample(player_ids, 2)
+    for role, suffix, player_id in (('winner', 'w', players[0]), ('loser', 'l', players[1])):
+        stats = MatchStatsFactory.stub(match_stats_id=f"{match.match_id}-{suffix}", match_id=match.match_id)
+        writers['Match_Stats.csv'].writerow([stats.match_stats_id, stats.match_id, stats.ace, stats.df, stats.svpt,
+                                             stats.firstIn, stats.firstWon, stats.secondWon, stats.SvGms,
+                                             stats.bpSaved, stats.bpFaced])
+        row = PlayerMatchFactory.stub(player_id=player_id, match_id=match.match_id, player_role=role)
+        writers['Player_Match.csv'].writerow([row.player_id, row.match_id, row.player_role, row.seed, row.entry,
+                                              row.ranking, row.ranking_points, row.age])
+
+# it returns the values of the first column of a csv file of the data folder
+def read_keys(path):
+    with open(path, newline='') as csv_file:
+        reader = csv.reader(csv_file)
+        next(reader)
+        return [row[0] for row in reader]
+
+
+# it creates an empty database (migrated) at path and it uses it in place of the default one until the end of
+# the block, so the benchmark never writes in tennis.sqlite3. The file is deleted at the end unless keep is True
+@contextmanager
+def benchmark_database(path, keep=False):
+    connection.settings_dict['TEST']['NAME'] = path
+    setup_test_environment(debug=False)
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keep)
+        teardown_test_environment()
+
+# it returns the url name and the path of every GET endpoint of tennis/urls.py
+def endpoints():
+    result = []
+    for pattern in urls.urlpatterns:
+        if pattern.name in WRITE_URLS:
+            continue
+        result.append((pattern.name, reverse(pattern.name, kwargs=ENDPOINT_ARGS.get(pattern.name, {}))))
+    return result
+
+# it returns the status of each section of a response of a SECTIONED_URLS endpoint ('success', 'timeout' or 'error')
+def section_statuses(response):
+    return {name: section.get('status') for name, section in json.loads(response.content).items()}
+
+# it times every GET endpoint: the first request after a new dataset version (not cached) and then repeat requests
+# read from the response cache. The endpoints of SECTIONED_URLS also get the status of their sections and the list
+# of the sections that were not computed (failed_sections), their times don't measure the whole work
+def time_endpoints(repeat=5):
+    client = Client()
+    result = {}
+    for name, path in endpoints():
+        bump_dataset_version()
+        # the queries log of the connection is cleared at the start of every request, so the queries are
+        # counted with an execute wrapper as MetricsMiddleware does
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            start = time.perf_counter()
+            response = client.get(path)
+            cold = time.perf_counter() - start
+        warm = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            client.get(path)
+            warm.append(time.perf_counter() - start)
+        result[name] = {
+            'path': path,
+            'status': response.status_code,
+            'queries': len(recorder.queries),
+            'db_ms': round(recorder.seconds * 1000, 3),
+            'size': len(response.content),
+            'cold_ms': round(cold * 1000, 3),
+            'warm_median_ms': round(statistics.median(warm) * 1000, 3) if warm else None,
+        }
+        if name in SECTIONED_URLS and response.status_code == 200:
+            sections = section_statuses(response)
+            result[name]['sections'] = sections
+            result[name]['failed_sections'] = sorted(section for section, status in sections.items()
+                                                     if status != 'success')
+    return result
+
+# it returns the sections not computed of each endpoint of a report, {name: [section, ...]}
+def failed_sections(report):
+    return {name: result['failed_sections'] for name, result in report['endpoints'].items()
+            if result.get('failed_sections')}
+
+# it times the conversion of a page of players to JSON bytes, from the query to the rendered response:
+# 'model' reads the model instances and converts them with PlayerSerializer and JSONRenderer, as the list endpoints
+# did, 'rows' reads the values_list tuples and converts them with PlayerRowSerializer and FastJSONRenderer.
+# It returns the median microseconds per row of each path and whether the two paths return the same bytes
+def serialization_benchmark(rows=MAX_PAGE_SIZE, repeat=5):
+    players = Players.objects.order_by('player_name', 'player_id')[:rows]
+    fast_renderer = renderers.FastJSONRenderer()
+    paths = {
+        'model': lambda: JSONRenderer().render(PlayerSerializer(list(players), many=True).data),
+        'rows': lambda: fast_renderer.render(PlayerRowSerializer.serialize(list(PlayerRowSerializer.values(players)))),
+    }
+    # the first run also reads the reference cache, it is not timed
+    output = {name: path() for name, path in paths.items()}
+    count = players.count()
+    result = {'rows': count, 'renderer': 'orjson' if renderers.orjson is not None else 'json',
+              'same_output': output['model'] == output['rows']}
+    for name, path in paths.items():
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            path()
+            times.append(time.perf_counter() - start)
+        result[f"{name}_us_per_row"] = round(statistics.median(times) * 1e6 / count, 3) if count else None
+    return result
+
+# it returns the short hash of the current commit, or None outside of a git repository
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# it loads the csv files of folder in the current database and times the endpoints, and it returns the report
+def run_benchmark(folder, scale, seed, generate_seconds, repeat=5, stdout=None):
+    start = time.perf_counter()
+    loader = bulk_load(folder, stdout=stdout)
+    load_seconds = time.perf_counter() - start
+    return {
+        'commit': git_commit(),
+        'scale': scale,
+        'seed': seed,
+        'rows': dataset_size(scale),
+        'environment': {'python': platform.python_version(), 'django': django.get_version(),
+                        'sqlite': sqlite3.sqlite_version},
+        'generate_seconds': round(generate_seconds, 3),
+        'loader': {'seconds': round(load_seconds, 3),
+                   'files': [{**result, 'seconds': round(result['seconds'], 3)} for result in loader]},
+        'endpoints': time_endpoints(repeat),
+        'serialization': serialization_benchmark(repeat=repeat),
+    }
+
+# it compares two reports and it returns a line for the loader and for each endpoint in both of them
+def compare_reports(old, new):
+    lines = []
+    if old.get('scale') != new.get('scale'):
+        lines.append(f"Warning: scale {old.get('scale')} and {new.get('scale')} are different")
+    pairs = [('loader', old['loader']['seconds'] * 1000, new['loader']['seconds'] * 1000)]
+    for name, result in new['endpoints'].items():
+        if name in old['endpoints']:
+            pairs.append((f"{name} (cold)", old['endpoints'][name]['cold_ms'], result['cold_ms']))
+    for label, before, after in pairs:
+        change = f"{(after - before) / before * 100:+.1f}%" if before else 'n/a'
+        lines.append(f"{label}: {before:.1f} ms -> {after:.1f} ms ({change})")
+    # the reports written before the statuses of the sections don't have them
+    for label, report in (('old', old), ('new', new)):
+        for name, sections in failed_sections(report).items():
+            lines.append(f"Warning: {name} of the {label} report has sections not computed: {', '.join(sections)}")
+    # the reports written before the serialization benchmark don't have it
+    if 'serialization' in old and 'serialization' in new:
+        for path in ('model', 'rows'):
+            before, after = old['serialization'][f"{path}_us_per_row"], new['serialization'][f"{path}_us_per_row"]
+            if before is not None and after is not None:
+                change = f"{(after - before) / before * 100:+.1f}%" if before else 'n/a'
+                lines.append(f"serialization ({path}): {before:.2f} us/row -> {after:.2f} us/row ({change})")
+    return lines
@@ -0,0 +1,116 @@
+'''
+Creation and update of many players in one request (/api/players/bulk/), e.g. the qualifiers of a draw.
+Every row is validated with PlayerSerializer, without queries. A row with a player_id updates that player, a row
+without it creates a new player. Then, for the valid rows together:
+the hands and the countries are read from the reference cache (the missing ones are inserted with one query each),
+the players to update are read with one query, the new players get a contiguous block of ids from the allocator
+(tennis/sequences.py) and all the rows are written with bulk_create and bulk_update in one transaction.
+A row with an error is returned with its errors and the other rows are still saved.
+bulk_create and bulk_update don't send the signals, so the letter counts (only the letters of the new and renamed
+players) and the table version are changed here.
+Some reference: https://docs.djangoproject.com/en/4.2/ref/models/querysets/#bulk-update
+https://www.django-rest-framework.org/api-guide/serializers/#validation
+'''
+
+from django.db import transaction
+from .aggregates import change_letter_counts
+from .cache import bump_dataset_version
+from .models import Players, Hand, Country
+from .references import references, hand_key, country_key
+from .serializers import PlayerSerializer
+from .sequences import player_ids
+
+# fields changed by an update
+UPDATE_FIELDS = ['player_name', 'height', 'hand', 'ioc']
+
+
+# it returns the rows of model for the given {key: name}: the ones already known are read from the reference cache
+# (tennis/references.py), the missing ones are inserted with one query
+def reference_rows(model, name_field, names):
+    found = {key: row for key in names if (row := references.get(model.__name__, key)) is not None}
+    missing = [model(pk=key, **{name_field: name}) for key, name in names.items() if key not in found]
+    if missing:
+        model.objects.bulk_create(missing, ignore_conflicts=True)
+        found.update(model.objects.in_bulk([row.pk for row in missing]))
+    return found
+
+# it validates a row, it returns the player_id (None for a new player), the validated data and the errors
+def validate(row, seen):
+    if not isinstance(row, dict):
+        return None, None, {'non_field_errors': ['A player must be an object']}
+    player_id = row.get('player_id')
+    if player_id is not None:
+        if isinstance(player_id, bool) or not isinstance(player_id, int):
+            return None, None, {'player_id': ['A valid integer is required.']}
+        if player_id in seen:
+            return None, None, {'player_id': ['The player is already in this request']}
+        seen.add(player_id)
+    serializer = PlayerSerializer(data=row, partial=player_id is not None)
+    if not serializer.is_valid():
+        return player_id, None, serializer.errors
+    return player_id, serializer.validated_data, None
+
+# it saves the rows and it returns a result for each row, in the same order:
+# {'row': index, 'status': 'created' or 'updated', 'player_id': id} or {'row': index, 'status': 'error', 'errors': ...}
+def bulk_save_players(rows, batch_size=500):
+    results = [None] * len(rows)
+    valid = []
+    seen = set()
+    for index, row in enumerate(rows):
+        player_id, data, errors = validate(row, seen)
+        if errors:
+            results[index] = {'row': index, 'status': 'error', 'errors': errors}
+        else:
+            valid.append((index, player_id, data))
+    if not valid:
+        return results
+
+    with transaction.atomic():
+        hands = reference_rows(Hand, 'hand_description', {
+            hand_key(data['hand_description']): data['hand_description']
+            for _, _, data in valid if data.get('hand_description')})
+        countries = reference_rows(Country, 'country_name', {
+            country_key(data['country_name']): data['country_name']
+            for _, _, data in valid if data.get('country_name')})
+        existing = Players.objects.in_bulk([player_id for _, player_id, _ in valid if player_id is not None])
+
+        created = []
+        updated = []
+        # (old name, new name) of the players created and renamed, for the letter counts
+        names = []
+        for index, player_id, data in valid:
+            if player_id is None:
+                player = Players(player_name=data['player_name'], height=data.get('height'))
+                created.append((index, player))
+                names.append((None, player.player_name))
+            elif player_id in existing:
+                player = existing[player_id]
+                names.append((player.player_name, data.get('player_name', player.player_name)))
+                for field in ('player_name', 'height'):
+                    if field in data:
+                        setattr(player, field, data[field])
+                updated.append((index, player))
+            else:
+                results[index] = {'row': index, 'status': 'error', 'errors': {'player_id': ['Player not found']}}
+                continue
+            if data.get('hand_description'):
+                player.hand = hands[hand_key(data['hand_description'])]
+            if data.get('country_name'):
+                player.ioc = countries[country_key(data['country_name'])]
+
+        # a contiguous block of ids for the new players (tennis/sequences.py)
+        def create_players(ids):
+            for player_id, (_, player) in zip(ids, created):
+                player.player_id = player_id
+            Players.objects.bulk_create([player for _, player in created], batch_size=batch_size)
+
+        if created:
+            player_ids.save_with_ids(create_players, len(created))
+        Players.objects.bulk_update([player for _, player in updated], UPDATE_FIELDS, batch_size=batch_size)
+        for status, players in (('created', created), ('updated', updated)):
+            for index, player in players:
+                results[index] = {'row': index, 'status': status, 'player_id': player.player_id}
+        if created or updated:
+            change_letter_counts(names)
+            bump_dataset_version(Players._meta.db_table, Hand._meta.db_table, Country._meta.db_table)
+    return results
@@ -0,0 +1,197 @@
+'''
+Cache of the responses of the read-only analytics endpoints, with ETag and Last-Modified headers.
+Every table has a version in the TableVersion table: a counter, a random token (with the token it replaced) and the
+time it was last changed, which are changed in the transaction of every change of the data of the table (a player is added, updated or
+deleted, or a file is loaded or ingested). Being in the database, the versions are the same for every process of
+the server: a change made by a worker invalidates the responses and the in-memory data (reference cache, player
+search, columnar engine) of all the others. The versions are read with one query, once for each request
+(TableVersionsMiddleware), and every request sees the versions of its own transaction.
+The responses are stored with a key that contains the tokens of the tables the view reads: after a change the old
+entries are never read again and they are evicted by the cache, least recently used first. A token is never used
+twice, even when the transaction that changed it is rolled back.
+The same versions give the ETag and Last-Modified headers of the response, so a client that sends back
+If-None-Match or If-Modified-Since gets a 304 Not Modified without the view being called.
+The cache used is the 'tennis' entry of CACHES in settings.py: local memory (one cache for each process)
+or file based (shared by all the processes of the server), chosen with TENNIS_CACHE_BACKEND.
+Some reference: https://docs.djangoproject.com/en/4.2/topics/cache/#the-low-level-cache-api
+https://docs.djangoproject.com/en/4.2/topics/conditional-view-processing/
+'''
+
+import hashlib
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.db.models.query import QuerySet
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from .models import Tournament, Hand, Country, Players, Matches, MatchStats, PlayerMatch, TableVersion
+
+# tables whose changes are tracked
+TABLES = [model._meta.db_table for model in (Tournament, Hand, Country, Players, Matches, MatchStats, PlayerMatch)]
+# version of a table without a row in TableVersion (the rows are created by the migrations, they are missing only
+# when the table was emptied, e.g. by a flush): its token is new at every read, so nothing read before is reused
+INITIAL_VERSION = {'version': 0, 'token': '', 'previous_token': '', 'modified': 0}
+
+# hits, misses and 304 responses of this process
+counters = {'hits': 0, 'misses': 0, 'not_modified': 0}
+counters_lock = threading.Lock()
+# versions read by the current request, by table (None outside of a request, the versions are always read)
+request_versions = ContextVar('tennis_table_versions', default=None)
+
+
+def get_cache():
+    return caches[getattr(settings, 'TENNIS_CACHE_ALIAS', 'tennis')]
+
+# it returns the version of each table ({'version', 'token', 'previous_token', 'modified'}), with a single query for the tables not
+# read yet by the current request
+def table_versions(tables):
+    known = request_versions.get()
+    versions = {table: known[table] for table in tables if known is not None and table in known}
+    missing = [table for table in tables if table not in versions]
+    if missing:
+        stored = {row['table']: row for row in TableVersion.objects.filter(table__in=missing)
+                  .values('table', 'version', 'token', 'previous_token', 'modified')}
+        for table in missing:
+            row = stored.get(table)
+            versions[table] = ({key: value for key, value in row.items() if key != 'table'}
+                               if row else dict(INITIAL_VERSION, token=uuid.uuid4().hex))
+        if known is not None:
+            known.update({table: versions[table] for table in missing})
+    return versions
+
+# it returns the counters of the tables stored in the database, 0 for a table never changed
+def stored_versions(tables):
+    return {table: version['version'] for table, version in table_versions(tables).items()}
+
+# it returns a token of the versions of all the tables, changed by every change of the data
+def dataset_version():
+    versions = table_versions(TABLES)
+    return hashlib.sha1(':'.join(versions[table]['token'] for table in TABLES).encode()).hexdigest()
+
+# it changes the version of the given tables (of all the tables when none is given), invalidating the cached
+# responses that read them: the counter is incremented and the token and the time are new. The rows are changed in
+# the transaction of the change, the other processes see the new versions when it is committed
+def bump_dataset_version(*tables):
+    tables = list(tables or TABLES)
+    token = uuid.uuid4().hex
+    modified = int(time.time())
+    changes = {'version': F('version') + 1, 'token': token, 'previous_token': F('token'), 'modified': modified}
+    if TableVersion.objects.filter(table__in=tables).update(**changes) < len(tables):
+        TableVersion.objects.bulk_create([TableVersion(table=table, version=1, token=token, modified=modified)
+                                          for table in tables], ignore_conflicts=True)
+    # the versions of these tables are read again by the current request
+    known = request_versions.get()
+    if known is not None:
+        for table in tables:
+            known.pop(table, None)
+
+
+# it keeps the versions read by a request for the rest of it, so they are read once. It can run in the sync (WSGI)
+# and in the async (ASGI) chain, the threads of the request (sync_to_async, the dashboard) share the same versions
+class TableVersionsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = request_versions.set({})
+        try:
+            return self.get_response(request)
+        finally:
+            request_versions.reset(token)
+
+    async def __acall__(self, request):
+        token = request_versions.set({})
+        try:
+            return await self.get_response(request)
+        finally:
+            request_versions.reset(token)
+
+def count(name):
+    with counters_lock:
+        counters[name] += 1
+
+# it returns the counters of this process and the current dataset version
+def cache_stats():
+    with counters_lock:
+        stats = dict(counters)
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / total if total else 0
+    stats['version'] = dataset_version()
+    stats['backend'] = getattr(settings, 'TENNIS_CACHE_BACKEND', 'locmem')
+    return stats
+
+# it returns the ETag and the Last-Modified time of a response of the view for the request: the ETag is a hash of the
+# view name, the full path (query string included) and the versions of the tables, Last-Modified is the time of the
+# last change of those tables
+def validators(view_name, request, tables):
+    versions = table_versions(tables)
+    tokens = ':'.join(versions[table]['token'] for table in tables)
+    etag = quote_etag(hashlib.sha1(f"{view_name}:{request.get_full_path()}:{tokens}".encode()).hexdigest())
+    last_modified = max(version['modified'] for version in versions.values())
+    return etag, last_modified
+
+# it returns a 304 Not Modified response if the client already has this version, None otherwise
+def not_modified_response(request, etag, last_modified):
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        count('not_modified')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+    return response
+
+# it adds the headers of a response that the client can check again with If-None-Match or If-Modified-Since
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # the browser keeps the response but asks every time if it is still valid (If-None-Match)
+    response['Cache-Control'] = 'no-cache'
+
+# decorator for the GET views, with the models the view reads, with the ETag and Last-Modified of validators.
+# If the client already has this version the response is a 304 without body. Otherwise the data of a successful
+# response is cached with the ETag in the key, and on a hit the view is not called at all
+def cached_view(*models):
+    tables = [model._meta.db_table for model in models]
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            etag, last_modified = validators(view.__name__, request, tables)
+            not_modified = not_modified_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
+            cache = get_cache()
+            key = f"tennis:response:{etag}"
+            data = cache.get(key)
+            if data is not None:
+                count('hits')
+                response = Response(data)
+            else:
+                count('misses')
+                response = view(request, *args, **kwargs)
+                if response.status_code == status.HTTP_200_OK:
+                    data = response.data
+                    # querysets are evaluated once, so the cache stores the rows and not the query
+                    if isinstance(data, QuerySet):
+                        data = list(data)
+                    cache.set(key, data, timeout=None)
+            if response.status_code == status.HTTP_200_OK:
+                set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
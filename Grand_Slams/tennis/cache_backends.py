@@ -0,0 +1,34 @@
+'''
+Some reference: https://docs.djangoproject.com/en/4.2/topics/cache/#filesystem-caching
+The file-based cache of Django removes random entries when it is full. This backend removes the least recently
+used ones instead, like the local-memory cache does: every hit updates the modification time of the file and
+the files with the oldest modification time are deleted first.
+'''
+
+import os
+from django.core.cache.backends.filebased import FileBasedCache
+
+
+class LRUFileBasedCache(FileBasedCache):
+
+    # on a hit, the file is marked as used now
+    def get(self, key, default=None, version=None):
+        value = super().get(key, default, version)
+        if value is not default:
+            try:
+                os.utime(self._key_to_file(key, version))
+            except FileNotFoundError:
+                pass
+        return value
+
+    # when the cache is full, it deletes 1/CULL_FREQUENCY of the entries, starting from the least recently used
+    def _cull(self):
+        filelist = self._list_cache_files()
+        num_entries = len(filelist)
+        if num_entries < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+        filelist.sort(key=lambda fname: os.path.getmtime(fname) if os.path.exists(fname) else 0)
+        for fname in filelist[:num_entries // self._cull_frequency]:
+            self._delete(fname)
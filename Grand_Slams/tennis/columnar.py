@@ -0,0 +1,176 @@
+'''
+Optional in-memory columnar engine for the leaderboards (most aces, wins by country, performance by hand).
+The PlayerMatch, MatchStats, Players and Tournament rows are read once per process into NumPy arrays, with the
+players, countries, hands and surfaces encoded as integers (dictionary encoding), and the leaderboards are computed
+with np.bincount instead of grouped SQL joins. The arrays are read again when the versions of the tables (tennis/cache.py)
+changes, a new process can map them from a snapshot file instead (tennis/snapshot.py).
+The endpoints use it when TENNIS_ANALYTICS_ENGINE is 'numpy' and NumPy is installed (it is not in
+requirements.txt), and they return exactly the same rows as the SQL queries, ties and NULL groups included.
+Some reference: https://numpy.org/doc/stable/reference/generated/numpy.bincount.html
+https://numpy.org/doc/stable/reference/generated/numpy.lexsort.html
+'''
+
+import os
+import threading
+from django.conf import settings
+from django.db import transaction
+from .cache import table_versions
+from .models import Tournament, Hand, Country, Players, Matches, PlayerMatch, MatchStats
+from .snapshot import Snapshot, write_snapshot
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# tables read by read_columns
+TABLES = [model._meta.db_table for model in (Tournament, Hand, Country, Players, Matches, PlayerMatch, MatchStats)]
+# codes of PlayerMatch.player_role
+ROLES = {'winner': 1, 'loser': 2}
+
+
+# it returns True when the endpoints have to use this engine
+def enabled():
+    return np is not None and getattr(settings, 'TENNIS_ANALYTICS_ENGINE', 'sql') == 'numpy'
+
+# dictionary encoding: it returns the distinct values sorted as SQLite sorts them (NULL first) and the code of
+# each value, so sorting by code is the same as sorting by value
+def encode(values):
+    distinct = sorted(set(values), key=lambda value: (value is not None, value))
+    codes = {value: code for code, value in enumerate(distinct)}
+    return distinct, np.fromiter((codes[value] for value in values), dtype=np.int32, count=len(values))
+
+
+# numeric columns and their type, and the columns of strings (a list of str or None).
+# hands, countries and surfaces are the dictionaries of the *_hand, *_country and *_surface codes
+COLUMNS = {
+    'player_ids': 'int64',
+    'player_hand': 'int32',
+    'player_country': 'int32',
+    'match_player': 'int32',
+    'match_role': 'int8',
+    'match_surface': 'int32',
+    'stats_player': 'int32',
+    'stats_ace': 'int64',
+}
+STRINGS = ['player_names', 'hands', 'countries', 'surfaces']
+
+
+# it reads the columns from the database, with one query for each table
+def read_columns():
+    columns = {}
+    players = list(Players.objects.order_by('player_id').values_list(
+        'player_id', 'player_name', 'hand__hand_description', 'ioc__country_name'))
+    columns['player_ids'] = player_ids = np.array([row[0] for row in players], dtype=np.int64)
+    columns['player_names'] = [row[1] for row in players]
+    columns['hands'], columns['player_hand'] = encode([row[2] for row in players])
+    columns['countries'], columns['player_country'] = encode([row[3] for row in players])
+
+    matches = list(PlayerMatch.objects.values_list('player_id', 'player_role', 'match_id__tourney_id__surface'))
+    columns['match_player'] = player_index(player_ids, [row[0] for row in matches])
+    columns['match_role'] = np.fromiter((ROLES.get(row[1], 0) for row in matches), dtype=np.int8, count=len(matches))
+    columns['surfaces'], columns['match_surface'] = encode([row[2] for row in matches])
+
+    # the stats linked to their player (aggregates.link_match_stats), a missing value counts as 0 like SUM does
+    stats = list(MatchStats.objects.filter(player_match_id__isnull=False).values_list(
+        'player_match_id__player_id', 'ace'))
+    columns['stats_player'] = player_index(player_ids, [row[0] for row in stats])
+    columns['stats_ace'] = np.fromiter((row[1] or 0 for row in stats), dtype=np.int64, count=len(stats))
+    return columns
+
+# position of each player id in the sorted player_ids
+def player_index(player_ids, ids):
+    return np.searchsorted(player_ids, np.array(ids, dtype=np.int64)).astype(np.int32)
+
+# tokens of the versions of the tables read by read_columns, stored in the database (tennis/cache.py): every
+# write of these tables changes them, and a token is never used twice (a counter is, after a rollback), so they
+# tell if a snapshot has the same data as the database
+def data_versions(versions=None):
+    versions = versions or table_versions(TABLES)
+    return {table: versions[table]['token'] for table in TABLES}
+
+
+# the columns of the tables, from the database or from a snapshot file (tennis/snapshot.py)
+class ColumnarData:
+
+    def __init__(self, version, columns):
+        self.version = version
+        for name in list(COLUMNS) + STRINGS:
+            setattr(self, name, columns[name])
+
+    # wins and losses of each group, where group is the code of the player of each PlayerMatch row
+    def wins_losses(self, group, size):
+        played = np.bincount(group, minlength=size)
+        wins = np.bincount(group, weights=self.match_role == ROLES['winner'], minlength=size).astype(np.int64)
+        losses = np.bincount(group, weights=self.match_role == ROLES['loser'], minlength=size).astype(np.int64)
+        return played, wins, losses
+
+    # same rows as aggregates.most_aces
+    def most_aces(self, limit=10):
+        aces = np.bincount(self.stats_player, weights=self.stats_ace, minlength=len(self.player_ids)).astype(np.int64)
+        # ORDER BY aces DESC, player_id DESC
+        order = np.lexsort((-self.player_ids, -aces))[:limit]
+        return [{'player_name': self.player_names[i], 'total_aces': int(aces[i])} for i in order]
+
+    # same rows as the query of api.countries_with_most_wins. SUM of no winner is NULL (None) in SQL
+    def countries_with_most_wins(self, limit=10):
+        group = self.player_country[self.match_player]
+        played, wins, _ = self.wins_losses(group, len(self.countries))
+        codes = np.flatnonzero(played)
+        # ORDER BY wins DESC (NULL last), country_name ASC (the codes are in the same order as the names)
+        order = codes[np.lexsort((codes, -wins[codes]))][:limit]
+        return [{'player_id__ioc__country_name': self.countries[code], 'wins': int(wins[code]) or None}
+                for code in order]
+
+    # same rows as the query of api.performance_by_hand, ordered by hand description
+    def performance_by_hand(self):
+        group = self.player_hand[self.match_player]
+        played, wins, losses = self.wins_losses(group, len(self.hands))
+        return [{'player_id__hand__hand_description': self.hands[code],
+                 'wins': int(wins[code]) or None, 'losses': int(losses[code]) or None}
+                for code in np.flatnonzero(played)]
+
+
+data = None
+data_lock = threading.Lock()
+
+
+# it returns the columns of the current dataset version, read again from the database when the version changed.
+# The first time, if TENNIS_SNAPSHOT_PATH is set, the columns are mapped from the snapshot file when it was written
+# from the same versions of the tables as the database, so a new worker doesn't run the queries
+def get_data():
+    global data
+    versions = table_versions(TABLES)
+    version = tuple(versions[table]['token'] for table in TABLES)
+    with data_lock:
+        if data is None:
+            columns = snapshot_columns(versions)
+            if columns is not None:
+                data = ColumnarData(version, columns)
+        if data is None or data.version != version:
+            data = ColumnarData(version, read_columns())
+        return data
+
+# it returns the columns of the snapshot file, or None when there is no snapshot or it is not valid:
+# another format, other columns or table versions different from the database (written before a change)
+def snapshot_columns(versions=None):
+    path = getattr(settings, 'TENNIS_SNAPSHOT_PATH', None)
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        snapshot = Snapshot(path)
+    except ValueError:
+        return None
+    names = set(snapshot.manifest['columns']) | set(snapshot.manifest['strings'])
+    if names != set(COLUMNS) | set(STRINGS) or snapshot.manifest['versions'] != data_versions(versions):
+        return None
+    return snapshot.columns()
+
+# it writes the columns read from the database in a snapshot file and it returns its manifest.
+# The columns and the versions are read in one transaction, so they belong to the same data
+def export_snapshot(path):
+    with transaction.atomic():
+        columns = read_columns()
+        versions = data_versions()
+    return write_snapshot(path, {name: columns[name] for name in COLUMNS},
+                          {name: columns[name] for name in STRINGS}, versions)
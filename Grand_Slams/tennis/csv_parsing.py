@@ -0,0 +1,183 @@
+'''
+Helpers to read the csv files in the data folder and convert every row into a dictionary of python values
+ready to be written by the loader. This module does not import Django, so the functions can also run
+outside of the Django process (for example in a pool of worker processes).
+Some reference: https://docs.python.org/3/library/csv.html
+'''
+
+import csv
+import hashlib
+import os
+import time
+from datetime import datetime
+from .scores import score_flags
+
+
+# Helper function to parse dates
+def parse_date(date_str):
+    return datetime.strptime(date_str, '%Y%m%d').date()
+
+# Helper function to convert 'NULL' or 'None' strings to python NoneType
+def nullify(value):
+    if value == 'NULL' or value == 'None' or value == '':
+        return None
+    return value
+
+# Helper function to convert a csv value to an integer, or None when the value is missing
+def to_int(value):
+    value = nullify(value)
+    if value is None:
+        return None
+    return int(value)
+
+
+# it returns the role of the player the stats belong to from the suffix of match_stats_id (e.g. 2014-580-1-w)
+def stats_role(match_stats_id):
+    if match_stats_id.endswith('-w'):
+        return 'winner'
+    if match_stats_id.endswith('-l'):
+        return 'loser'
+    return None
+
+
+# each function converts a csv row in a dictionary where the keys are the model's fields.
+# Foreign keys use the column name of the field (e.g. hand_id) so the loader can write them without fetching the related object
+def tournament_row(row):
+    return {
+        'tourney_id': row[0],
+        'tourney_name': row[1],
+        'surface': row[2],
+        'draw_size': to_int(row[3]),
+        'tourney_level': row[4],
+        'tourney_date': parse_date(row[5]),
+    }
+
+def hand_row(row):
+    return {
+        'hand': row[0],
+        'hand_description': row[1],
+    }
+
+def country_row(row):
+    return {
+        'ioc': row[0],
+        'country_name': row[1],
+    }
+
+def players_row(row):
+    return {
+        'player_id': int(row[0]),
+        'player_name': row[1],
+        'hand_id': row[2],
+        'height': to_int(row[3]),
+        'ioc_id': row[4],
+    }
+
+# the flags of the score (retired, walkover, num_sets, straight_sets) are parsed here, at load time
+def matches_row(row):
+    score = nullify(row[3])
+    best_of = nullify(row[4])
+    return {
+        'match_id': row[0],
+        'tourney_id_id': row[1],
+        'match_num': to_int(row[2]),
+        'score': score,
+        'best_of': best_of,
+        'round': nullify(row[5]),
+        'minutes': to_int(row[6]),
+        **score_flags(score, best_of),
+    }
+
+def match_stats_row(row):
+    return {
+        'match_stats_id': row[0],
+        'match_id_id': row[1],
+        'ace': to_int(row[2]),
+        'df': to_int(row[3]),
+        'svpt': to_int(row[4]),
+        'firstIn': to_int(row[5]),
+        'firstWon': to_int(row[6]),
+        'secondWon': to_int(row[7]),
+        'SvGms': to_int(row[8]),
+        'bpSaved': to_int(row[9]),
+        'bpFaced': to_int(row[10]),
+        'player_role': stats_role(row[0]),
+    }
+
+def player_match_row(row):
+    return {
+        'player_id_id': int(row[0]),
+        'match_id_id': row[1],
+        'player_role': nullify(row[2]),
+        'seed': to_int(row[3]),
+        'entry': nullify(row[4]),
+        'ranking': to_int(row[5]),
+        'ranking_points': to_int(row[6]),
+        'age': to_int(row[7]),
+    }
+
+
+# description of every csv file in the data folder, in the order they have to be loaded.
+# model: name of the model in tennis/models.py
+# key: field used to identify the row (None when the table has an automatic primary key)
+# unique: fields that identify the row in the csv file, used by the ingest command to upsert it
+# references: foreign key fields and the model they point to
+FILES = [
+    {'file': 'Tournament.csv', 'model': 'Tournament', 'key': 'tourney_id', 'unique': ['tourney_id'],
+     'convert': tournament_row, 'references': {}},
+    {'file': 'Hand.csv', 'model': 'Hand', 'key': 'hand', 'unique': ['hand'],
+     'convert': hand_row, 'references': {}},
+    {'file': 'Country.csv', 'model': 'Country', 'key': 'ioc', 'unique': ['ioc'],
+     'convert': country_row, 'references': {}},
+    {'file': 'Players.csv', 'model': 'Players', 'key': 'player_id', 'unique': ['player_id'],
+     'convert': players_row, 'references': {'hand_id': 'Hand', 'ioc_id': 'Country'}},
+    {'file': 'Matches.csv', 'model': 'Matches', 'key': 'match_id', 'unique': ['match_id'],
+     'convert': matches_row, 'references': {'tourney_id_id': 'Tournament'}},
+    {'file': 'Match_Stats.csv', 'model': 'MatchStats', 'key': 'match_stats_id', 'unique': ['match_stats_id'],
+     'convert': match_stats_row, 'references': {'match_id_id': 'Matches'}},
+    {'file': 'Player_Match.csv', 'model': 'PlayerMatch', 'key': None, 'unique': ['player_id_id', 'match_id_id'],
+     'convert': player_match_row, 'references': {'player_id_id': 'Players', 'match_id_id': 'Matches'}},
+]
+
+
+# it reads a csv file skipping the header and it yields lists of converted rows of at most chunk_size elements,
+# so a file is never loaded in memory all at once
+def read_chunks(path, convert, chunk_size=2000):
+    with open(path, newline='') as csv_file:
+        csv_reader = csv.reader(csv_file, delimiter=',')
+        next(csv_reader)
+        chunk = []
+        for line_number, row in enumerate(csv_reader, start=2):
+            try:
+                chunk.append(convert(row))
+            except (IndexError, ValueError) as e:
+                raise ValueError(f"{os.path.basename(path)}, line {line_number}: {e}")
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+# it reads and converts a whole file, returning the list of chunks and the time spent.
+# It is used by the parallel pipeline, where each file is parsed in a worker process
+def parse_file(path, file_name, chunk_size=2000):
+    spec = next(spec for spec in FILES if spec['file'] == file_name)
+    start = time.perf_counter()
+    chunks = list(read_chunks(path, spec['convert'], chunk_size))
+    return chunks, time.perf_counter() - start
+
+# it returns the value used to identify a converted row, e.g. '104745|2014-580-1' for a row of Player_Match.csv
+def row_key(spec, row):
+    return '|'.join(str(row[field]) for field in spec['unique'])
+
+# it returns a short hash of the converted values of a row, used to find out if a row has changed since the last ingest
+def row_digest(row):
+    return hashlib.blake2b(repr(sorted(row.items())).encode(), digest_size=16).hexdigest()
+
+# it returns the sha256 hash of a whole file, read in blocks
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
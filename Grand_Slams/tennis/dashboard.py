@@ -0,0 +1,131 @@
+'''
+Leaderboards of the home page (most aces, wins by country, performance by hand) and the async view /api/dashboard/
+that returns all of them in one response.
+Each section runs in a bounded thread pool (TENNIS_DASHBOARD_WORKERS threads, every thread with its own database
+connection), so the queries run at the same time instead of one after the other, and the view waits for each one
+at most TENNIS_DASHBOARD_TIMEOUT seconds: a slower section is returned with the status 'timeout' and the other
+sections are not delayed. A section that times out keeps running and its result is cached when it ends, like
+the result of every section, until one of the tables it reads changes (the table versions of tennis/cache.py).
+As the other read endpoints, a response where every section succeeded has the ETag and Last-Modified of the
+versions of those tables, and a client that already has it gets a 304 Not Modified.
+The async ORM of Django 4.2 runs the queries in a single thread (sync_to_async), so it would not run them at the
+same time. Under WSGI the view still works, Django runs it in an event loop for each request.
+Some reference: https://docs.djangoproject.com/en/4.2/topics/async/
+https://docs.python.org/3/library/asyncio-task.html#asyncio.wait_for
+'''
+
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import Sum, Case, When, IntegerField
+from django.http import JsonResponse, HttpResponseNotAllowed
+from .aggregates import most_aces
+from .cache import get_cache, table_versions, validators, not_modified_response, set_validators
+from .models import Hand, Country, Players, MatchStats, PlayerMatch
+from . import columnar
+
+logger = logging.getLogger(__name__)
+
+SECTION_KEY = 'tennis:dashboard:{}:{}'
+# message of a section that failed, the error is logged
+ERROR_MESSAGE = 'The section could not be computed'
+
+
+# the leaderboards, computed by the columnar engine (tennis/columnar.py) when TENNIS_ANALYTICS_ENGINE is 'numpy'.
+# Countries with the same number of wins are ordered by name, so both engines return the same rows
+def top_aces(limit=10):
+    if columnar.enabled():
+        return columnar.get_data().most_aces(limit)
+    return most_aces(limit)
+
+def country_wins(limit=10):
+    if columnar.enabled():
+        return columnar.get_data().countries_with_most_wins(limit)
+    return list(PlayerMatch.objects.values('player_id__ioc__country_name').annotate(
+        wins=Sum(Case(When(player_role='winner', then=1), output_field=IntegerField()))
+    ).order_by('-wins', 'player_id__ioc__country_name')[:limit])
+
+def hand_performance():
+    if columnar.enabled():
+        return columnar.get_data().performance_by_hand()
+    return list(PlayerMatch.objects.values('player_id__hand__hand_description').annotate(
+        wins=Sum(Case(When(player_role='winner', then=1), output_field=IntegerField())),
+        losses=Sum(Case(When(player_role='loser', then=1), output_field=IntegerField()))
+    ).order_by('player_id__hand__hand_description'))
+
+
+# sections of the dashboard: function and models it reads
+SECTIONS = {
+    'most_aces': (top_aces, (Players, PlayerMatch, MatchStats)),
+    'countries_most_wins': (country_wins, (PlayerMatch, Players, Country)),
+    'performance_by_hand': (hand_performance, (PlayerMatch, Players, Hand)),
+}
+
+executor = None
+executor_lock = threading.Lock()
+
+
+def get_executor():
+    global executor
+    with executor_lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=getattr(settings, 'TENNIS_DASHBOARD_WORKERS', 4),
+                                          thread_name_prefix='tennis-dashboard')
+        return executor
+
+# it returns the data of a section, from the cache or computed, in a thread of the pool. The connection of the
+# thread is closed at the end like at the end of a request (CONN_MAX_AGE)
+def section_data(name):
+    function, models = SECTIONS[name]
+    close_old_connections()
+    try:
+        tables = [model._meta.db_table for model in models]
+        versions = table_versions(tables)
+        key = SECTION_KEY.format(name, ':'.join(versions[table]['token'] for table in tables))
+        cache = get_cache()
+        data = cache.get(key)
+        if data is None:
+            data = function()
+            cache.set(key, data)
+        return data
+    finally:
+        close_old_connections()
+
+# it waits for a section at most TENNIS_DASHBOARD_TIMEOUT seconds
+async def run_section(name):
+    # the section runs in the context of the request, so its queries are measured by MetricsMiddleware
+    future = asyncio.wrap_future(get_executor().submit(contextvars.copy_context().run, section_data, name))
+    try:
+        data = await asyncio.wait_for(asyncio.shield(future), getattr(settings, 'TENNIS_DASHBOARD_TIMEOUT', 2.0))
+    except asyncio.TimeoutError:
+        return {'status': 'timeout', 'data': None}
+    except Exception:
+        logger.exception('Dashboard section %s failed', name)
+        return {'status': 'error', 'message': ERROR_MESSAGE, 'data': None}
+    return {'status': 'success', 'data': data}
+
+# tables read by the sections, for the ETag of the response
+def section_tables():
+    return sorted({model._meta.db_table for _, models in SECTIONS.values() for model in models})
+
+# GET request with all the sections, run at the same time. A response with a section that timed out or failed has
+# no ETag, so the client asks for the whole response again
+async def dashboard(request):
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    # the versions of the tables are read from the cache or the database, outside of the event loop
+    etag, last_modified = await sync_to_async(validators)('dashboard', request, section_tables())
+    not_modified = await sync_to_async(not_modified_response)(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+    results = await asyncio.gather(*(run_section(name) for name in SECTIONS))
+    response = JsonResponse(dict(zip(SECTIONS, results)), encoder=DjangoJSONEncoder)
+    if all(result['status'] == 'success' for result in results):
+        await sync_to_async(set_validators)(response, etag, last_modified)
+    return response
@@ -0,0 +1,157 @@
+'''
+Incremental ingestion of the csv files in the data folder.
+The hash of every file and of every row ingested is stored in the SourceFile and RowFingerprint tables.
+A file with the same hash as the last run is skipped without being parsed, and inside a changed file only the
+rows with a new hash are written: new rows are inserted and changed rows are updated (upsert), so a run costs
+time proportional to what changed and not to the whole history. The rows without a fingerprint (e.g. after a
+load_tennis) are compared with the rows of the table, the ones that are the same only get their fingerprint.
+Some reference: https://docs.djangoproject.com/en/4.2/ref/models/querysets/#bulk-create (update_conflicts)
+https://www.sqlite.org/lang_upsert.html
+'''
+
+import os
+import sys
+import time
+from django.db import transaction
+from . import models
+from .aggregates import refresh_after_load
+from .cache import bump_dataset_version
+from .csv_parsing import FILES, read_chunks, row_key, row_digest, file_digest
+from .models import SourceFile, RowFingerprint
+from .references import references, MODELS as REFERENCE_MODELS
+
+
+# it checks that the foreign keys of the rows point to rows ingested in this run or already stored.
+# Only the keys not seen in this run (and not in the reference cache) are looked up, with one query per referenced table
+def check_references(spec, rows, ingested):
+    for field, model_name in spec['references'].items():
+        values = {row[field] for row in rows if row[field] is not None} - ingested[model_name]
+        # the hands and the countries already stored are in the reference cache
+        if model_name in REFERENCE_MODELS:
+            values -= references.keys(model_name)
+        if not values:
+            continue
+        model = getattr(models, model_name)
+        stored = set(model.objects.filter(pk__in=values).values_list('pk', flat=True))
+        missing = values - stored
+        if missing:
+            raise ValueError(f"{spec['file']}: {model_name} '{sorted(missing)[0]}' does not exist")
+        ingested[model_name].update(stored)
+
+# it writes the rows, inserting the new ones and updating the ones that already exist
+def upsert(spec, model, rows, batch_size):
+    unique_fields = [model._meta.get_field(field).name for field in spec['unique']]
+    update_fields = [field.name for field in model._meta.concrete_fields
+                     if not field.primary_key and field.attname not in spec['unique']]
+    model.objects.bulk_create([model(**row) for row in rows], batch_size=batch_size,
+                              update_conflicts=True, unique_fields=unique_fields, update_fields=update_fields)
+
+# it returns the values of a row as the model stores them (e.g. best_of as a number), so a row of the csv file and
+# the same row read from the table give the same digest
+def stored_digest(model, row):
+    return row_digest({field: model._meta.get_field(field).to_python(value) for field, value in row.items()})
+
+# it returns the stored digest (stored_digest) of the rows of the chunk already in the table, by row key.
+# It is used for the rows without a fingerprint, e.g. the rows written by the loader (load_tennis)
+def table_digests(spec, model, rows):
+    if not rows:
+        return {}
+    if spec['key']:
+        stored = model.objects.filter(pk__in=[row[spec['key']] for row in rows])
+    else:
+        # the rows with any of the values of each unique field, the pairs not in the chunk are ignored
+        stored = model.objects.filter(**{f"{field}__in": {row[field] for row in rows} for field in spec['unique']})
+    return {row_key(spec, row): stored_digest(model, row) for row in stored.values(*rows[0])}
+
+# it ingests a single csv file and it returns a dictionary with the number of rows inserted, updated and unchanged.
+# All the writes of a file, fingerprints included, are done in one transaction
+def ingest_file(spec, data_folder, ingested, chunk_size=2000, batch_size=500, force=False):
+    model = getattr(models, spec['model'])
+    table = model._meta.db_table
+    path = os.path.join(data_folder, spec['file'])
+    start = time.perf_counter()
+    result = {'file': spec['file'], 'table': table, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'skipped': False}
+
+    digest = file_digest(path)
+    source = SourceFile.objects.filter(file_name=spec['file']).first()
+    if source and source.digest == digest and not force:
+        result['skipped'] = True
+        result['seconds'] = time.perf_counter() - start
+        return result
+
+    seen = set()
+    written = []
+    rows_count = 0
+    with transaction.atomic():
+        for chunk in read_chunks(path, spec['convert'], chunk_size):
+            # a key repeated in the file keeps its first row, as the loader does
+            digests = {}
+            rows = {}
+            for row in chunk:
+                key = row_key(spec, row)
+                if key not in seen:
+                    seen.add(key)
+                    rows[key] = row
+                    digests[key] = row_digest(row)
+            rows_count += len(rows)
+
+            stored = dict(RowFingerprint.objects.filter(table=table, row_key__in=list(digests))
+                          .values_list('row_key', 'digest'))
+            # the rows without a fingerprint can already be in the table (loaded with load_tennis): they are
+            # compared with the stored values, and an equal row only gets its fingerprint
+            in_table = table_digests(spec, model, [rows[key] for key in rows if key not in stored])
+            changed = []
+            fingerprints = []
+            for key in rows:
+                if key in stored:
+                    same = stored[key] == digests[key]
+                else:
+                    same = in_table.get(key) == stored_digest(model, rows[key])
+                if same:
+                    result['unchanged'] += 1
+                    if key not in stored:
+                        fingerprints.append(key)
+                    continue
+                changed.append(key)
+                if key in stored or key in in_table:
+                    result['updated'] += 1
+                else:
+                    result['inserted'] += 1
+
+            if changed:
+                changed_rows = [rows[key] for key in changed]
+                written.extend(changed_rows)
+                check_references(spec, changed_rows, ingested)
+                upsert(spec, model, changed_rows, batch_size)
+                if spec['key']:
+                    ingested[spec['model']].update(row[spec['key']] for row in changed_rows)
+            if changed or fingerprints:
+                RowFingerprint.objects.bulk_create(
+                    [RowFingerprint(table=table, row_key=key, digest=digests[key]) for key in changed + fingerprints],
+                    batch_size=batch_size, update_conflicts=True,
+                    unique_fields=['table', 'row_key'], update_fields=['digest'])
+
+        if written:
+            refresh_after_load(spec['model'], written)
+            # in the transaction of the rows: the next files (and the reference cache) see the new version, and a
+            # file rolled back doesn't leave rows cached with the old one
+            bump_dataset_version(table)
+        SourceFile.objects.update_or_create(file_name=spec['file'], defaults={'digest': digest, 'rows': rows_count})
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+# it ingests all the files in the order given in csv_parsing.FILES and prints a line for each file
+def ingest(data_folder, chunk_size=2000, batch_size=500, force=False, stdout=None):
+    stdout = stdout or sys.stdout
+    # keys written (or checked) in this run, so the references of the next files don't need a query
+    ingested = {spec['model']: set() for spec in FILES if spec['key']}
+    results = []
+    for spec in FILES:
+        result = ingest_file(spec, data_folder, ingested, chunk_size, batch_size, force)
+        if result['skipped']:
+            stdout.write(f"{spec['file']}: unchanged, skipped\n")
+        else:
+            stdout.write(f"{spec['file']}: {result['inserted']} inserted, {result['updated']} updated, "
+                         f"{result['unchanged']} unchanged in {result['seconds']:.2f}s\n")
+        results.append(result)
+    return results
@@ -0,0 +1,105 @@
+'''
+Bulk loader for the csv files in the data folder.
+Instead of creating one object (and fetching every foreign key) per row like scripts/populate_tennis.py,
+each file is read in chunks, the foreign keys are checked against sets of keys kept in memory and the rows
+are written with bulk_create inside one transaction per file.
+Some reference: https://docs.djangoproject.com/en/4.2/ref/models/querysets/#bulk-create
+https://docs.djangoproject.com/en/4.2/topics/db/transactions/
+'''
+
+import os
+import sys
+import time
+from django.db import transaction
+from . import models
+from .aggregates import refresh_after_load
+from .cache import bump_dataset_version
+from .csv_parsing import FILES, read_chunks
+from .references import references, MODELS as REFERENCE_MODELS
+
+
+# it returns the set of primary keys already stored for the model
+def known_keys(model):
+    return set(model.objects.values_list('pk', flat=True))
+
+# it returns the set of the unique fields (e.g. (player_id, match_id) of PlayerMatch) already stored for a file
+# whose table doesn't have a key in the csv file
+def known_unique(spec):
+    model = getattr(models, spec['model'])
+    fields = [model._meta.get_field(field).name for field in spec['unique']]
+    return set(model.objects.values_list(*fields))
+
+# it returns the value that identifies a converted row in the sets of load_keys
+def unique_value(spec, row):
+    return row[spec['key']] if spec['key'] else tuple(row[field] for field in spec['unique'])
+
+# keys of the tables referenced by other files, loaded once from the database.
+# The keys of Hand and Country come from the reference cache (tennis/references.py).
+# The tables without a key (PlayerMatch) have the set of their unique fields, so a second load skips their rows
+def load_keys():
+    keys = {}
+    for spec in FILES:
+        if spec['model'] in REFERENCE_MODELS:
+            keys[spec['model']] = references.keys(spec['model'])
+        elif spec['key']:
+            keys[spec['model']] = known_keys(getattr(models, spec['model']))
+        else:
+            keys[spec['model']] = known_unique(spec)
+    return keys
+
+# it checks that every foreign key of the chunk points to a row that is already loaded
+def check_references(spec, chunk, keys):
+    for field, model_name in spec['references'].items():
+        for row in chunk:
+            value = row[field]
+            if value is not None and value not in keys[model_name]:
+                raise ValueError(f"{spec['file']}: {model_name} '{value}' does not exist")
+
+# it removes the rows whose key (or unique fields) is already stored or repeated in the same file, like ISV in
+# Country.csv. As the row-by-row script would do, the first occurrence of a key is the one kept
+def skip_duplicates(spec, chunk, keys):
+    loaded = keys[spec['model']]
+    new_rows = []
+    for row in chunk:
+        value = unique_value(spec, row)
+        if value not in loaded:
+            loaded.add(value)
+            new_rows.append(row)
+    return new_rows
+
+# it writes the chunks of converted rows of a file and it returns the number of rows written and skipped.
+# The whole file is written in one transaction, so a file is either loaded completely or not at all
+def write_chunks(spec, chunks, keys, batch_size=500):
+    model = getattr(models, spec['model'])
+    count = skipped = 0
+    with transaction.atomic():
+        for chunk in chunks:
+            check_references(spec, chunk, keys)
+            new_rows = skip_duplicates(spec, chunk, keys)
+            model.objects.bulk_create([model(**row) for row in new_rows], batch_size=batch_size)
+            count += len(new_rows)
+            skipped += len(chunk) - len(new_rows)
+        refresh_after_load(spec['model'])
+        # the version changes with the rows, a file rolled back doesn't leave rows cached with the old version
+        if count:
+            bump_dataset_version(model._meta.db_table)
+    return count, skipped
+
+# it loads a single csv file and it returns the number of rows written, the rows skipped and the time spent
+def load_file(spec, data_folder, keys, chunk_size=2000, batch_size=500):
+    path = os.path.join(data_folder, spec['file'])
+    start = time.perf_counter()
+    count, skipped = write_chunks(spec, read_chunks(path, spec['convert'], chunk_size), keys, batch_size)
+    return count, skipped, time.perf_counter() - start
+
+# it loads all the files in the order given in csv_parsing.FILES and it prints the rows per second for each table
+def bulk_load(data_folder, chunk_size=2000, batch_size=500, stdout=None):
+    stdout = stdout or sys.stdout
+    keys = load_keys()
+    results = []
+    for spec in FILES:
+        count, skipped, seconds = load_file(spec, data_folder, keys, chunk_size, batch_size)
+        rate = count / seconds if seconds else 0
+        stdout.write(f"{spec['file']}: {count} rows in {seconds:.2f}s ({rate:.0f} rows/sec), {skipped} skipped\n")
+        results.append({'file': spec['file'], 'rows': count, 'skipped': skipped, 'seconds': seconds})
+    return results
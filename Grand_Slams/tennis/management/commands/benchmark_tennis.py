@@ -0,0 +1,76 @@
+'''
+Some reference: https://docs.djangoproject.com/en/4.2/howto/custom-management-commands/
+Management command to benchmark the loader and the API on a synthetic dataset (tennis/benchmark.py).
+Usage: python manage.py benchmark_tennis [--scale N] [--seed N] [--repeat N] [--output FILE] [--compare FILE]
+                                         [--folder PATH] [--database PATH] [--keep]
+The dataset is loaded in a separate SQLite database (a temporary file unless --database is given), tennis.sqlite3
+is not modified. With --compare the report is compared with a report written by an earlier run.
+The command fails, after writing the report, when a section of the dashboard timed out or failed: its times
+don't measure the whole work.
+'''
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from tennis.benchmark import generate_dataset, benchmark_database, run_benchmark, compare_reports, failed_sections
+
+
+class Command(BaseCommand):
+    help = 'Generates a synthetic dataset (10x, 100x, 1000x the bundled data), loads it and times every endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--output', default='benchmark.json')
+        parser.add_argument('--compare', default=None)
+        parser.add_argument('--data-folder', default=os.path.join(settings.BASE_DIR, 'data'))
+        # folder of the generated csv files and path of the benchmark database, kept with --keep
+        parser.add_argument('--folder', default=None)
+        parser.add_argument('--database', default=None)
+        parser.add_argument('--keep', action='store_true')
+
+    def handle(self, *args, **options):
+        work_folder = tempfile.mkdtemp(prefix='tennis_benchmark_')
+        folder = options['folder'] or os.path.join(work_folder, 'data')
+        database = options['database'] or os.path.join(work_folder, 'benchmark.sqlite3')
+        try:
+            start = time.perf_counter()
+            rows = generate_dataset(folder, options['scale'], options['data_folder'], options['seed'])
+            generate_seconds = time.perf_counter() - start
+            self.stdout.write(f"Generated {rows} in {generate_seconds:.2f}s")
+            with benchmark_database(database, keep=options['keep']):
+                report = run_benchmark(folder, options['scale'], options['seed'], generate_seconds,
+                                       options['repeat'], stdout=self.stdout)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        finally:
+            if not options['keep']:
+                shutil.rmtree(work_folder, ignore_errors=True)
+
+        for name, result in report['endpoints'].items():
+            self.stdout.write(f"{name}: {result['cold_ms']:.1f} ms ({result['queries']} queries), "
+                              f"cached {result['warm_median_ms']} ms")
+        serialization = report['serialization']
+        self.stdout.write(f"serialization of {serialization['rows']} players: "
+                          f"{serialization['model_us_per_row']} us/row with PlayerSerializer, "
+                          f"{serialization['rows_us_per_row']} us/row with PlayerRowSerializer "
+                          f"({serialization['renderer']})")
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(f"Report written to {options['output']}")
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                old = json.load(f)
+            for line in compare_reports(old, report):
+                self.stdout.write(line)
+
+        failed = failed_sections(report)
+        if failed:
+            raise CommandError('Sections not computed: ' + '; '.join(f"{name}: {', '.join(sections)}"
+                                                                    for name, sections in failed.items()))
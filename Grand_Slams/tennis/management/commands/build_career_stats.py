@@ -0,0 +1,23 @@
+'''
+Some reference: https://docs.djangoproject.com/en/4.2/howto/custom-management-commands/
+Management command to rebuild the PlayerCareerStats table from MatchStats and PlayerMatch.
+Usage: python manage.py build_career_stats [--player PLAYER_ID ...]
+'''
+
+from django.core.management.base import BaseCommand
+from tennis.aggregates import update_career_stats
+from tennis.cache import bump_dataset_version
+from tennis.models import PlayerCareerStats
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the career stats (aces, double faults, serve points, matches, wins, losses) of the players'
+
+    def add_arguments(self, parser):
+        # without --player the stats of all the players are rebuilt
+        parser.add_argument('--player', type=int, action='append', dest='players')
+
+    def handle(self, *args, **options):
+        update_career_stats(options['players'])
+        bump_dataset_version()
+        self.stdout.write(f"Career stats rebuilt ({PlayerCareerStats.objects.count()} players)")
@@ -0,0 +1,22 @@
+'''
+Some reference: https://docs.djangoproject.com/en/4.2/howto/custom-management-commands/
+Management command to rebuild the Elo ratings (PlayerRating and RatingHistory) replaying all the matches.
+Usage: python manage.py build_ratings
+'''
+
+import time
+from django.core.management.base import BaseCommand
+from tennis.cache import bump_dataset_version
+from tennis.models import PlayerRating, RatingHistory
+from tennis.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the Elo ratings of the players replaying all the matches in the order they were played'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        rebuild_ratings()
+        bump_dataset_version()
+        self.stdout.write(f"Ratings rebuilt ({PlayerRating.objects.count()} ratings, "
+                          f"{RatingHistory.objects.count()} changes) in {time.perf_counter() - start:.2f}s")
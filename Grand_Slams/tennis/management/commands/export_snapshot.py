@@ -0,0 +1,34 @@
+'''
+Some reference: https://docs.djangoproject.com/en/4.2/howto/custom-management-commands/
+Management command to export the columns of the columnar engine (tennis/columnar.py) to a snapshot file
+(tennis/snapshot.py) that the workers map in memory at start, instead of reading the tables.
+Usage: python manage.py export_snapshot [--output PATH]
+The default path is TENNIS_SNAPSHOT_PATH, the file the workers read. NumPy is needed.
+'''
+
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from tennis import columnar
+
+
+class Command(BaseCommand):
+    help = 'Exports the players, matches and stats columns to a memory-mapped snapshot file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=getattr(settings, 'TENNIS_SNAPSHOT_PATH', None))
+
+    def handle(self, *args, **options):
+        if columnar.np is None:
+            raise CommandError('NumPy is not installed')
+        if not options['output']:
+            raise CommandError('No output path: set TENNIS_SNAPSHOT_PATH or use --output')
+        start = time.perf_counter()
+        try:
+            manifest = columnar.export_snapshot(options['output'])
+        except OSError as e:
+            raise CommandError(str(e))
+        size = os.path.getsize(options['output'])
+        self.stdout.write(f"Snapshot written to {options['output']} ({size} bytes, versions {manifest['versions']}) "
+                          f"in {time.perf_counter() - start:.2f}s")
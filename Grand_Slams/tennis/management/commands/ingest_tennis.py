@@ -0,0 +1,29 @@
+'''
+Some reference: https://docs.djangoproject.com/en/4.2/howto/custom-management-commands/
+Management command to ingest new or changed rows of the csv files in the data folder (e.g. a new season).
+Files and rows that didn't change since the last run are skipped, changed rows are updated and new rows inserted.
+Usage: python manage.py ingest_tennis [--data-folder PATH] [--chunk-size N] [--batch-size N] [--force]
+'''
+
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from tennis.ingest import ingest
+
+
+class Command(BaseCommand):
+    help = 'Incrementally ingests the csv files in the data folder, skipping unchanged files and rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data-folder', default=os.path.join(settings.BASE_DIR, 'data'))
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--batch-size', type=int, default=500)
+        # --force parses the files even when their hash didn't change
+        parser.add_argument('--force', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            ingest(options['data_folder'], options['chunk_size'], options['batch_size'],
+                   force=options['force'], stdout=self.stdout)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
@@ -0,0 +1,33 @@
+'''
+Some reference: https://docs.djangoproject.com/en/4.2/howto/custom-management-commands/
+Management command to load the csv files of the data folder with the bulk loader.
+Usage: python manage.py load_tennis [--data-folder PATH] [--chunk-size N] [--batch-size N] [--parallel [--workers N]]
+With --parallel the files are parsed in a pool of processes while a single writer loads them in dependency order.
+'''
+
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from tennis.loader import bulk_load
+from tennis.pipeline import run_pipeline
+
+
+class Command(BaseCommand):
+    help = 'Loads the csv files in the data folder using batched bulk_create, one transaction per file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data-folder', default=os.path.join(settings.BASE_DIR, 'data'))
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--parallel', action='store_true')
+        parser.add_argument('--workers', type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            if options['parallel']:
+                run_pipeline(options['data_folder'], options['workers'], options['chunk_size'],
+                             options['batch_size'], stdout=self.stdout)
+                return
+            bulk_load(options['data_folder'], options['chunk_size'], options['batch_size'], stdout=self.stdout)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
@@ -0,0 +1,209 @@
+'''
+Some reference: https://docs.djangoproject.com/en/4.2/topics/http/middleware/
+https://docs.djangoproject.com/en/4.2/topics/db/instrumentation/
+Middleware that measures every request: number of queries, time spent in the database, time spent rendering
+(serializing) the response, total time and size of the response. The measures are kept in memory for each url name
+of tennis/urls.py, the last TENNIS_METRICS_WINDOW requests of each one, and they are shown as percentiles by the
+/api/_metrics/ endpoints. A request slower than TENNIS_SLOW_REQUEST_MS is logged with a single record: the message
+has its TENNIS_SLOW_REQUEST_QUERIES slowest queries and the extra attribute queries has all of them.
+The recorder of a request is kept in a context variable and every database connection has an execute wrapper that
+passes the queries to it, so the queries are recorded in any thread that runs the request: the thread of a WSGI
+request, the threads where the sync views run under ASGI (sync_to_async copies the context) and the threads of
+the dashboard (tennis/dashboard.py).
+https://docs.python.org/3/library/contextvars.html
+'''
+
+import logging
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger('tennis.slow_requests')
+
+# measures kept for each request
+FIELDS = ['total_ms', 'db_ms', 'queries', 'serialize_ms', 'size']
+PERCENTILES = [50, 95, 99]
+
+# QueryRecorder of the request being run
+current_recorder = ContextVar('tennis_query_recorder', default=None)
+
+
+# it records the queries run through the database connection, with their time
+class QueryRecorder:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = []
+        self.seconds = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            # the queries of a request can run in more than one thread at the same time (the dashboard)
+            with self.lock:
+                self.seconds += duration
+                self.queries.append({'sql': sql, 'params': params, 'ms': round(duration * 1000, 3)})
+
+
+# execute wrapper of every connection, it passes the queries to the recorder of the current request if there is one
+def record_queries(execute, sql, params, many, context):
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+# it adds record_queries to a connection, once: the wrappers are kept when the connection is opened again
+@receiver(connection_created)
+def install_recorder(sender, connection, **kwargs):
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+# measures of the last requests of each url name, shared by the threads of the process
+class Metrics:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.samples = defaultdict(self.new_window)
+            self.requests = defaultdict(int)
+
+    def new_window(self):
+        return deque(maxlen=getattr(settings, 'TENNIS_METRICS_WINDOW', 1000))
+
+    def record(self, name, sample):
+        with self.lock:
+            self.samples[name].append(sample)
+            self.requests[name] += 1
+
+    # nearest-rank percentile of a sorted list
+    @staticmethod
+    def percentile(values, p):
+        index = max(0, math.ceil(p / 100 * len(values)) - 1)
+        return values[index]
+
+    # for each url name: the number of requests and, for each measure, the percentiles, the mean and the sum
+    # of the requests in the window
+    def summary(self):
+        with self.lock:
+            samples = {name: list(window) for name, window in self.samples.items()}
+            requests = dict(self.requests)
+        result = {}
+        for name, window in samples.items():
+            views = {'requests': requests[name], 'window': len(window)}
+            for field in FIELDS:
+                values = sorted(sample[field] for sample in window)
+                stats = {f"p{p}": self.percentile(values, p) for p in PERCENTILES}
+                stats['mean'] = round(sum(values) / len(values), 3)
+                stats['sum'] = round(sum(values), 3)
+                views[field] = stats
+            result[name] = views
+        return result
+
+
+metrics = Metrics()
+
+
+# it can run in the sync (WSGI) and in the async (ASGI) chain of middleware. In both the recorder is set in the
+# context of the request, the queries are recorded by the execute wrapper of the connection of each thread
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # the connection of this thread may have been opened before the receiver was connected
+        install_recorder(None, connection)
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.record(request, response, time.perf_counter() - start, recorder)
+        return response
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.record(request, response, time.perf_counter() - start, recorder)
+        return response
+
+    def record(self, request, response, total, recorder):
+        # only the urls with a name in tennis/urls.py are measured
+        match = request.resolver_match
+        if match is None or not match.url_name:
+            return
+        size = 0 if response.streaming else len(response.content)
+        sample = {
+            'total_ms': round(total * 1000, 3),
+            'db_ms': round(recorder.seconds * 1000, 3),
+            'queries': len(recorder.queries),
+            'serialize_ms': round(getattr(request, 'tennis_render_seconds', 0) * 1000, 3),
+            'size': size,
+        }
+        metrics.record(match.url_name, sample)
+
+        slow_ms = getattr(settings, 'TENNIS_SLOW_REQUEST_MS', None)
+        if slow_ms is not None and sample['total_ms'] >= slow_ms:
+            # one record for the request, so the lines of concurrent requests are not mixed in the log
+            slowest = sorted(recorder.queries, key=lambda query: query['ms'], reverse=True)
+            slowest = slowest[:getattr(settings, 'TENNIS_SLOW_REQUEST_QUERIES', 10)]
+            lines = ''.join(f"\n  {query['ms']:.3f} ms: {query['sql']} {query['params']}" for query in slowest)
+            logger.warning('Slow request %s %s (%s): %s, slowest queries:%s', request.method, request.get_full_path(),
+                           match.url_name, sample, lines, extra={'queries': recorder.queries})
+
+    # DRF responses are rendered (converted to JSON) after the view, the time is taken with a post-render callback
+    def process_template_response(self, request, response):
+        start = time.perf_counter()
+
+        def rendered(response):
+            request.tennis_render_seconds = time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+# it writes the summary in the Prometheus text format, one summary metric for each measure
+# Some reference: https://prometheus.io/docs/instrumenting/exposition_formats/
+def prometheus_text(summary):
+    lines = []
+    for field in FIELDS:
+        metric = f"tennis_request_{field}"
+        lines.append(f"# HELP {metric} {field} of the requests, by url name")
+        lines.append(f"# TYPE {metric} summary")
+        for name, views in summary.items():
+            for p in PERCENTILES:
+                lines.append(f'{metric}{{view="{name}",quantile="{p / 100}"}} {views[field][f"p{p}"]}')
+            lines.append(f'{metric}_sum{{view="{name}"}} {views[field]["sum"]}')
+            lines.append(f'{metric}_count{{view="{name}"}} {views["window"]}')
+    lines.append("# HELP tennis_requests_total requests measured since the start of the process, by url name")
+    lines.append("# TYPE tennis_requests_total counter")
+    for name, views in summary.items():
+        lines.append(f'tennis_requests_total{{view="{name}"}} {views["requests"]}')
+    return "\n".join(lines) + "\n"
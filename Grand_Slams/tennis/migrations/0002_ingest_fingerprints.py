@@ -0,0 +1,45 @@
+# Generated by Django 4.2.13 on 2026-10-18 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tennis', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RowFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=50)),
+                ('row_key', models.CharField(max_length=200)),
+                ('digest', models.CharField(max_length=32)),
+            ],
+            options={
+                'db_table': 'tennis_rowfingerprint',
+            },
+        ),
+        migrations.CreateModel(
+            name='SourceFile',
+            fields=[
+                ('file_name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('digest', models.CharField(max_length=64)),
+                ('rows', models.IntegerField(default=0)),
+                ('ingested_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'tennis_sourcefile',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='playermatch',
+            constraint=models.UniqueConstraint(fields=('player_id', 'match_id'), name='unique_player_match'),
+        ),
+        migrations.AddConstraint(
+            model_name='rowfingerprint',
+            constraint=models.UniqueConstraint(fields=('table', 'row_key'), name='unique_row_fingerprint'),
+        ),
+    ]
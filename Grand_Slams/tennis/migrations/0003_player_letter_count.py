@@ -0,0 +1,39 @@
+# Generated by Django 4.2.13 on 2026-10-18 18:08
+
+import string
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Left, Upper
+
+
+# it counts the existing players for each letter, letters without players included, so the counts can be read as
+# soon as the database is migrated. Same counts as aggregates.rebuild_letter_counts at the time of this migration
+def backfill(apps, schema_editor):
+    Players = apps.get_model('tennis', 'Players')
+    PlayerLetterCount = apps.get_model('tennis', 'PlayerLetterCount')
+    grouped = (Players.objects.annotate(letter=Upper(Left('player_name', 1)))
+               .values('letter').annotate(count=Count('player_id')))
+    counts = {row['letter']: row['count'] for row in grouped}
+    PlayerLetterCount.objects.bulk_create(
+        [PlayerLetterCount(letter=letter, count=counts.get(letter, 0)) for letter in string.ascii_uppercase])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tennis', '0002_ingest_fingerprints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerLetterCount',
+            fields=[
+                ('letter', models.CharField(max_length=1, primary_key=True, serialize=False)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'tennis_playerlettercount',
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
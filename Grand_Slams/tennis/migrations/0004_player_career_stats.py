@@ -0,0 +1,29 @@
+# Generated by Django 4.2.13 on 2026-10-18 18:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tennis', '0003_player_letter_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerCareerStats',
+            fields=[
+                ('player_id', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='tennis.players')),
+                ('aces', models.IntegerField(db_index=True, default=0)),
+                ('double_faults', models.IntegerField(default=0)),
+                ('serve_points', models.IntegerField(default=0)),
+                ('matches', models.IntegerField(default=0)),
+                ('wins', models.IntegerField(default=0)),
+                ('losses', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'tennis_playercareerstats',
+            },
+        ),
+    ]
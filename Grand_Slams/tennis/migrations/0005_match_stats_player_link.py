@@ -0,0 +1,70 @@
+# Generated by Django 4.2.13 on 2026-10-18 18:10
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+import django.db.models.deletion
+
+
+# it fills the career stats table (0004) of the existing players, now that the stats are linked to them, so the
+# aces leaderboard can be read as soon as the database is migrated. Same totals as aggregates.career_totals at the
+# time of this migration
+def backfill_career_stats(apps):
+    Players = apps.get_model('tennis', 'Players')
+    PlayerMatch = apps.get_model('tennis', 'PlayerMatch')
+    MatchStats = apps.get_model('tennis', 'MatchStats')
+    PlayerCareerStats = apps.get_model('tennis', 'PlayerCareerStats')
+    matches = {row['player_id']: row for row in PlayerMatch.objects.values('player_id').annotate(
+        played=Count('id'),
+        wins=Count('id', filter=Q(player_role='winner')),
+        losses=Count('id', filter=Q(player_role='loser')))}
+    stats = {row['player']: row for row in MatchStats.objects.filter(player_match_id__isnull=False).values(
+        player=F('player_match_id__player_id')).annotate(
+        aces=Sum('ace'),
+        double_faults=Sum('df'),
+        serve_points=Sum('svpt'))}
+    totals = []
+    for player_id in Players.objects.values_list('player_id', flat=True):
+        played = matches.get(player_id, {})
+        served = stats.get(player_id, {})
+        totals.append(PlayerCareerStats(
+            player_id_id=player_id,
+            aces=served.get('aces') or 0,
+            double_faults=served.get('double_faults') or 0,
+            serve_points=served.get('serve_points') or 0,
+            matches=played.get('played', 0),
+            wins=played.get('wins', 0),
+            losses=played.get('losses', 0)))
+    PlayerCareerStats.objects.all().delete()
+    PlayerCareerStats.objects.bulk_create(totals, batch_size=500)
+
+# it fills the new columns of the existing rows: the role comes from the -w/-l suffix of match_stats_id
+# and the PlayerMatch row is the one of the same match with the same role
+def backfill(apps, schema_editor):
+    MatchStats = apps.get_model('tennis', 'MatchStats')
+    PlayerMatch = apps.get_model('tennis', 'PlayerMatch')
+    MatchStats.objects.filter(match_stats_id__endswith='-w').update(player_role='winner')
+    MatchStats.objects.filter(match_stats_id__endswith='-l').update(player_role='loser')
+    player_match = PlayerMatch.objects.filter(match_id=OuterRef('match_id'), player_role=OuterRef('player_role'))
+    MatchStats.objects.filter(player_role__isnull=False).update(
+        player_match_id=Subquery(player_match.values('id')[:1]))
+    backfill_career_stats(apps)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tennis', '0004_player_career_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matchstats',
+            name='player_match_id',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='tennis.playermatch'),
+        ),
+        migrations.AddField(
+            model_name='matchstats',
+            name='player_role',
+            field=models.CharField(db_index=True, max_length=10, null=True),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
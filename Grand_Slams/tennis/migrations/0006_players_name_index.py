@@ -0,0 +1,17 @@
+# Generated by Django 4.2.13 on 2026-10-18 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tennis', '0005_match_stats_player_link'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='players',
+            index=models.Index(fields=['player_name', 'player_id'], name='players_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.13 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tennis', '0006_players_name_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='playermatch',
+            index=models.Index(fields=['player_id', 'player_role'], name='playermatch_player_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='playermatch',
+            index=models.Index(fields=['match_id', 'player_role'], name='playermatch_match_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tournament',
+            index=models.Index(fields=['tourney_name'], name='tournament_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tournament',
+            index=models.Index(fields=['tourney_date'], name='tournament_date_idx'),
+        ),
+    ]
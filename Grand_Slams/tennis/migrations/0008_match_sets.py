@@ -0,0 +1,125 @@
+# Generated by Django 4.2.13 on 2026-10-18 18:21
+
+import re
+from django.db import migrations, models
+import django.db.models.deletion
+
+# frozen copy of tennis/scores.py at the time of this migration, the scores of the existing matches are parsed with
+# the rules of the migration even if the module changes later
+SET_PATTERN = re.compile(r'^(\d+)-(\d+)(?:\((\d+)\))?$')
+RETIRED = {'RET', 'DEF'}
+WALKOVER = 'W/O'
+
+
+# the sets of a score and the flags of the match, as tennis.scores.parse_score
+def parse_score(score, best_of=None):
+    sets = []
+    retired = False
+    walkover = False
+    for token in (score or '').split():
+        if token in RETIRED:
+            retired = True
+            continue
+        if token == WALKOVER:
+            walkover = True
+            continue
+        match = SET_PATTERN.match(token)
+        if not match:
+            continue
+        won, lost = int(match.group(1)), int(match.group(2))
+        tiebreak = match.group(3) is not None or {won, lost} == {6, 7}
+        sets.append({
+            'set_number': len(sets) + 1,
+            'games_won': won,
+            'games_lost': lost,
+            'tiebreak': tiebreak,
+            'tiebreak_points': int(match.group(3)) if match.group(3) is not None else None,
+            'set_winner': 'winner' if won > lost else 'loser' if lost > won else None,
+        })
+
+    num_sets = len(sets) if score else None
+    needed = int(best_of) // 2 + 1 if best_of and str(best_of).isdigit() else None
+    straight_sets = (not retired and not walkover and bool(sets)
+                     and all(played['set_winner'] == 'winner' for played in sets)
+                     and (needed is None or len(sets) == needed))
+    return {'sets': sets, 'retired': retired, 'walkover': walkover, 'num_sets': num_sets,
+            'straight_sets': straight_sets}
+
+
+# it parses the scores of the existing matches: the flags are written on the matches and the sets in MatchSets
+def backfill(apps, schema_editor):
+    Matches = apps.get_model('tennis', 'Matches')
+    MatchSets = apps.get_model('tennis', 'MatchSets')
+    matches = []
+    sets = []
+    for match in Matches.objects.only('match_id', 'score', 'best_of'):
+        parsed = parse_score(match.score, match.best_of)
+        for field in ('retired', 'walkover', 'num_sets', 'straight_sets'):
+            setattr(match, field, parsed[field])
+        matches.append(match)
+        sets.extend(MatchSets(match_id_id=match.match_id, **played) for played in parsed['sets'])
+    Matches.objects.bulk_update(matches, ['retired', 'walkover', 'num_sets', 'straight_sets'], batch_size=500)
+    MatchSets.objects.bulk_create(sets, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tennis', '0007_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchSets',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('set_number', models.IntegerField()),
+                ('games_won', models.IntegerField()),
+                ('games_lost', models.IntegerField()),
+                ('tiebreak', models.BooleanField(default=False)),
+                ('tiebreak_points', models.IntegerField(null=True)),
+                ('set_winner', models.CharField(max_length=10, null=True)),
+            ],
+            options={
+                'db_table': 'tennis_matchsets',
+            },
+        ),
+        migrations.AddField(
+            model_name='matches',
+            name='num_sets',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='matches',
+            name='retired',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='matches',
+            name='straight_sets',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='matches',
+            name='walkover',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='matches',
+            index=models.Index(fields=['num_sets', 'retired'], name='matches_sets_retired_idx'),
+        ),
+        migrations.AddField(
+            model_name='matchsets',
+            name='match_id',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tennis.matches'),
+        ),
+        migrations.AddIndex(
+            model_name='matchsets',
+            index=models.Index(fields=['tiebreak', 'match_id', 'set_winner'], name='matchsets_tiebreak_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='matchsets',
+            constraint=models.UniqueConstraint(fields=('match_id', 'set_number'), name='unique_match_set'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 4.2.13 on 2026-10-18 18:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# frozen copy of tennis/ratings.py at the time of this migration, the ratings of the existing matches are built
+# with the rules of the migration even if the module changes later
+INITIAL_RATING = 1500
+OVERALL = 'All'
+ROUNDS = {'Q1': 1, 'Q2': 2, 'Q3': 3, 'RR': 4, 'R128': 5, 'R64': 6, 'R32': 7, 'R16': 8, 'QF': 9, 'SF': 10,
+          'BR': 11, 'F': 12}
+
+
+def match_order(match):
+    return (match['tourney_id__tourney_date'] is None, match['tourney_id__tourney_date'],
+            ROUNDS.get(match['round'], 0), match['match_num'] or 0, match['match_id'])
+
+# the matches to rate in replay order, with their winner and loser. Walkovers and matches without both players
+# are left out
+def rated_matches(Matches, PlayerMatch):
+    roles = {}
+    for match_id, player_id, role in PlayerMatch.objects.filter(player_role__in=['winner', 'loser']).values_list(
+            'match_id', 'player_id', 'player_role'):
+        roles.setdefault(match_id, {})[role] = player_id
+    result = []
+    for match in Matches.objects.filter(walkover=False).values('match_id', 'match_num', 'round',
+                                                               'tourney_id__tourney_date', 'tourney_id__surface'):
+        players = roles.get(match['match_id'], {})
+        if 'winner' in players and 'loser' in players:
+            result.append({**match, 'winner': players['winner'], 'loser': players['loser']})
+    result.sort(key=match_order)
+    return result
+
+# it replays all the existing matches and it stores the ratings, so the rating endpoints can be read as soon as
+# the database is migrated
+def backfill(apps, schema_editor):
+    Matches = apps.get_model('tennis', 'Matches')
+    PlayerMatch = apps.get_model('tennis', 'PlayerMatch')
+    PlayerRating = apps.get_model('tennis', 'PlayerRating')
+    RatingHistory = apps.get_model('tennis', 'RatingHistory')
+    surfaces_on = getattr(settings, 'TENNIS_ELO_SURFACES', True)
+    ratings = {}
+    history = []
+    for sequence, match in enumerate(rated_matches(Matches, PlayerMatch)):
+        surfaces = [OVERALL] + ([match['tourney_id__surface']] if surfaces_on and match['tourney_id__surface'] else [])
+        for surface in surfaces:
+            winner = ratings.setdefault((match['winner'], surface), [INITIAL_RATING, 0])
+            loser = ratings.setdefault((match['loser'], surface), [INITIAL_RATING, 0])
+            expected = 1 / (1 + 10 ** ((loser[0] - winner[0]) / 400))
+            for player_id, rating, change in ((match['winner'], winner, 1 - expected),
+                                              (match['loser'], loser, expected - 1)):
+                before = rating[0]
+                rating[0] += 250 / (rating[1] + 5) ** 0.4 * change
+                rating[1] += 1
+                history.append(RatingHistory(player_id_id=player_id, match_id_id=match['match_id'], surface=surface,
+                                             sequence=sequence, tourney_date=match['tourney_id__tourney_date'],
+                                             rating_before=before, rating_after=rating[0]))
+    RatingHistory.objects.bulk_create(history, batch_size=500)
+    PlayerRating.objects.bulk_create([PlayerRating(player_id_id=player_id, surface=surface, rating=rating,
+                                                   matches=matches)
+                                      for (player_id, surface), (rating, matches) in ratings.items()], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tennis', '0008_match_sets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('surface', models.CharField(max_length=20)),
+                ('sequence', models.IntegerField(db_index=True)),
+                ('tourney_date', models.DateField(null=True)),
+                ('rating_before', models.FloatField()),
+                ('rating_after', models.FloatField()),
+                ('match_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tennis.matches')),
+                ('player_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tennis.players')),
+            ],
+            options={
+                'db_table': 'tennis_ratinghistory',
+                'indexes': [models.Index(fields=['player_id', 'surface', 'sequence'], name='ratinghistory_player_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PlayerRating',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('surface', models.CharField(max_length=20)),
+                ('rating', models.FloatField()),
+                ('matches', models.IntegerField(default=0)),
+                ('player_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tennis.players')),
+            ],
+            options={
+                'db_table': 'tennis_playerrating',
+                'indexes': [models.Index(fields=['surface', '-rating'], name='playerrating_surface_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='playerrating',
+            constraint=models.UniqueConstraint(fields=('player_id', 'surface'), name='unique_player_rating'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
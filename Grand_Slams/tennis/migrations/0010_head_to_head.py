@@ -0,0 +1,77 @@
+# Generated by Django 4.2.13 on 2026-10-18 18:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# order of the rounds in a tournament (tennis/ratings.py at the time of this migration), unknown rounds first
+ROUNDS = {'Q1': 1, 'Q2': 2, 'Q3': 3, 'RR': 4, 'R128': 5, 'R64': 6, 'R32': 7, 'R16': 8, 'QF': 9, 'SF': 10,
+          'BR': 11, 'F': 12}
+
+
+def match_order(match):
+    return (match['tourney_id__tourney_date'] is None, match['tourney_id__tourney_date'],
+            ROUNDS.get(match['round'], 0), match['match_num'] or 0, match['match_id'])
+
+# it builds the head-to-head of every pair of players from the existing matches (walkovers and matches without
+# both players left out), in the order they were played, so the endpoint can be read as soon as the database is
+# migrated. Same rows as aggregates.rebuild_head_to_head at the time of this migration
+def backfill(apps, schema_editor):
+    Matches = apps.get_model('tennis', 'Matches')
+    PlayerMatch = apps.get_model('tennis', 'PlayerMatch')
+    HeadToHead = apps.get_model('tennis', 'HeadToHead')
+    roles = {}
+    for match_id, player_id, role in PlayerMatch.objects.filter(player_role__in=['winner', 'loser']).values_list(
+            'match_id', 'player_id', 'player_role'):
+        roles.setdefault(match_id, {})[role] = player_id
+    matches = []
+    for match in Matches.objects.filter(walkover=False).values('match_id', 'match_num', 'round',
+                                                               'tourney_id__tourney_date', 'tourney_id__surface'):
+        players = roles.get(match['match_id'], {})
+        if 'winner' in players and 'loser' in players:
+            matches.append({**match, 'winner': players['winner'], 'loser': players['loser']})
+    matches.sort(key=match_order)
+    rows = {}
+    for match in matches:
+        a, b = sorted((match['winner'], match['loser']))
+        row = rows.get((a, b))
+        if row is None:
+            row = rows[(a, b)] = HeadToHead(pair=f"{a}-{b}", player_a_id=a, player_b_id=b, surfaces={})
+        if match['winner'] == a:
+            row.player_a_wins += 1
+        else:
+            row.player_b_wins += 1
+        surface = match['tourney_id__surface']
+        if surface:
+            row.surfaces[surface] = row.surfaces.get(surface, 0) + 1
+        row.last_match_id = match['match_id']
+        row.last_date = match['tourney_id__tourney_date']
+        row.last_winner_id = match['winner']
+    HeadToHead.objects.bulk_create(list(rows.values()), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tennis', '0009_elo_ratings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeadToHead',
+            fields=[
+                ('pair', models.CharField(max_length=30, primary_key=True, serialize=False)),
+                ('player_a_wins', models.IntegerField(default=0)),
+                ('player_b_wins', models.IntegerField(default=0)),
+                ('surfaces', models.JSONField(default=dict)),
+                ('last_date', models.DateField(null=True)),
+                ('last_match', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tennis.matches')),
+                ('last_winner', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tennis.players')),
+                ('player_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='head_to_head_a', to='tennis.players')),
+                ('player_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='head_to_head_b', to='tennis.players')),
+            ],
+            options={
+                'db_table': 'tennis_headtohead',
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-18 21:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tennis', '0012_table_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idsequence',
+            name='generation',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
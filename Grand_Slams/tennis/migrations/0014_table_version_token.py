@@ -0,0 +1,46 @@
+# Generated by Django 4.2.13 on 2026-10-18 22:30
+
+import time
+import uuid
+from django.db import migrations, models
+
+# tables whose changes are tracked (tennis/cache.py)
+TABLES = ['tennis_tournament', 'tennis_hand', 'tennis_country', 'tennis_players', 'tennis_matches',
+          'tennis_matchstats', 'tennis_playermatch']
+
+
+# every table gets a version with a token, so the first responses have an ETag and a Last-Modified date
+def create_versions(apps, schema_editor):
+    TableVersion = apps.get_model('tennis', 'TableVersion')
+    modified = int(time.time())
+    for table in TABLES:
+        version, _ = TableVersion.objects.get_or_create(table=table)
+        version.token = uuid.uuid4().hex
+        version.modified = modified
+        version.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tennis', '0013_id_sequence_generation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tableversion',
+            name='modified',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tableversion',
+            name='previous_token',
+            field=models.CharField(default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='tableversion',
+            name='token',
+            field=models.CharField(default='', max_length=32),
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -16,9 +16,15 @@ class Tournament(models.Model):
     def __str__(self):
         return f"{self.tourney_name} ({self.tourney_date})"
     
-    # specify the table name in the database
+    # specify the table name in the database.
+    # tourney_name is read by the tournaments endpoint (SELECT DISTINCT) and tourney_date by the years endpoint,
+    # the indexes let SQLite read them without reading the table
     class Meta:
         db_table = 'tennis_tournament'
+        indexes = [
+            models.Index(fields=['tourney_name'], name='tournament_name_idx'),
+            models.Index(fields=['tourney_date'], name='tournament_date_idx'),
+        ]
 
 # define the hand table in the database and its fields 
 class Hand(models.Model):
@@ -55,9 +61,13 @@ class Players(models.Model):
     def __str__(self):
         return f"{self.player_name} ({self.ioc})"
     
-    # specify the table name in the database
+    # specify the table name in the database.
+    # The index on (player_name, player_id) is used by the pages of players ordered by name (tennis/pagination.py)
     class Meta:
         db_table = 'tennis_players'
+        indexes = [
+            models.Index(fields=['player_name', 'player_id'], name='players_name_id_idx'),
+        ]
 
 # define the matches table in the database and its fields
 class Matches(models.Model):
@@ -68,13 +78,23 @@ class Matches(models.Model):
     best_of = models.CharField(max_length=5, null=True)
     round = models.CharField(max_length=10, null=True)
     minutes = models.IntegerField(null=True)
+    # flags of the score, set by the parser in scores.py when the match is loaded or saved:
+    # retired (RET or DEF), walkover (W/O), sets played and a win without losing a set
+    retired = models.BooleanField(default=False)
+    walkover = models.BooleanField(default=False)
+    num_sets = models.IntegerField(null=True)
+    straight_sets = models.BooleanField(default=False)
 
     def __str__(self):
         return f"Match {self.match_id} in {self.tourney_id.tourney_name}"
     
-    # specify the table name in the database
+    # specify the table name in the database.
+    # (num_sets, retired) is used to find the five-set matches played to the end
     class Meta:
         db_table = 'tennis_matches'
+        indexes = [
+            models.Index(fields=['num_sets', 'retired'], name='matches_sets_retired_idx'),
+        ]
 
 # define the matchstats table in the database and its fields
 class MatchStats(models.Model):
@@ -89,6 +109,10 @@ class MatchStats(models.Model):
     SvGms = models.IntegerField(null=True)
     bpSaved = models.IntegerField(null=True)
     bpFaced = models.IntegerField(null=True)
+    # the player the stats belong to: player_role is 'winner' for the ids ending with -w and 'loser' for the ids
+    # ending with -l, player_match_id is the PlayerMatch row of the same match with the same role
+    player_role = models.CharField(max_length=10, null=True, db_index=True)
+    player_match_id = models.ForeignKey('PlayerMatch', on_delete=models.SET_NULL, null=True)
 
     def __str__(self):
         return f"MatchStats ID: {self.match_stats_id}, Match ID: {self.match_id.match_id}"
@@ -111,6 +135,210 @@ class PlayerMatch(models.Model):
     def __str__(self):
         return f"{self.player_id.player_name} in match {self.match_id.match_id}"
     
+    # specify the table name in the database.
+    # A player appears only once in a match, the constraint is used by the ingest command to upsert the rows.
+    # (player_id, player_role) covers the wins/losses grouped by country and hand, (match_id, player_role)
+    # is used to find the winner or the loser of a match (e.g. to link the MatchStats rows)
+    class Meta:
+        db_table = 'tennis_playermatch'
+        constraints = [
+            models.UniqueConstraint(fields=['player_id', 'match_id'], name='unique_player_match'),
+        ]
+        indexes = [
+            models.Index(fields=['player_id', 'player_role'], name='playermatch_player_role_idx'),
+            models.Index(fields=['match_id', 'player_role'], name='playermatch_match_role_idx'),
+        ]
+
+# define the sourcefile table, it stores the hash of each csv file ingested by the ingest_tennis command
+class SourceFile(models.Model):
+    file_name = models.CharField(max_length=100, primary_key=True)
+    digest = models.CharField(max_length=64)
+    rows = models.IntegerField(default=0)
+    ingested_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.file_name} ({self.digest[:12]})"
+
+    # specify the table name in the database
+    class Meta:
+        db_table = 'tennis_sourcefile'
+
+# define the rowfingerprint table, it stores the hash of every csv row ingested, identified by table and row key
+class RowFingerprint(models.Model):
+    table = models.CharField(max_length=50)
+    row_key = models.CharField(max_length=200)
+    digest = models.CharField(max_length=32)
+
+    def __str__(self):
+        return f"{self.table} {self.row_key}"
+
+    # specify the table name in the database
+    class Meta:
+        db_table = 'tennis_rowfingerprint'
+        constraints = [
+            models.UniqueConstraint(fields=['table', 'row_key'], name='unique_row_fingerprint'),
+        ]
+
+
+# define the playerlettercount table, it stores how many players have a name starting with each letter.
+# It is kept up to date when players are added, updated or deleted, so the letter grid doesn't count the players table
+class PlayerLetterCount(models.Model):
+    letter = models.CharField(max_length=1, primary_key=True)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.letter}: {self.count}"
+
+    # specify the table name in the database
+    class Meta:
+        db_table = 'tennis_playerlettercount'
+
+
+# define the playercareerstats table, the totals of each player over all the matches played.
+# It is built from MatchStats and PlayerMatch and updated when new matches are ingested, so the leaderboards
+# are read with an ORDER BY ... LIMIT on the indexed columns instead of joining four tables on every request
+class PlayerCareerStats(models.Model):
+    player_id = models.OneToOneField(Players, on_delete=models.CASCADE, primary_key=True)
+    aces = models.IntegerField(default=0, db_index=True)
+    double_faults = models.IntegerField(default=0)
+    serve_points = models.IntegerField(default=0)
+    matches = models.IntegerField(default=0)
+    wins = models.IntegerField(default=0)
+    losses = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Career stats of {self.player_id.player_name}"
+
+    # specify the table name in the database
+    class Meta:
+        db_table = 'tennis_playercareerstats'
+
+
+# define the matchsets table, one row for each set of a match parsed from Matches.score.
+# games_won and games_lost are the games of the winner and of the loser of the match, set_winner is the role
+# ('winner' or 'loser') of the player who won the set, so it can be compared with PlayerMatch.player_role
+class MatchSets(models.Model):
+    match_id = models.ForeignKey(Matches, on_delete=models.CASCADE)
+    set_number = models.IntegerField()
+    games_won = models.IntegerField()
+    games_lost = models.IntegerField()
+    tiebreak = models.BooleanField(default=False)
+    # points of the player who lost the tiebreak, e.g. 4 for 7-6(4)
+    tiebreak_points = models.IntegerField(null=True)
+    set_winner = models.CharField(max_length=10, null=True)
+
+    def __str__(self):
+        return f"Set {self.set_number} of match {self.match_id_id}: {self.games_won}-{self.games_lost}"
+
+    # specify the table name in the database.
+    # (tiebreak, match_id, set_winner) covers the tiebreak records, without reading the table
+    class Meta:
+        db_table = 'tennis_matchsets'
+        constraints = [
+            models.UniqueConstraint(fields=['match_id', 'set_number'], name='unique_match_set'),
+        ]
+        indexes = [
+            models.Index(fields=['tiebreak', 'match_id', 'set_winner'], name='matchsets_tiebreak_idx'),
+        ]
+
+
+# define the playerrating table, the Elo rating of each player after the last match rated (tennis/ratings.py),
+# overall (surface 'All') and on each surface
+class PlayerRating(models.Model):
+    player_id = models.ForeignKey(Players, on_delete=models.CASCADE)
+    surface = models.CharField(max_length=20)
+    rating = models.FloatField()
+    matches = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.player_id_id} on {self.surface}: {self.rating:.0f}"
+
+    # specify the table name in the database.
+    # (surface, rating) is read by the top ratings of a surface with an ORDER BY ... LIMIT
+    class Meta:
+        db_table = 'tennis_playerrating'
+        constraints = [
+            models.UniqueConstraint(fields=['player_id', 'surface'], name='unique_player_rating'),
+        ]
+        indexes = [
+            models.Index(fields=['surface', '-rating'], name='playerrating_surface_idx'),
+        ]
+
+# define the ratinghistory table, the rating of a player before and after each match rated.
+# sequence is the position of the match in the replay, the same for the rows of the same match
+class RatingHistory(models.Model):
+    player_id = models.ForeignKey(Players, on_delete=models.CASCADE)
+    match_id = models.ForeignKey(Matches, on_delete=models.CASCADE)
+    surface = models.CharField(max_length=20)
+    sequence = models.IntegerField(db_index=True)
+    tourney_date = models.DateField(null=True)
+    rating_before = models.FloatField()
+    rating_after = models.FloatField()
+
+    def __str__(self):
+        return f"{self.player_id_id} in match {self.match_id_id}: {self.rating_before:.0f} -> {self.rating_after:.0f}"
+
+    # specify the table name in the database.
+    # (player_id, surface, sequence) gives the trajectory of a player in order
+    class Meta:
+        db_table = 'tennis_ratinghistory'
+        indexes = [
+            models.Index(fields=['player_id', 'surface', 'sequence'], name='ratinghistory_player_idx'),
+        ]
+
+
+# define the headtohead table, the record between two players, one row for each pair of players who met.
+# The primary key is '<smaller player_id>-<bigger player_id>', so a head-to-head is read with one primary key lookup
+# whatever the order of the two players in the request
+class HeadToHead(models.Model):
+    pair = models.CharField(max_length=30, primary_key=True)
+    player_a = models.ForeignKey(Players, on_delete=models.CASCADE, related_name='head_to_head_a')
+    player_b = models.ForeignKey(Players, on_delete=models.CASCADE, related_name='head_to_head_b')
+    player_a_wins = models.IntegerField(default=0)
+    player_b_wins = models.IntegerField(default=0)
+    # number of matches on each surface, e.g. {"Clay": 3, "Hard": 1}
+    surfaces = models.JSONField(default=dict)
+    last_match = models.ForeignKey(Matches, on_delete=models.SET_NULL, null=True, related_name='+')
+    last_date = models.DateField(null=True)
+    last_winner = models.ForeignKey(Players, on_delete=models.SET_NULL, null=True, related_name='+')
+
+    def __str__(self):
+        return f"{self.player_a_id} {self.player_a_wins}-{self.player_b_wins} {self.player_b_id}"
+
+    # specify the table name in the database
+    class Meta:
+        db_table = 'tennis_headtohead'
+
+# define the idsequence table, the next free value of each sequence of ids (e.g. 'player_id'), from which every
+# process reserves a block of ids (tennis/sequences.py). The generation changes when ids are written without the
+# sequence (loader, ingest), so the processes drop the blocks they reserved before
+class IdSequence(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField()
+    generation = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+    # specify the table name in the database
+    class Meta:
+        db_table = 'tennis_idsequence'
+
+# define the tableversion table, the version of each data table changed in the same transaction as every write
+# (cache.bump_dataset_version): a counter, a random token, the token it replaced and the time of the change (seconds
+# since the epoch).
+# It is shared by all the processes, so it tells every process when its cached data is out of date, and a snapshot
+# of the columnar engine (tennis/snapshot.py) records the data it was written from
+class TableVersion(models.Model):
+    table = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    token = models.CharField(max_length=32, default='')
+    previous_token = models.CharField(max_length=32, default='')
+    modified = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.table}: {self.version}"
+
     # specify the table name in the database
     class Meta:
-        db_table = 'tennis_playermatch'
\ No newline at end of file
+        db_table = 'tennis_tableversion'
@@ -0,0 +1,87 @@
+'''
+Keyset (cursor) pagination of the players, ordered by (player_name, player_id).
+Instead of skipping the rows of the previous pages with OFFSET, every page starts after the last row of the
+previous one: WHERE (player_name, player_id) > (last name, last id) ORDER BY player_name, player_id LIMIT n.
+With the index on these two columns, any page costs the same as the first one.
+The cursor sent to the client is the last (player_name, player_id) of the page, encoded in base64.
+Some reference: https://use-the-index-luke.com/no-offset
+https://www.django-rest-framework.org/api-guide/pagination/#cursorpagination
+'''
+
+import base64
+import json
+import sys
+from operator import attrgetter
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.urls import replace_query_param
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(player_name, player_id):
+    return base64.urlsafe_b64encode(json.dumps([player_name, player_id]).encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        player_name, player_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(player_name), int(player_id)
+    except (ValueError, TypeError):
+        raise ValidationError({'cursor': 'Invalid cursor.'})
+
+# it reads the page_size parameter, using TENNIS_PAGE_SIZE from settings.py when it is missing
+def get_page_size(request):
+    page_size = request.query_params.get('page_size', getattr(settings, 'TENNIS_PAGE_SIZE', DEFAULT_PAGE_SIZE))
+    try:
+        page_size = int(page_size)
+    except (TypeError, ValueError):
+        raise ValidationError({'page_size': 'A valid integer is required.'})
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+# it reads the limit parameter of the endpoints that return the first n rows of a ranking (e.g. the top Elo ratings)
+def get_limit(request, default=10, maximum=100):
+    limit = request.query_params.get('limit', default)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValidationError({'limit': 'A valid integer is required.'})
+    return max(1, min(limit, maximum))
+
+# it returns the first string after all the strings starting with prefix (e.g. 'B' for 'A'), or None when there
+# isn't any (a prefix of only U+10FFFF, the last character)
+def after_prefix(prefix):
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+# it returns the filter of the names starting with prefix, not case sensitive like the LIKE 'X%' of SQLite and the
+# letter counts (aggregates.first_letter). The first character is read as ranges (player_name >= 'A' AND
+# player_name < 'B', OR the same for 'a'), so the index on player_name is used, the rest of the prefix is checked
+# on the rows of the ranges
+def name_prefix(prefix):
+    ranges = Q()
+    for first in {prefix[:1].upper(), prefix[:1].lower()}:
+        after = after_prefix(first)
+        ranges |= Q(player_name__gte=first, player_name__lt=after) if after else Q(player_name__gte=first)
+    if len(prefix) > 1:
+        ranges &= Q(player_name__istartswith=prefix)
+    return ranges
+
+# it returns the rows of the page after the cursor of the request and the link to the next page (None on the last page).
+# One more row than the page size is read to know if there is a next page. cursor_values returns the name and the id
+# of a row, the attributes of a model instance by default (a function of RowSerializer.getter for values_list rows)
+def keyset_page(queryset, request, cursor_values=attrgetter('player_name', 'player_id')):
+    page_size = get_page_size(request)
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        player_name, player_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(player_name__gt=player_name) | Q(player_name=player_name, player_id__gt=player_id))
+    rows = list(queryset.order_by('player_name', 'player_id')[:page_size + 1])
+    next_link = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_link = replace_query_param(request.get_full_path(), 'cursor', encode_cursor(*cursor_values(rows[-1])))
+    return rows, next_link
@@ -0,0 +1,27 @@
+'''
+Parser of the NDJSON bodies (one JSON object on each line), accepted by /api/players/bulk/ besides a JSON array.
+Some reference: https://www.django-rest-framework.org/api-guide/parsers/#custom-parsers
+https://github.com/ndjson/ndjson-spec
+'''
+
+import json
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    media_type = 'application/x-ndjson'
+
+    # it returns the list of the values of the lines, the empty lines are skipped
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        rows = []
+        for number, line in enumerate(stream.read().decode(encoding).splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError as error:
+                raise ParseError(f'NDJSON parse error on line {number}: {error}')
+        return rows
@@ -0,0 +1,65 @@
+'''
+Parallel ingestion pipeline for the csv files in the data folder.
+Reading and converting the files (parse_date, nullify, int conversion) doesn't need the database, so all the
+files are parsed at the same time in a pool of processes. The writes go through a single writer (this process),
+because SQLite allows only one writer at a time. A file is written as soon as it is parsed and all the files it
+depends on are written, following the foreign keys of csv_parsing.FILES:
+
+    Tournament, Hand, Country  ->  Players (Hand, Country), Matches (Tournament)
+                               ->  Match_Stats (Matches), Player_Match (Players, Matches)
+
+so the parsing of the next files runs while the previous ones are still being written.
+Some reference: https://docs.python.org/3/library/concurrent.futures.html#processpoolexecutor
+'''
+
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from .cache import bump_dataset_version
+from .csv_parsing import FILES, parse_file
+from .loader import load_keys, write_chunks
+
+
+# it returns the models each file depends on
+def dependencies(spec):
+    return set(spec['references'].values())
+
+# it parses the files in a pool of processes and writes them in dependency order.
+# It returns, for each file, the rows written and the time spent parsing, waiting for the parsing and writing
+def run_pipeline(data_folder, workers=None, chunk_size=2000, batch_size=500, stdout=None):
+    stdout = stdout or sys.stdout
+    start = time.perf_counter()
+    keys = load_keys()
+    written = set()
+    results = []
+    # spawn doesn't copy the Django process in the workers, they only import csv_parsing
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {spec['file']: pool.submit(parse_file, os.path.join(data_folder, spec['file']),
+                                             spec['file'], chunk_size)
+                   for spec in FILES}
+        pending = list(FILES)
+        while pending:
+            ready = [spec for spec in pending if dependencies(spec) <= written]
+            # among the files that can be written, the first one already parsed (or the first one in order)
+            waiting_start = time.perf_counter()
+            done, _ = wait([futures[spec['file']] for spec in ready], return_when=FIRST_COMPLETED)
+            spec = next(spec for spec in ready if futures[spec['file']] in done)
+            chunks, parse_seconds = futures[spec['file']].result()
+            wait_seconds = time.perf_counter() - waiting_start
+
+            write_start = time.perf_counter()
+            count, skipped = write_chunks(spec, chunks, keys, batch_size)
+            write_seconds = time.perf_counter() - write_start
+
+            written.add(spec['model'])
+            pending.remove(spec)
+            stdout.write(f"{spec['file']}: {count} rows, {skipped} skipped - parse {parse_seconds:.2f}s, "
+                         f"wait {wait_seconds:.2f}s, write {write_seconds:.2f}s\n")
+            results.append({'file': spec['file'], 'rows': count, 'skipped': skipped, 'parse_seconds': parse_seconds,
+                            'wait_seconds': wait_seconds, 'write_seconds': write_seconds})
+    bump_dataset_version()
+    stdout.write(f"Total: {time.perf_counter() - start:.2f}s\n")
+    return results
@@ -0,0 +1,146 @@
+'''
+Elo ratings of the players, overall and for each surface, built by replaying the matches in the order they were
+played: date of the tournament, round (R128 before R64 ... before F) and match number. Every match changes the
+rating of the winner and of the loser by K * (1 - expected), where expected is the probability of the win given
+by the ratings before the match, and K decreases with the matches already played by the player (the K of the
+FiveThirtyEight tennis model, 250 / (matches + 5) ^ 0.4). Walkovers are not rated.
+The ratings after the last match are stored in PlayerRating, every change in RatingHistory. When new matches are
+ingested after the last match rated, only they are replayed, starting from the stored ratings; a match older than
+the last one rated, or a change of a rated match, replays the whole history.
+Some reference: https://en.wikipedia.org/wiki/Elo_rating_system
+https://fivethirtyeight.com/features/serena-williams-and-the-difference-between-all-time-great-and-greatest-of-all-time/
+'''
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from .models import Matches, PlayerMatch, PlayerRating, RatingHistory
+
+INITIAL_RATING = 1500
+# surface of the overall ratings
+OVERALL = 'All'
+# order of the rounds in a tournament, unknown rounds are played first
+ROUNDS = {'Q1': 1, 'Q2': 2, 'Q3': 3, 'RR': 4, 'R128': 5, 'R64': 6, 'R32': 7, 'R16': 8, 'QF': 9, 'SF': 10,
+          'BR': 11, 'F': 12}
+
+
+def k_factor(matches):
+    return 250 / (matches + 5) ** 0.4
+
+def expected_score(rating, opponent):
+    return 1 / (1 + 10 ** ((opponent - rating) / 400))
+
+# it returns the position of a match in the replay
+def match_order(match):
+    return (match['tourney_id__tourney_date'] is None, match['tourney_id__tourney_date'],
+            ROUNDS.get(match['round'], 0), match['match_num'] or 0, match['match_id'])
+
+# it returns the matches to rate, in replay order, with the winner and the loser of each one.
+# Walkovers and matches without both players are left out
+def rated_matches(match_ids=None):
+    matches = Matches.objects.filter(walkover=False)
+    players = PlayerMatch.objects.filter(player_role__in=['winner', 'loser'])
+    if match_ids is not None:
+        matches = matches.filter(match_id__in=match_ids)
+        players = players.filter(match_id__in=match_ids)
+    roles = {}
+    for match_id, player_id, role in players.values_list('match_id', 'player_id', 'player_role'):
+        roles.setdefault(match_id, {})[role] = player_id
+    result = []
+    for match in matches.values('match_id', 'match_num', 'round', 'tourney_id__tourney_date',
+                                'tourney_id__surface'):
+        players = roles.get(match['match_id'], {})
+        if 'winner' in players and 'loser' in players:
+            result.append({**match, 'winner': players['winner'], 'loser': players['loser']})
+    result.sort(key=match_order)
+    return result
+
+# the surfaces a match is rated on: overall and, if TENNIS_ELO_SURFACES is on, the surface of the tournament
+def match_surfaces(match):
+    surfaces = [OVERALL]
+    if getattr(settings, 'TENNIS_ELO_SURFACES', True) and match['tourney_id__surface']:
+        surfaces.append(match['tourney_id__surface'])
+    return surfaces
+
+# it replays the matches starting from ratings ({(player_id, surface): [rating, matches]}, changed in place)
+# and it returns the RatingHistory rows, numbered from sequence
+def replay(matches, ratings, sequence):
+    history = []
+    for match in matches:
+        for surface in match_surfaces(match):
+            winner = ratings.setdefault((match['winner'], surface), [INITIAL_RATING, 0])
+            loser = ratings.setdefault((match['loser'], surface), [INITIAL_RATING, 0])
+            expected = expected_score(winner[0], loser[0])
+            for player_id, rating, change in ((match['winner'], winner, 1 - expected),
+                                              (match['loser'], loser, expected - 1)):
+                before = rating[0]
+                rating[0] += k_factor(rating[1]) * change
+                rating[1] += 1
+                history.append(RatingHistory(player_id_id=player_id, match_id_id=match['match_id'], surface=surface,
+                                             sequence=sequence, tourney_date=match['tourney_id__tourney_date'],
+                                             rating_before=before, rating_after=rating[0]))
+        sequence += 1
+    return history
+
+def rating_rows(ratings):
+    return [PlayerRating(player_id_id=player_id, surface=surface, rating=rating, matches=matches)
+            for (player_id, surface), (rating, matches) in ratings.items()]
+
+# it rebuilds the ratings replaying all the matches
+def rebuild_ratings():
+    ratings = {}
+    history = replay(rated_matches(), ratings, 0)
+    with transaction.atomic():
+        RatingHistory.objects.all().delete()
+        PlayerRating.objects.all().delete()
+        RatingHistory.objects.bulk_create(history, batch_size=500)
+        PlayerRating.objects.bulk_create(rating_rows(ratings), batch_size=500)
+
+# it rates the given matches (new matches ingested), or all the matches when match_ids is None.
+# The new matches are replayed from the stored ratings when they all come after the last match rated,
+# otherwise the whole history is replayed
+def update_ratings(match_ids=None, group_size=500):
+    if match_ids is None:
+        rebuild_ratings()
+        return
+    match_ids = list(match_ids)
+    matches = []
+    for i in range(0, len(match_ids), group_size):
+        group = match_ids[i:i + group_size]
+        if RatingHistory.objects.filter(match_id__in=group).exists():
+            rebuild_ratings()
+            return
+        matches.extend(rated_matches(group))
+    if not matches:
+        return
+    matches.sort(key=match_order)
+    # without ratings yet (the older matches have never been rated) or with a match older than the last one rated
+    last = RatingHistory.objects.order_by('-sequence').values_list('match_id', 'sequence').first()
+    last_match = rated_matches([last[0]]) if last else []
+    if not last_match or match_order(matches[0]) < match_order(last_match[0]):
+        rebuild_ratings()
+        return
+
+    # the stored ratings of the players of the new matches
+    player_ids = sorted({match[role] for match in matches for role in ('winner', 'loser')})
+    ratings = {}
+    for i in range(0, len(player_ids), group_size):
+        stored = PlayerRating.objects.filter(player_id__in=player_ids[i:i + group_size]).values_list(
+            'player_id', 'surface', 'rating', 'matches')
+        ratings.update({(player_id, surface): [rating, played] for player_id, surface, rating, played in stored})
+    history = replay(matches, ratings, last[1] + 1)
+    with transaction.atomic():
+        RatingHistory.objects.bulk_create(history, batch_size=500)
+        PlayerRating.objects.bulk_create(rating_rows(ratings), batch_size=500, update_conflicts=True,
+                                         unique_fields=['player_id', 'surface'], update_fields=['rating', 'matches'])
+
+# it returns the players with the highest rating on a surface. The ratings are only read here: they are built by
+# the migrations, the loader, the ingest command and build_ratings, never by a request
+def top_ratings(surface=OVERALL, limit=10):
+    return list(PlayerRating.objects.filter(surface=surface).order_by('-rating', 'player_id').values(
+        'player_id', 'rating', 'matches', player_name=F('player_id__player_name'))[:limit])
+
+# it returns the ratings of a player on a surface after each match, in the order the matches were played
+def rating_history(player_id, surface=OVERALL):
+    return list(RatingHistory.objects.filter(player_id=player_id, surface=surface).order_by('sequence').values(
+        'match_id', 'tourney_date', 'rating_before', 'rating_after'))
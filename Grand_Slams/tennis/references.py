@@ -0,0 +1,90 @@
+'''
+Process-local cache of the reference tables, Hand (a few rows) and Country (about 200 rows), which almost never
+change. Both tables are read once and kept in memory with their table versions (tennis/cache.py), so the
+serializers find the hand of a description and the country of a name, and show the hand and the country of a
+player, without queries. When a row is added or changed (signals, loader, ingest) the version of its table changes
+and the tables are read again at the next use.
+Some reference: https://docs.djangoproject.com/en/4.2/ref/models/querysets/#in-bulk
+'''
+
+import threading
+from .cache import table_versions
+from .models import Hand, Country
+
+MODELS = {'Hand': Hand, 'Country': Country}
+# field shown for a row, the same text as str() of the row
+LABEL_FIELDS = {'Hand': 'hand_description', 'Country': 'country_name'}
+TABLES = [model._meta.db_table for model in MODELS.values()]
+
+
+# the key of a hand is the first letter of its description and the key of a country the first three letters of
+# its name, as PlayerSerializer has always created them
+def hand_key(hand_description):
+    return hand_description[:1].upper()
+
+def country_key(country_name):
+    return country_name[:3].upper()
+
+
+class ReferenceData:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def current_version(self):
+        versions = table_versions(TABLES)
+        return tuple(versions[table]['token'] for table in TABLES)
+
+    # it reads the tables again if one of them changed
+    def load(self):
+        version = self.current_version()
+        with self.lock:
+            if version == self.version:
+                return
+        rows = {name: model.objects.in_bulk() for name, model in MODELS.items()}
+        labels = {name: {key: getattr(row, LABEL_FIELDS[name]) for key, row in table.items()}
+                  for name, table in rows.items()}
+        with self.lock:
+            self.rows, self.labels, self.version = rows, labels, version
+
+    # it returns the rows of every table by primary key
+    def tables(self):
+        self.load()
+        return self.rows
+
+    # it returns the text of every row of a table by primary key (description of the hand, name of the country)
+    def labels_of(self, model_name):
+        self.load()
+        return self.labels[model_name]
+
+    # it returns the row of a table with the given key, or None
+    def get(self, model_name, key):
+        return self.tables()[model_name].get(key)
+
+    # it returns the keys of a table
+    def keys(self, model_name):
+        return set(self.tables()[model_name])
+
+    # it returns the row of key, created with the given fields if it doesn't exist.
+    # The new row changes the version of the table (signals), so the tables are read again at the next use
+    def get_or_create(self, model_name, key, defaults):
+        row = self.get(model_name, key)
+        if row is None:
+            row, _ = MODELS[model_name].objects.get_or_create(pk=key, defaults=defaults)
+        return row
+
+    def hand(self, hand_description):
+        return self.get_or_create('Hand', hand_key(hand_description), {'hand_description': hand_description})
+
+    def country(self, country_name):
+        return self.get_or_create('Country', country_key(country_name), {'country_name': country_name})
+
+    def reset(self):
+        with self.lock:
+            self.version = None
+            self.rows = {name: {} for name in MODELS}
+            self.labels = {name: {} for name in MODELS}
+
+
+references = ReferenceData()
@@ -0,0 +1,37 @@
+'''
+Optional faster JSON renderer, registered in REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] of settings.py.
+When orjson is installed (it is not in requirements.txt) the responses are encoded with orjson.dumps, that writes the
+bytes directly in C, otherwise, or when the client asks for an indented response (Accept: application/json; indent=4,
+the browsable API), it renders with the JSONRenderer of DRF. The output is the same compact JSON of JSONRenderer:
+the dates and the other types that orjson doesn't encode as DRF does go through the JSONEncoder of DRF.
+Some reference: https://github.com/ijl/orjson
+https://www.django-rest-framework.org/api-guide/renderers/#custom-renderers
+'''
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def __init__(self):
+        super().__init__()
+        # it uses the default of the JSONEncoder of DRF for the dates, decimals, uuids, querysets...
+        self.default = self.encoder_class().default
+
+    # it returns True when the data can be encoded with orjson, as JSONRenderer would encode them
+    def use_orjson(self, accepted_media_type, renderer_context):
+        return (orjson is not None and self.compact and not self.ensure_ascii
+                and self.get_indent(accepted_media_type, renderer_context or {}) is None)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or not self.use_orjson(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=self.default,
+                           option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+        # as JSONRenderer, \u2028 and \u2029 are escaped so the JSON is a strict javascript subset
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
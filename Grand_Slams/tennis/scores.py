@@ -0,0 +1,59 @@
+'''
+Parser of the scores of Matches.csv, e.g. '7-6(4) 0-6 7-6(3) 6-2', '6-4 4-1 RET' or 'W/O'.
+Every set is written with the games of the winner of the match first, and a tiebreak has the points of the
+player who lost it in brackets. RET (retired) and DEF (defaulted) end the match before the end, W/O is a walkover
+(no set played). Like csv_parsing.py this module does not import Django, so it can run in the loader workers.
+Some reference: https://docs.python.org/3/library/re.html
+'''
+
+import re
+
+SET_PATTERN = re.compile(r'^(\d+)-(\d+)(?:\((\d+)\))?$')
+# words that end a match before it is finished
+RETIRED = {'RET', 'DEF'}
+WALKOVER = 'W/O'
+
+
+# it returns the sets of a score, one dictionary for each set with the games of the winner and of the loser of the
+# match, the tiebreak points (of the player who lost the tiebreak) and who won the set ('winner', 'loser' or None
+# for a set stopped on the same number of games), and the flags of the match:
+# retired, walkover, num_sets (sets played, the one stopped by a retirement included) and straight_sets
+# (the winner won every set of a finished match).
+# Tokens that are not a set or one of the words above are ignored
+def parse_score(score, best_of=None):
+    sets = []
+    retired = False
+    walkover = False
+    for token in (score or '').split():
+        if token in RETIRED:
+            retired = True
+            continue
+        if token == WALKOVER:
+            walkover = True
+            continue
+        match = SET_PATTERN.match(token)
+        if not match:
+            continue
+        won, lost = int(match.group(1)), int(match.group(2))
+        tiebreak = match.group(3) is not None or {won, lost} == {6, 7}
+        sets.append({
+            'set_number': len(sets) + 1,
+            'games_won': won,
+            'games_lost': lost,
+            'tiebreak': tiebreak,
+            'tiebreak_points': int(match.group(3)) if match.group(3) is not None else None,
+            'set_winner': 'winner' if won > lost else 'loser' if lost > won else None,
+        })
+
+    num_sets = len(sets) if score else None
+    needed = int(best_of) // 2 + 1 if best_of and str(best_of).isdigit() else None
+    straight_sets = (not retired and not walkover and bool(sets)
+                     and all(played['set_winner'] == 'winner' for played in sets)
+                     and (needed is None or len(sets) == needed))
+    return {'sets': sets, 'retired': retired, 'walkover': walkover, 'num_sets': num_sets,
+            'straight_sets': straight_sets}
+
+# it returns only the flags of the match, the values of the Matches columns
+def score_flags(score, best_of=None):
+    parsed = parse_score(score, best_of)
+    return {field: parsed[field] for field in ('retired', 'walkover', 'num_sets', 'straight_sets')}
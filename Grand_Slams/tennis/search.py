@@ -0,0 +1,123 @@
+'''
+In-process index of the player names for the typeahead search (/api/players/search/?q=).
+The names are normalized (accents removed, lower case, apostrophes removed, other punctuation as spaces) and
+every rotation of the words of a name is a key of a sorted list: 'Juan Martin del Potro' has the keys
+'juan martin del potro', 'martin del potro juan', 'del potro juan martin' and 'potro juan martin del'.
+A query is a prefix of the keys, so 'potro', 'del potro ju' or 'nadal raf' (surname first) are found with a
+binary search and by reading the keys that follow, like in a trie, without reading the other names.
+The names in their own order come first, then the other rotations, each group in alphabetical order.
+The index is built from the Players table the first time it is used, it is updated by the signals when a
+player is saved or deleted in this process, once the change is committed, and it is built again when the version
+of the players table (tennis/cache.py) changes for another reason (a file loaded or ingested, a change made by
+another process).
+Some reference: https://docs.python.org/3/library/bisect.html
+https://docs.python.org/3/library/unicodedata.html#unicodedata.normalize
+'''
+
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from django.db import transaction
+from .cache import table_versions
+from .models import Players
+
+TABLE = Players._meta.db_table
+WORDS = re.compile(r'[^\W_]+')
+
+
+# it returns the name without accents, in lower case and with the words separated by a single space
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '').replace("'", '').replace('’', '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+    return ' '.join(WORDS.findall(text))
+
+# it returns the keys of a name: the name itself first, then the rotations starting from the other words
+def name_keys(name):
+    words = normalize(name).split(' ')
+    return [' '.join(words[i:] + words[:i]) for i in range(len(words)) if words[i]]
+
+
+class PlayerIndex:
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.names = None
+        # sorted lists of (key, player_id): the names as they are written and the other rotations
+        self.first = []
+        self.rotations = []
+        self.version = None
+
+    # the token of the version of the players table, and the token it replaced: every change names the version
+    # before it, so the index knows if a change is the next one after its version
+    def current_version(self):
+        version = table_versions([TABLE])[TABLE]
+        return version['previous_token'], version['token']
+
+    def build(self):
+        _, version = self.current_version()
+        names = dict(Players.objects.values_list('player_id', 'player_name'))
+        first = []
+        rotations = []
+        for player_id, name in names.items():
+            keys = name_keys(name)
+            first.extend((key, player_id) for key in keys[:1])
+            rotations.extend((key, player_id) for key in keys[1:])
+        first.sort()
+        rotations.sort()
+        with self.lock:
+            self.names, self.first, self.rotations, self.version = names, first, rotations, version
+
+    # it adds, changes (name given) or removes (name None) a player
+    def update(self, player_id, name=None):
+        with self.lock:
+            if self.names is None:
+                return
+            old = self.names.pop(player_id, None)
+            if old is not None:
+                keys = name_keys(old)
+                for rows, key in [(self.first, key) for key in keys[:1]] + [(self.rotations, key) for key in keys[1:]]:
+                    index = bisect_left(rows, (key, player_id))
+                    if index < len(rows) and rows[index] == (key, player_id):
+                        del rows[index]
+            if name is not None:
+                self.names[player_id] = name
+                keys = name_keys(name)
+                for key in keys[:1]:
+                    insort(self.first, (key, player_id))
+                for key in keys[1:]:
+                    insort(self.rotations, (key, player_id))
+
+    # it applies a committed change that replaced the version previous of the players table with version. If the
+    # index is not at the version before it, another change is missing and the index is built again at the next search
+    def apply(self, previous, version, player_id, name=None):
+        with self.lock:
+            if self.names is not None and self.version == previous:
+                self.update(player_id, name)
+                self.version = version
+
+    # it returns the ids of the first limit players with a key starting with the query
+    def search(self, query, limit=10):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        if self.names is None or self.version != self.current_version()[1]:
+            self.build()
+        found = []
+        with self.lock:
+            for rows in (self.first, self.rotations):
+                index = bisect_left(rows, (prefix,))
+                while index < len(rows) and len(found) < limit and rows[index][0].startswith(prefix):
+                    if rows[index][1] not in found:
+                        found.append(rows[index][1])
+                    index += 1
+            return [{'player_id': player_id, 'player_name': self.names[player_id]} for player_id in found]
+
+
+player_index = PlayerIndex()
+
+
+# called by the signals of the Players model (tennis/signals.py), after the version of the table was changed
+def player_changed(player_id, name=None):
+    previous, version = player_index.current_version()
+    transaction.on_commit(lambda: player_index.apply(previous, version, player_id, name))
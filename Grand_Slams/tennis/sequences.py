@@ -0,0 +1,121 @@
+'''
+Allocator of the ids of the new rows (the player_id of Players, which is not an auto-increment field), backed by the
+IdSequence table. A process reserves a block of TENNIS_ID_BLOCK_SIZE ids with a single UPDATE of the next value of
+the sequence and it gives them out from memory, so a new player doesn't read the Players table and two processes
+(or two threads) never get the same id. A request for more ids than the block gets its own contiguous block.
+The reservation is written in the transaction of the caller: if it is rolled back the ids are not used, so the rest
+of the block is kept in memory only when the transaction is committed (transaction.on_commit).
+The sequence starts after the biggest id of the table, and it is moved after the ids written by the loader and
+the ingest command (sync), which keep the ids of the csv files. sync also changes the generation of the sequence:
+every allocation reads it (one read of a primary key) and a process drops its block when the generation is not the
+one of the block, as the ids written by another process can be in it.
+A row saved with an explicit id (e.g. from the admin site) doesn't change the generation, so the rows are saved with
+save_with_ids: when an id of the block is already used, the sequence is moved after the table and new ids are taken.
+Some reference: https://docs.djangoproject.com/en/4.2/topics/db/transactions/#performing-actions-after-commit
+https://www.postgresql.org/docs/current/sql-createsequence.html (CACHE: blocks of values kept by each session)
+'''
+
+import threading
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max
+from django.db.models.functions import Greatest
+from .models import IdSequence, Players
+
+
+class IdAllocator:
+
+    def __init__(self, name, model, field):
+        self.name = name
+        self.model = model
+        self.field = field
+        self.lock = threading.Lock()
+        # ids reserved by this process and not given out yet: next and end (excluded), and the generation of the
+        # sequence when they were reserved
+        self.next = self.end = 0
+        self.generation = None
+
+    def block_size(self):
+        return getattr(settings, 'TENNIS_ID_BLOCK_SIZE', 20)
+
+    # first value of the sequence, after the biggest id of the table
+    def initial_value(self):
+        return (self.model.objects.aggregate(last=Max(self.field))['last'] or 0) + 1
+
+    def current_generation(self):
+        return IdSequence.objects.filter(name=self.name).values_list('generation', flat=True).first()
+
+    # it moves the next value of the sequence by size and it returns the first id of the reserved block and the
+    # generation of the sequence
+    def reserve(self, size):
+        with transaction.atomic():
+            if IdSequence.objects.filter(name=self.name).update(next_value=F('next_value') + size):
+                sequence = IdSequence.objects.get(name=self.name)
+                return sequence.next_value - size, sequence.generation
+            start = self.initial_value()
+            try:
+                with transaction.atomic():
+                    sequence = IdSequence.objects.create(name=self.name, next_value=start + size)
+                return start, sequence.generation
+            # created by another process in the meantime
+            except IntegrityError:
+                IdSequence.objects.filter(name=self.name).update(next_value=F('next_value') + size)
+                sequence = IdSequence.objects.get(name=self.name)
+                return sequence.next_value - size, sequence.generation
+
+    # it returns count contiguous ids (a range)
+    def allocate(self, count=1):
+        with self.lock:
+            available = self.end - self.next >= count
+        if available:
+            generation = self.current_generation()
+            with self.lock:
+                if self.generation != generation:
+                    self.next = self.end = 0
+                elif self.end - self.next >= count:
+                    start = self.next
+                    self.next += count
+                    return range(start, start + count)
+        size = max(count, self.block_size())
+        start, generation = self.reserve(size)
+        if size > count:
+            transaction.on_commit(lambda: self.keep(start + count, start + size, generation))
+        return range(start, start + count)
+
+    # it keeps the rest of a committed block, in place of the rest of the previous one
+    def keep(self, start, end, generation):
+        with self.lock:
+            self.next, self.end, self.generation = start, end, generation
+
+    # it forgets the ids reserved by this process, they are not used
+    def reset(self):
+        with self.lock:
+            self.next = self.end = 0
+            self.generation = None
+
+    # it moves the sequence after the ids written without the allocator (loader, ingest) and it changes its
+    # generation, so every process forgets the block it reserved before, that could contain them
+    def sync(self):
+        self.reset()
+        start = self.initial_value()
+        IdSequence.objects.filter(name=self.name).update(next_value=Greatest(F('next_value'), start),
+                                                         generation=F('generation') + 1)
+
+    # it calls save with count new ids (a range) in a savepoint and it returns its result. If one of the ids is
+    # already used by a row saved with an explicit id, the sequence is moved after the table and save is called
+    # again with new ids
+    def save_with_ids(self, save, count=1):
+        ids = self.allocate(count)
+        try:
+            with transaction.atomic():
+                return save(ids)
+        except IntegrityError:
+            if not self.model.objects.filter(**{f"{self.field}__in": ids}).exists():
+                raise
+        self.sync()
+        ids = self.allocate(count)
+        with transaction.atomic():
+            return save(ids)
+
+
+player_ids = IdAllocator('player_id', Players, 'player_id')
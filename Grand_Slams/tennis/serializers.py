@@ -5,7 +5,26 @@ https://www.geeksforgeeks.org/serializers-django-rest-framework/
 '''
 
 from rest_framework import serializers
-from .models import Players, Hand, Country
+from .models import Players
+from .references import references
+from .sequences import player_ids
+
+
+# it shows the hand or the country of a player as text (str of the Hand or Country row, the description or the
+# name), reading the row from the reference cache (tennis/references.py) with the key stored in the player,
+# so the related row is not fetched
+class ReferenceField(serializers.CharField):
+
+    def __init__(self, model_name, **kwargs):
+        self.model_name = model_name
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        key = getattr(instance, f"{self.source}_id")
+        if key is None:
+            return None
+        row = references.get(self.model_name, key)
+        return row if row is not None else getattr(instance, self.source)
 '''
 write-only: country_name and hand_description are not part of the Players model itself 
 but are used to create or update Country and Hand instances. 
@@ -20,8 +39,8 @@ class PlayerSerializer(serializers.ModelSerializer):
     country_name = serializers.CharField(write_only=True)
     hand_description = serializers.CharField(write_only=True)
     # these are derived from country and hand tables
-    ioc = serializers.CharField(required=False)
-    hand = serializers.CharField(required=False)
+    ioc = ReferenceField('Country', required=False)
+    hand = ReferenceField('Hand', required=False)
 
     # includes specific fields
     class Meta:
@@ -31,26 +50,18 @@ class PlayerSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         hand_description = validated_data.pop('hand_description')
         country_name = validated_data.pop('country_name')
-        # it finds the last player in the database and increments their player_id by 1.
-        # if no players exist, starts with player_id = 1.
-        last_player = Players.objects.all().order_by('player_id').last()
-        if last_player:
-            player_id = last_player.player_id + 1
-        else:
-            player_id = 1  
-
-        validated_data['player_id'] = player_id
-        # it uses the first letter of the description as the key. 
-        hand, _ = Hand.objects.get_or_create(hand=hand_description[:1].upper(),
-                                           defaults={'hand_description': hand_description})
-        # it uses the first three letters of the name as the key.
-        country, _ = Country.objects.get_or_create(ioc=country_name[:3].upper(),
-                                                   defaults={'country_name': country_name})
-
-        validated_data['hand'] = hand
-        validated_data['ioc'] = country
-
-        return super().create(validated_data)
+        # it uses the first letter of the description and the first three letters of the name as the keys,
+        # the hand and the country are read from the reference cache and created only if they are new
+        validated_data['hand'] = references.hand(hand_description)
+        validated_data['ioc'] = references.country(country_name)
+
+        # the player_id is the next id of the block reserved by this process (tennis/sequences.py),
+        # the ids start after the last player in the database (1 if no players exist)
+        def save(ids):
+            validated_data['player_id'] = ids[0]
+            return super(PlayerSerializer, self).create(validated_data)
+
+        return player_ids.save_with_ids(save)
     
     def update(self, instance, validated_data):
         # to update hand and country
@@ -58,14 +69,10 @@ class PlayerSerializer(serializers.ModelSerializer):
         country_name = validated_data.pop('country_name', None)
         # If the hand_description is provided, finds or creates the corresponding Hand instance and updates the player's hand
         if hand_description:
-            hand, _ = Hand.objects.get_or_create(hand=hand_description[:1].upper(),
-                                                 defaults={'hand_description': hand_description})
-            instance.hand = hand
+            instance.hand = references.hand(hand_description)
         # If the country_name is provided, finds or creates the corresponding Country instance and updates the player's ioc
         if country_name:
-            country, _ = Country.objects.get_or_create(ioc=country_name[:3].upper(),
-                                                       defaults={'country_name': country_name})
-            instance.ioc = country
+            instance.ioc = references.country(country_name)
         # it updates player_name and height with the new values
         instance.player_name = validated_data.get('player_name', instance.player_name)
         instance.height = validated_data.get('height', instance.height)
@@ -73,3 +80,52 @@ class PlayerSerializer(serializers.ModelSerializer):
         return instance
 
 
+# read-only serializer of the list endpoints. Instead of building a model instance and going through the fields of
+# a ModelSerializer for every row, the rows are read with values_list and converted with the map of the fields,
+# compiled once for the class: the name shown, the position of its column and, for the hand and the country, the
+# text of the key taken from the reference cache. The rows are the same as the ones of PlayerSerializer
+class RowSerializer:
+    model = None
+    # field shown: column read with values_list
+    fields = {}
+    # fields whose column is the key of a reference table (tennis/references.py): name of the model
+    labels = {}
+    # columns read but not shown, e.g. the columns of the cursor of the pages
+    extra = []
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.names = list(cls.fields)
+        cls.columns = list(cls.fields.values()) + [column for column in cls.extra if column not in cls.fields.values()]
+        cls.position = {column: index for index, column in enumerate(cls.columns)}
+
+    @classmethod
+    def values(cls, queryset):
+        return queryset.values_list(*cls.columns)
+
+    # it returns a function that reads the given columns from a row
+    @classmethod
+    def getter(cls, *columns):
+        positions = [cls.position[column] for column in columns]
+        return lambda row: tuple(row[position] for position in positions)
+
+    @classmethod
+    def serialize(cls, rows):
+        names = cls.names
+        labels = [(name, references.labels_of(model_name)) for name, model_name in cls.labels.items()]
+        result = []
+        for row in rows:
+            # the columns shown come first, zip stops at the last name
+            item = dict(zip(names, row))
+            for name, label in labels:
+                item[name] = label.get(item[name])
+            result.append(item)
+        return result
+
+
+# the players of the lists (players_by_letter, players_list), the same fields as PlayerSerializer shows
+class PlayerRowSerializer(RowSerializer):
+    model = Players
+    fields = {'player_name': 'player_name', 'height': 'height', 'hand': 'hand_id', 'ioc': 'ioc_id'}
+    labels = {'hand': 'Hand', 'ioc': 'Country'}
+    extra = ['player_id']
@@ -0,0 +1,45 @@
+'''
+Some reference: https://docs.djangoproject.com/en/4.2/topics/signals/
+Every time a row of the tennis models is saved or deleted (API, admin site, shell) the version of its table is
+changed, so the cached responses and the ETags that depend on it are not used anymore. bulk_create and update don't send these signals, the loader and the
+ingest command change the version themselves.
+A match saved one at a time gets the flags of its score and its MatchSets rows here, the loader and the ingest
+command get them from csv_parsing.matches_row and aggregates.refresh_after_load.
+A player saved or deleted is changed in the index of the player search (tennis/search.py), after a load the index
+is built again because the version of the players table changed.
+'''
+
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .aggregates import update_match_sets
+from .cache import bump_dataset_version
+from .scores import score_flags
+from .search import player_changed
+from .models import Tournament, Hand, Country, Players, Matches, MatchStats, PlayerMatch
+
+DATA_MODELS = (Tournament, Hand, Country, Players, Matches, MatchStats, PlayerMatch)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def data_changed(sender, **kwargs):
+    if sender in DATA_MODELS:
+        bump_dataset_version(sender._meta.db_table)
+
+
+@receiver(pre_save, sender=Matches)
+def match_score_flags(sender, instance, **kwargs):
+    for field, value in score_flags(instance.score, instance.best_of).items():
+        setattr(instance, field, value)
+
+@receiver(post_save, sender=Matches)
+def match_sets(sender, instance, **kwargs):
+    update_match_sets([instance.pk])
+
+@receiver(post_save, sender=Players)
+def player_saved(sender, instance, **kwargs):
+    player_changed(instance.player_id, instance.player_name)
+
+@receiver(post_delete, sender=Players)
+def player_deleted(sender, instance, **kwargs):
+    player_changed(instance.player_id)
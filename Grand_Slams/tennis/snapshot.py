@@ -0,0 +1,119 @@
+'''
+Snapshot file of the columns of the columnar engine (tennis/columnar.py), written by the export_snapshot command.
+Every worker maps the same file with mmap, so the columns are shared through the page cache of the operating system
+and a new process reads them without running the queries on the database.
+Layout of the file, all the numbers are little-endian:
+
+    8 bytes      magic 'TNSCOLS1'
+    8 bytes      length of the manifest
+    manifest     JSON: format version, creation time, versions of the tables and position of every column
+    columns      fixed-width arrays (int8/int32/int64), each one aligned to 8 bytes
+
+A column of strings is stored as a dictionary: the int64 offsets of each value in a block of UTF-8 bytes, with the
+positions of the None values in the manifest. The codes that point to the dictionaries are normal int32 columns.
+Some reference: https://docs.python.org/3/library/mmap.html
+https://numpy.org/doc/stable/reference/generated/numpy.frombuffer.html
+'''
+
+import json
+import mmap
+import os
+import struct
+from datetime import datetime, timezone
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b'TNSCOLS1'
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<8sQ')
+ALIGN = 8
+
+
+# it returns the number of bytes to add after size to reach the next multiple of ALIGN
+def padding(size):
+    return -size % ALIGN
+
+# it writes the snapshot of the numeric columns (name: array) and of the string columns (name: list of str or None).
+# The file is written next to path and then renamed, so the workers that mapped the old file keep reading it
+def write_snapshot(path, columns, strings, versions):
+    blocks = []
+    position = 0
+    manifest = {'format': FORMAT_VERSION, 'created': datetime.now(timezone.utc).isoformat(), 'versions': versions,
+                'columns': {}, 'strings': {}}
+
+    def add(data):
+        nonlocal position
+        offset = position
+        blocks.append(data)
+        blocks.append(b'\0' * padding(len(data)))
+        position += len(data) + padding(len(data))
+        return offset
+
+    for name, values in columns.items():
+        array = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<'))
+        manifest['columns'][name] = {'dtype': array.dtype.str, 'length': len(array), 'offset': add(array.tobytes())}
+    for name, values in strings.items():
+        encoded = [(value or '').encode() for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+        offsets[1:] = np.cumsum([len(value) for value in encoded])
+        manifest['strings'][name] = {
+            'length': len(encoded),
+            'nulls': [i for i, value in enumerate(values) if value is None],
+            'offsets': add(offsets.tobytes()),
+            'data': add(b''.join(encoded)),
+        }
+
+    header = json.dumps(manifest).encode()
+    header += b' ' * padding(HEADER.size + len(header))
+    temporary = f"{path}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(temporary, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(header)))
+        f.write(header)
+        for block in blocks:
+            f.write(block)
+    os.replace(temporary, path)
+    return manifest
+
+# a snapshot file mapped in memory, it raises ValueError if the file is not a snapshot of this format
+class Snapshot:
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.buffer) < HEADER.size:
+            raise ValueError(f"{path} is not a snapshot")
+        magic, length = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a snapshot")
+        self.manifest = json.loads(self.buffer[HEADER.size:HEADER.size + length])
+        if self.manifest['format'] != FORMAT_VERSION:
+            raise ValueError(f"{path}: snapshot format {self.manifest['format']}, expected {FORMAT_VERSION}")
+        # the offsets of the manifest start after it
+        self.start = HEADER.size + length
+
+    # it returns a numeric column, an array that reads the mapped file (no copy)
+    def column(self, name):
+        column = self.manifest['columns'][name]
+        return np.frombuffer(self.buffer, dtype=column['dtype'], count=column['length'],
+                             offset=self.start + column['offset'])
+
+    # it returns a column of strings as a list
+    def strings(self, name):
+        column = self.manifest['strings'][name]
+        offsets = np.frombuffer(self.buffer, dtype='<i8', count=column['length'] + 1,
+                                offset=self.start + column['offsets']).tolist()
+        data = self.start + column['data']
+        values = [self.buffer[data + offsets[i]:data + offsets[i + 1]].decode() for i in range(column['length'])]
+        for i in column['nulls']:
+            values[i] = None
+        return values
+
+    # it returns all the columns, numeric and strings, by name
+    def columns(self):
+        result = {name: self.column(name) for name in self.manifest['columns']}
+        result.update({name: self.strings(name) for name in self.manifest['strings']})
+        return result
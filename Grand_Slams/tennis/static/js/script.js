@@ -13,32 +13,67 @@ const CATEGORY_TITLES = {
 
 const ERROR_MESSAGE = "Error loading data. Please try again later.";
 
+// API endpoint of each category
+const CATEGORY_URLS = {
+  tournaments: "/api/tournaments/",
+  years: "/api/years/",
+  1: "/api/players/most-aces/",
+  2: "/api/countries/most-wins/",
+  3: "/api/performance-by-hand/",
+};
+
+// data of the categories fetched when the page is loaded, by category
+const prefetched = {};
+
+/** when the page is loaded, the data of all the categories is fetched with a single request to /api/batch/,
+    so a click on a category doesn't wait for the server. If the batch fails, every category is fetched
+    on its own when it is clicked */
+function prefetchCategories() {
+  const csrfInput = document.querySelector('input[name="csrfmiddlewaretoken"]');
+  fetch("/api/batch/", {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      "X-CSRFToken": csrfInput ? csrfInput.value : "",
+    },
+    body: JSON.stringify({ requests: CATEGORY_URLS }),
+  })
+    .then((response) => response.json())
+    .then((data) => {
+      Object.entries(data).forEach(([category, result]) => {
+        if (result.status === 200) {
+          prefetched[category] = result.body;
+        }
+      });
+    })
+    .catch((error) => {
+      console.error("Error prefetching data:", error);
+    });
+}
+
+/** a player added or deleted changes the data, the categories are fetched again when they are clicked */
+function clearPrefetched() {
+  Object.keys(prefetched).forEach((category) => delete prefetched[category]);
+}
+
+document.addEventListener("DOMContentLoaded", prefetchCategories);
+
 /** it initiates a fetch request to the API endpoint, clears the answer-container content
      fetch the data from a specified endpoint and it render the fetched data on the page */
 function fetchData(category) {
   const answerContainer = document.getElementById("answer-container");
   answerContainer.innerHTML = "";
 
+  // data already fetched by the batch request of the page load
+  if (category in prefetched) {
+    renderData(category, prefetched[category]);
+    return;
+  }
+
   // Fetch data from the API
-  let apiUrl = "";
-  switch (category) {
-    case "tournaments":
-      apiUrl = "/api/tournaments/";
-      break;
-    case "years":
-      apiUrl = "/api/years/";
-      break;
-    case 1:
-      apiUrl = "/api/players/most-aces/";
-      break;
-    case 2:
-      apiUrl = "/api/countries/most-wins/";
-      break;
-    case 3:
-      apiUrl = "/api/performance-by-hand/";
-      break;
-    default:
-      return;
+  const apiUrl = CATEGORY_URLS[category];
+  if (!apiUrl) {
+    return;
   }
 
   fetch(apiUrl)
@@ -94,29 +129,54 @@ function getCategorySpecificHtml(category, data) {
   }
 }
 
+/** the players are returned in pages: the first page replaces the list, the next ones (link "More players")
+    are added at the end of it */
 function fetchPlayersByLetter(letter) {
-  const apiUrl = `/api/players/by-letter/${letter}/`;
+  fetchPlayersPage(`/api/players/by-letter/${letter}/`, false);
+}
+
+function fetchPlayersPage(apiUrl, append) {
   fetch(apiUrl)
     .then((response) => response.json())
     .then((data) => {
       console.log("Fetched players:", data);
-      renderPlayers(data);
+      renderPlayers(data, append);
     })
     .catch((error) => {
       console.error("Error fetching players:", error);
     });
 }
 
-function renderPlayers(data) {
+function renderPlayers(data, append) {
   const answerContainer = document.getElementById("answer-container");
-  let html = "<ul>";
+  // message returned when no player starts with the letter
+  if (!data.results) {
+    answerContainer.innerHTML = `<p>${data.message}</p>`;
+    return;
+  }
+  let list = answerContainer.querySelector("ul.players-list");
+  if (!append || !list) {
+    answerContainer.innerHTML = '<ul class="players-list"></ul>';
+    list = answerContainer.querySelector("ul.players-list");
+  }
 
-  data.forEach((player) => {
+  let html = "";
+  data.results.forEach((player) => {
     html += `<li>${player.player_name}</li>`;
   });
+  list.insertAdjacentHTML("beforeend", html);
 
-  html += "</ul>";
-  answerContainer.innerHTML = html;
+  const more = answerContainer.querySelector("a.more-players");
+  if (more) {
+    more.remove();
+  }
+  if (data.next) {
+    list.insertAdjacentHTML("afterend", '<a href="#" class="more-players">More players</a>');
+    answerContainer.querySelector("a.more-players").onclick = (event) => {
+      event.preventDefault();
+      fetchPlayersPage(data.next, true);
+    };
+  }
 }
 
 /** this function displays the fetched data in a table */
@@ -184,6 +244,7 @@ function add(event) {
   })
  .then(data => {
     if (data.status === 'success') {
+      clearPrefetched();
       // Extract the player object
       const playerData = data.data.player; 
       const answerContainer = document.getElementById('answer-container');
@@ -221,6 +282,7 @@ function delete_record(event, playerId) {
   .then(response => response.json())
   .then(data => {
     if (data.status === 'success') {
+      clearPrefetched();
       // Remove the new entry created in the answer-container 
       const entry = document.querySelector(`.record-entry[data-player-id="${playerId}"]`);
       if (entry) {
@@ -1,5 +1,14 @@
+import datetime
+import io
 import json
-from django.test import TestCase
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.urls import reverse_lazy
 from rest_framework import status
@@ -7,6 +16,32 @@ from rest_framework.test import APIRequestFactory
 from rest_framework.test import APITestCase
 from .model_factories import *
 from .serializers import *
+from . import urls as tennis_urls
+from .loader import bulk_load
+from .ingest import ingest
+from .pipeline import run_pipeline
+from .aggregates import update_career_stats, refresh_after_load, rebuild_letter_counts, rebuild_head_to_head, pair_key
+from .cache import bump_dataset_version, cache_stats
+from .middleware import metrics
+from .scores import parse_score
+from .ratings import rebuild_ratings, update_ratings, INITIAL_RATING
+from . import columnar
+from .snapshot import Snapshot
+from .search import normalize, player_index
+from .sequences import IdAllocator, player_ids
+from .references import references
+from . import dashboard
+from unittest import mock
+import time
+from unittest import skipIf
+from .benchmark import (generate_dataset, dataset_size, time_endpoints, serialization_benchmark, compare_reports,
+                        failed_sections)
+from . import renderers
+from rest_framework.renderers import JSONRenderer
+from django.conf import settings
+from django.core.management import call_command
+from django.apps import apps
+from importlib import import_module
 
 '''
 Some reference: https://github.com/erkarl/django-rest-framework-oauth2-provider-example/blob/master/apps/users/tests.py
@@ -177,3 +212,1249 @@ class PlayerMatchTest(APITestCase):
         url = reverse('performance_by_hand')  
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+# csv rows used by the loader tests, one header and a few rows for each file of the data folder
+SAMPLE_CSV = {
+    'Tournament.csv': ['tourney_id,tourney_name,surface,draw_size,tourney_level,tourney_date',
+                       '2014-580,Australian Open,Hard,128,G,20140113'],
+    'Hand.csv': ['hand,hand_description', 'R,Right', 'L,Left'],
+    'Country.csv': ['ioc,country_name', 'ESP, Spain', 'SUI, Switzerland'],
+    'Players.csv': ['player_id,player_name,hand,height,ioc',
+                    '104745,Rafael Nadal,L,185,ESP',
+                    '103819,Roger Federer,R,NULL,SUI'],
+    'Matches.csv': ['match_id,tourney_id,match_num,score,best_of,round,minutes',
+                    '2014-580-1,2014-580,1,6-4 RET,5,R128,41'],
+    'Match_Stats.csv': ['match_stats_id,match_id,ace,df,svpt,1stIn,1stWon,2ndWon,SvGms,bpSaved,bpFaced',
+                        '2014-580-1-w,2014-580-1,5,1,26,16,14,6,5,0,0',
+                        '2014-580-1-l,2014-580-1,2,NULL,30,20,10,5,5,1,3'],
+    'Player_Match.csv': ['player_id,match_id,player_role,seed,entry,ranking,ranking_points,age',
+                         '104745,2014-580-1,winner,1,NULL,1,13130,28',
+                         '103819,2014-580-1,loser,NULL,WC,570,53,32'],
+}
+
+def write_sample_csv(folder, files=SAMPLE_CSV):
+    for name, lines in files.items():
+        with open(os.path.join(folder, name), 'w') as csv_file:
+            csv_file.write('\n'.join(lines) + '\n')
+
+# it changes the version of the table of a model as another process of the server does: with its own statement,
+# without the caches of this process being told
+def changed_by_another_process(model):
+    with connection.cursor() as cursor:
+        cursor.execute('UPDATE tennis_tableversion SET version = version + 1, previous_token = token, token = %s '
+                       'WHERE "table" = %s', [uuid.uuid4().hex, model._meta.db_table])
+
+
+# tests for the bulk loader
+class LoaderTest(TestCase):
+
+    def setUp(self):
+        self.data_folder = tempfile.mkdtemp()
+        write_sample_csv(self.data_folder)
+        # the hands and the countries of the previous tests were rolled back
+        references.reset()
+
+    def tearDown(self):
+        shutil.rmtree(self.data_folder)
+
+    # every file is loaded and the values are converted to the model's types
+    def test_bulk_load(self):
+        results = bulk_load(self.data_folder, chunk_size=1, stdout=io.StringIO())
+        self.assertEqual([result['rows'] for result in results], [1, 2, 2, 2, 1, 2, 2])
+        self.assertEqual(Players.objects.get(player_id=103819).height, None)
+        self.assertEqual(MatchStats.objects.get(match_stats_id='2014-580-1-w').ace, 5)
+        self.assertEqual(PlayerMatch.objects.get(player_role='winner').player_id.player_name, 'Rafael Nadal')
+        winner_stats = MatchStats.objects.get(player_role='winner')
+        self.assertEqual(winner_stats.player_match_id.player_id_id, 104745)
+        # the score is parsed when the file is loaded
+        match = Matches.objects.get(match_id='2014-580-1')
+        self.assertEqual((match.retired, match.num_sets, match.straight_sets), (True, 1, False))
+        self.assertEqual(list(MatchSets.objects.values_list('games_won', 'games_lost')), [(6, 4)])
+
+    # a second load of the same files skips every row, the rows of PlayerMatch included
+    def test_load_twice(self):
+        bulk_load(self.data_folder, stdout=io.StringIO())
+        results = bulk_load(self.data_folder, chunk_size=1, stdout=io.StringIO())
+        self.assertEqual([result['rows'] for result in results], [0] * 7)
+        self.assertEqual(PlayerMatch.objects.count(), 2)
+        call_command('load_tennis', data_folder=self.data_folder, stdout=io.StringIO())
+        self.assertEqual(PlayerMatch.objects.count(), 2)
+
+    # a row pointing to a missing foreign key stops the load and the file is rolled back
+    def test_missing_reference(self):
+        write_sample_csv(self.data_folder, {'Players.csv': ['player_id,player_name,hand,height,ioc',
+                                                            '1,Player 1,R,180,ESP',
+                                                            '2,Player 2,R,180,XXX']})
+        with self.assertRaises(ValueError):
+            bulk_load(self.data_folder, chunk_size=1, stdout=io.StringIO())
+        self.assertFalse(Players.objects.exists())
+
+    # the parallel pipeline writes the same rows, parents before children
+    def test_pipeline(self):
+        results = run_pipeline(self.data_folder, workers=2, stdout=io.StringIO())
+        order = [result['file'] for result in results]
+        self.assertLess(order.index('Players.csv'), order.index('Player_Match.csv'))
+        self.assertLess(order.index('Matches.csv'), order.index('Match_Stats.csv'))
+        self.assertEqual(PlayerMatch.objects.count(), 2)
+        self.assertEqual(MatchStats.objects.count(), 2)
+
+
+    # an ingest after a load doesn't write the rows again, only the changed ones
+    def test_ingest_after_load(self):
+        bulk_load(self.data_folder, stdout=io.StringIO())
+        write_sample_csv(self.data_folder, {'Players.csv': ['player_id,player_name,hand,height,ioc',
+                                                            '104745,Rafael Nadal,L,185,ESP',
+                                                            '103819,Roger Federer,R,185,SUI']})
+        results = {result['file']: result for result in ingest(self.data_folder, stdout=io.StringIO())}
+        self.assertEqual(sum(result['inserted'] + result['updated'] for result in results.values()), 1)
+        self.assertEqual(results['Players.csv']['updated'], 1)
+        self.assertEqual(results['Player_Match.csv']['unchanged'], 2)
+        self.assertEqual(Players.objects.get(player_id=103819).height, 185)
+        results = ingest(self.data_folder, force=True, stdout=io.StringIO())
+        self.assertEqual(sum(result['inserted'] + result['updated'] for result in results), 0)
+
+# tests for the incremental ingest
+class IngestTest(TestCase):
+
+    def setUp(self):
+        self.data_folder = tempfile.mkdtemp()
+        write_sample_csv(self.data_folder)
+        ingest(self.data_folder, stdout=io.StringIO())
+
+    def tearDown(self):
+        shutil.rmtree(self.data_folder)
+
+    # a second run with the same files doesn't parse them
+    def test_unchanged_files_are_skipped(self):
+        results = ingest(self.data_folder, stdout=io.StringIO())
+        self.assertTrue(all(result['skipped'] for result in results))
+
+    # only the changed and new rows of a changed file are written
+    def test_changed_rows_are_upserted(self):
+        write_sample_csv(self.data_folder, {'Players.csv': ['player_id,player_name,hand,height,ioc',
+                                                            '104745,Rafael Nadal,L,185,ESP',
+                                                            '103819,Roger Federer,R,185,SUI',
+                                                            '1,New Player,R,NULL,ESP']})
+        results = {result['file']: result for result in ingest(self.data_folder, stdout=io.StringIO())}
+        players = results['Players.csv']
+        self.assertEqual((players['inserted'], players['updated'], players['unchanged']), (1, 1, 1))
+        self.assertTrue(results['Matches.csv']['skipped'])
+        self.assertEqual(Players.objects.get(player_id=103819).height, 185)
+        self.assertEqual(Players.objects.count(), 3)
+        self.assertEqual(PlayerMatch.objects.count(), 2)
+
+
+# tests for the counts of players by letter
+class PlayerLetterCountTest(APITestCase):
+
+    def setUp(self):
+        self.hand = HandFactory(hand='R', hand_description='Right')
+        self.country = CountryFactory(ioc='ITA', country_name='Italy')
+        PlayersFactory(player_name='Jannik Sinner', hand=self.hand, ioc=self.country)
+        PlayersFactory(player_name='Lorenzo Musetti', hand=self.hand, ioc=self.country)
+        # as the loader does, the factories don't change the counts
+        rebuild_letter_counts()
+
+    def get_counts(self):
+        response = self.client.get(reverse('players'))
+        return {row['letter']: row['count'] for row in response.data}
+
+    # the counts are read with a single query once the table is built
+    def test_players_counts(self):
+        counts = self.get_counts()
+        self.assertEqual(len(counts), 26)
+        self.assertEqual((counts['J'], counts['L'], counts['A']), (1, 1, 0))
+        bump_dataset_version()
+        # the versions of the tables and the counts
+        with self.assertNumQueries(2):
+            self.client.get(reverse('players'))
+
+    # the counts are only read by a GET, a letter without a row counts 0
+    def test_read_only(self):
+        PlayerLetterCount.objects.filter(letter='J').delete()
+        with CaptureQueriesContext(connection) as queries:
+            counts = self.get_counts()
+        self.assertEqual((len(counts), counts['J'], counts['L']), (26, 0, 1))
+        self.assertFalse([query for query in queries.captured_queries if not query['sql'].startswith('SELECT')])
+
+    # adding, renaming and deleting players keep the counts up to date
+    def test_counts_follow_changes(self):
+        self.get_counts()
+        response = self.client.post(reverse('manage_player'), {'fullname': 'Jack Draper', 'country': 'Great Britain',
+                                                                 'height': 193, 'hand': 'Left'}, format='json')
+        player_id = response.data['data']['player']['player_id']
+        self.assertEqual(self.get_counts()['J'], 2)
+
+        self.client.patch(reverse('update_player', kwargs={'player_id': player_id}),
+                          {'player_name': 'Draper Jack'}, format='json')
+        counts = self.get_counts()
+        self.assertEqual((counts['J'], counts['D']), (1, 1))
+
+        self.client.delete(reverse('manage_player', kwargs={'player_id': player_id}))
+        self.assertEqual(self.get_counts()['D'], 0)
+
+
+# tests for the career stats table behind the aces leaderboard
+class CareerStatsTest(APITestCase):
+
+    def setUp(self):
+        self.winner = PlayersFactory(player_name='Winner')
+        self.loser = PlayersFactory(player_name='Loser')
+        self.match = MatchesFactory(match_id='2024-1-1')
+        PlayerMatchFactory(player_id=self.winner, match_id=self.match, player_role='winner')
+        PlayerMatchFactory(player_id=self.loser, match_id=self.match, player_role='loser')
+        MatchStatsFactory(match_stats_id='2024-1-1-w', match_id=self.match, ace=12, df=1, svpt=80)
+        MatchStatsFactory(match_stats_id='2024-1-1-l', match_id=self.match, ace=3, df=4, svpt=70)
+
+    # each player gets only the aces of its own stats row
+    def test_most_aces(self):
+        update_career_stats()
+        response = self.client.get(reverse('players_with_most_aces'))
+        self.assertEqual(response.data, [{'player_name': 'Winner', 'total_aces': 12},
+                                         {'player_name': 'Loser', 'total_aces': 3}])
+        stats = PlayerCareerStats.objects.get(player_id=self.loser)
+        self.assertEqual((stats.double_faults, stats.serve_points, stats.matches, stats.wins, stats.losses),
+                         (4, 70, 1, 0, 1))
+        # the stats rows are linked to the PlayerMatch row of their player
+        loser_stats = MatchStats.objects.get(match_stats_id='2024-1-1-l')
+        self.assertEqual((loser_stats.player_role, loser_stats.player_match_id.player_id), ('loser', self.loser))
+
+    # the leaderboard only reads the table, a GET doesn't build it
+    def test_read_only(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('players_with_most_aces'))
+        self.assertEqual(response.data, [])
+        self.assertFalse([query for query in queries.captured_queries if not query['sql'].startswith('SELECT')])
+
+    # the stats of the players of new matches are updated without rebuilding the table
+    def test_refresh_after_load(self):
+        update_career_stats()
+        match = MatchesFactory(match_id='2024-1-2')
+        PlayerMatchFactory(player_id=self.loser, match_id=match, player_role='winner')
+        MatchStatsFactory(match_stats_id='2024-1-2-w', match_id=match, ace=20)
+        refresh_after_load('MatchStats', [{'match_id_id': '2024-1-2'}])
+        stats = PlayerCareerStats.objects.get(player_id=self.loser)
+        self.assertEqual((stats.aces, stats.matches, stats.wins), (23, 2, 1))
+        self.assertEqual(PlayerCareerStats.objects.get(player_id=self.winner).aces, 12)
+
+
+# tests for the response cache of the analytics endpoints
+class ResponseCacheTest(APITestCase):
+
+    def setUp(self):
+        self.hand = HandFactory(hand='R', hand_description='Right')
+        self.country = CountryFactory(ioc='ESP', country_name='Spain')
+        PlayersFactory(player_name='Carlos Alcaraz', hand=self.hand, ioc=self.country)
+
+    # a repeated request is served from the cache, the only query reads the versions of the tables
+    def test_hit_without_queries(self):
+        self.client.get(reverse('tournaments'))
+        hits = cache_stats()['hits']
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('tournaments'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(cache_stats()['hits'], hits + 1)
+
+    # adding a player changes the version, so the next response is computed again
+    def test_changes_invalidate_the_cache(self):
+        version = cache_stats()['version']
+        self.assertEqual(self.client.get(reverse('players')).data[0]['count'], 0)
+        self.client.post(reverse('manage_player'), {'fullname': 'Andrey Rublev', 'country': 'Russia',
+                                                    'height': 188, 'hand': 'Right'}, format='json')
+        self.assertNotEqual(cache_stats()['version'], version)
+        self.assertEqual(self.client.get(reverse('players')).data[0]['count'], 1)
+
+    # the counters are available through the API
+    def test_cache_stats_endpoint(self):
+        response = self.client.get(reverse('response_cache_stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('hits', response.data)
+
+
+# tests for the ETag and Last-Modified headers of the analytics endpoints
+class ConditionalGetTest(APITestCase):
+
+    def setUp(self):
+        TournamentFactory(tourney_name='Wimbledon')
+
+    # a request with the ETag of the current version gets a 304, reading only the versions of the tables
+    def test_if_none_match(self):
+        response = self.client.get(reverse('tournaments'))
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('tournaments'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    # a change to a table the view reads changes the ETag, a change to another table doesn't
+    def test_etag_follows_table_versions(self):
+        etag = self.client.get(reverse('tournaments'))['ETag']
+        CountryFactory(ioc='AUS', country_name='Australia')
+        self.assertEqual(self.client.get(reverse('tournaments'), HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        TournamentFactory(tourney_name='US Open')
+        response = self.client.get(reverse('tournaments'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    # If-Modified-Since with the Last-Modified date also gets a 304
+    def test_if_modified_since(self):
+        last_modified = self.client.get(reverse('years'))['Last-Modified']
+        response = self.client.get(reverse('years'), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+# tests for the keyset pagination of the players
+class PlayersPaginationTest(APITestCase):
+
+    def setUp(self):
+        self.hand = HandFactory(hand='R', hand_description='Right')
+        self.country = CountryFactory(ioc='USA', country_name='United States')
+        for player_id, name in enumerate(['Sam Querrey', 'Steve Johnson', 'Sebastian Korda', 'Sam Querrey', 'Taylor Fritz']):
+            PlayersFactory(player_id=player_id + 1, player_name=name, hand=self.hand, ioc=self.country)
+
+    # it follows the next links until the last page
+    def read_all(self, url):
+        names = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            names += [player['player_name'] for player in response.data['results']]
+            url = response.data['next']
+        return names
+
+    # the pages of a letter have every player once, ordered by name and id
+    def test_players_by_letter_pages(self):
+        url = reverse('players_by_letter', kwargs={'letter': 's'}) + '?page_size=2'
+        self.assertEqual(self.read_all(url), ['Sam Querrey', 'Sam Querrey', 'Sebastian Korda', 'Steve Johnson'])
+
+    # the list of all the players uses the same pages
+    def test_players_list(self):
+        names = self.read_all(reverse('players_list') + '?page_size=3')
+        self.assertEqual(len(names), 5)
+        self.assertEqual(names[-1], 'Taylor Fritz')
+
+    # the names starting with a lower case letter are listed and counted with the upper case ones
+    def test_lower_case_names(self):
+        PlayersFactory(player_id=10, player_name='sam lowercase', hand=self.hand, ioc=self.country)
+        rebuild_letter_counts()
+        count = {row['letter']: row['count'] for row in self.client.get(reverse('players')).data}['S']
+        for letter in ('S', 's'):
+            names = self.read_all(reverse('players_by_letter', kwargs={'letter': letter}))
+            self.assertEqual(names, ['Sam Querrey', 'Sam Querrey', 'Sebastian Korda', 'Steve Johnson', 'sam lowercase'])
+            self.assertEqual(len(names), count)
+        self.assertEqual(self.read_all(reverse('players_by_letter', kwargs={'letter': 'sAm'})),
+                         ['Sam Querrey', 'Sam Querrey', 'sam lowercase'])
+        # the last unicode character doesn't have a next one
+        response = self.client.get(reverse('players_by_letter', kwargs={'letter': chr(sys.maxunicode)}))
+        self.assertIn('message', response.data)
+
+    # a letter without players returns the message, an invalid cursor a 400
+    def test_empty_letter_and_invalid_cursor(self):
+        response = self.client.get(reverse('players_by_letter', kwargs={'letter': 'Z'}))
+        self.assertIn('message', response.data)
+        response = self.client.get(reverse('players_list') + '?cursor=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+# tests for the index page
+class IndexViewTest(TestCase):
+
+    def setUp(self):
+        self.hand = HandFactory(hand='R', hand_description='Right')
+        self.country = CountryFactory(ioc='SRB', country_name='Serbia')
+        PlayersFactory(player_name='Novak Djokovic', hand=self.hand, ioc=self.country)
+        PlayerMatchFactory()
+        rebuild_letter_counts()
+
+    # the page needs two queries (the letters and the number of players), whatever the size of the tables
+    def test_query_budget(self):
+        PlayersFactory(player_name='1 Numbered', hand=self.hand, ioc=self.country)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('index'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('players', response.context)
+        self.assertNotIn('matches', response.context)
+        self.assertEqual(len(response.context['letters']), 26)
+        # every player is counted, also the ones whose name doesn't start with a letter
+        self.assertEqual(response.context['players_count'], 3)
+        self.assertContains(response, 'data-letter="N"')
+
+
+'''
+Some reference: https://www.sqlite.org/eqp.html
+The query plan of every query run by the GET endpoints is checked with EXPLAIN QUERY PLAN: the test fails if SQLite
+reads a table row by row (SCAN table) instead of using an index (SEARCH, or SCAN ... USING INDEX / COVERING INDEX).
+Every GET url of tennis/urls.py must be in PLAN_URLS, so a new endpoint can't skip the check.
+'''
+# url name and arguments of each GET endpoint checked
+PLAN_URLS = {
+    'index': {},
+    'tournaments': {},
+    'players': {},
+    'players_by_letter': {'letter': 'R'},
+    'players_list': {},
+    'players_search': {},
+    'years': {},
+    'players_with_most_aces': {},
+    'countries_with_most_wins': {},
+    'performance_by_hand': {},
+    'tiebreak_records': {},
+    'five_set_performance': {},
+    'elo_top': {},
+    'elo_history': {'player_id': 134770},
+    'head_to_head': {'player_a': 134770, 'player_b': 104745},
+    'response_cache_stats': {},
+    'request_metrics': {},
+    'request_metrics_prometheus': {},
+}
+# endpoints without GET requests: they write data or, like the batch, run other requests
+WRITE_URLS = {'manage_player', 'update_player', 'players_bulk', 'batch'}
+# endpoints whose queries run in other threads, with another connection: the queries of the dashboard are the ones
+# of players_with_most_aces, countries_with_most_wins and performance_by_hand
+THREADED_URLS = {'dashboard'}
+
+class QueryPlanTest(APITestCase):
+
+    def setUp(self):
+        hand = HandFactory(hand='R', hand_description='Right')
+        country = CountryFactory(ioc='NOR', country_name='Norway')
+        winner = PlayersFactory(player_id=134770, player_name='Casper Ruud', hand=hand, ioc=country)
+        loser = PlayersFactory(player_id=104745, player_name='Rafael Nadal', hand=hand, ioc=country)
+        match = MatchesFactory(match_id='2022-520-1')
+        PlayerMatchFactory(player_id=winner, match_id=match, player_role='winner')
+        PlayerMatchFactory(player_id=loser, match_id=match, player_role='loser')
+        MatchStatsFactory(match_stats_id='2022-520-1-w', match_id=match)
+        # the derived tables are built before, so only the queries of the requests are checked
+        update_career_stats()
+        rebuild_letter_counts()
+        rebuild_ratings()
+        rebuild_head_to_head()
+        # the reference tables (a few rows) are read whole, once for each version, by tennis/references.py
+        references.reset()
+        with CaptureQueriesContext(connection) as queries:
+            references.tables()
+        self.reference_queries = {query['sql'] for query in queries.captured_queries}
+
+    # it returns the lines of the plan that read a whole table without an index
+    def full_scans(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            details = [row[3] for row in cursor.fetchall()]
+        return [detail for detail in details if detail.startswith('SCAN ') and 'INDEX' not in detail]
+
+    def test_every_get_endpoint_is_checked(self):
+        names = {pattern.name for pattern in tennis_urls.urlpatterns}
+        self.assertEqual(names - WRITE_URLS - THREADED_URLS, set(PLAN_URLS))
+
+    def test_no_full_table_scans(self):
+        for name, kwargs in PLAN_URLS.items():
+            # a new version, so the responses are not read from the cache
+            bump_dataset_version()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse(name, kwargs=kwargs))
+            self.assertEqual(response.status_code, status.HTTP_200_OK, name)
+            for query in queries.captured_queries:
+                if query['sql'].startswith('SELECT') and query['sql'] not in self.reference_queries:
+                    self.assertEqual(self.full_scans(query['sql']), [], f"{name}: {query['sql']}")
+
+
+# tests for the request metrics
+class MetricsTest(APITestCase):
+
+    def setUp(self):
+        metrics.reset()
+        TournamentFactory()
+
+    # the requests are measured by url name
+    def test_metrics(self):
+        bump_dataset_version()
+        self.client.get(reverse('tournaments'))
+        self.client.get(reverse('tournaments'))
+        data = self.client.get(reverse('request_metrics')).data
+        self.assertEqual(data['tournaments']['requests'], 2)
+        # the first request runs the query, the second one is read from the cache. Both read the table versions
+        self.assertEqual(data['tournaments']['queries']['p99'], 2)
+        self.assertEqual(data['tournaments']['queries']['p50'], 1)
+        self.assertGreater(data['tournaments']['size']['p50'], 0)
+
+    def test_prometheus(self):
+        self.client.get(reverse('tournaments'))
+        response = self.client.get(reverse('request_metrics_prometheus'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('tennis_request_queries{view="tournaments",quantile="0.95"}', response.content.decode())
+
+    # a slow request is logged with its queries, in a single record
+    def test_slow_request_log(self):
+        with self.settings(TENNIS_SLOW_REQUEST_MS=0, TENNIS_SLOW_REQUEST_QUERIES=1):
+            with self.assertLogs('tennis.slow_requests', level='WARNING') as logs:
+                bump_dataset_version()
+                self.client.get(reverse('tournaments'))
+        self.assertEqual(len(logs.records), 1)
+        record = logs.records[0]
+        self.assertEqual(record.getMessage().count(' ms: '), 1)
+        self.assertEqual(len(record.queries), 2)
+        self.assertIn('tennis_tournament', ' '.join(query['sql'] for query in record.queries))
+
+
+# tests for the synthetic dataset of the benchmark
+class BenchmarkTest(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def generate(self, name, seed=0):
+        folder = os.path.join(self.folder, name)
+        generate_dataset(folder, 0.05, os.path.join(settings.BASE_DIR, 'data'), seed)
+        return folder
+
+    def read(self, folder, file_name):
+        with open(os.path.join(folder, file_name)) as f:
+            return f.read()
+
+    # the same seed gives the same files
+    def test_repeatable(self):
+        first = self.generate('first')
+        second = self.generate('second')
+        for file_name in ('Players.csv', 'Matches.csv', 'Match_Stats.csv', 'Player_Match.csv'):
+            self.assertEqual(self.read(first, file_name), self.read(second, file_name))
+        self.assertNotEqual(self.read(first, 'Matches.csv'), self.read(self.generate('other', seed=1), 'Matches.csv'))
+
+    # every match has a winner and a loser, with their stats, and every GET endpoint answers on the loaded data
+    def test_load_and_time_endpoints(self):
+        results = bulk_load(self.generate('data'), stdout=io.StringIO())
+        size = dataset_size(0.05)
+        self.assertEqual(Matches.objects.count(), size['matches'])
+        self.assertEqual(PlayerMatch.objects.filter(player_role='winner').count(), size['matches'])
+        self.assertEqual(MatchStats.objects.filter(player_match_id__isnull=True).count(), 0)
+        self.assertEqual(sum(result['skipped'] for result in results if result['file'] != 'Country.csv'), 0)
+
+        # the threads of the dashboard can't read the tables written by the transaction of the test, the sections
+        # are returned as errors (DashboardTest runs them on committed data)
+        with self.assertLogs('tennis.dashboard', 'ERROR'):
+            report = time_endpoints(repeat=1)
+        self.assertEqual(set(report), set(PLAN_URLS) | THREADED_URLS)
+        for name, result in report.items():
+            self.assertEqual(result['status'], status.HTTP_200_OK, name)
+        # the sections that failed are recorded, the 200 of the dashboard doesn't hide them
+        self.assertEqual(set(report['dashboard']['sections']), set(dashboard.SECTIONS))
+        self.assertEqual(report['dashboard']['failed_sections'], sorted(dashboard.SECTIONS))
+        self.assertEqual(failed_sections({'endpoints': report}), {'dashboard': sorted(dashboard.SECTIONS)})
+
+
+# tests for the score parser and the endpoints that read the parsed sets
+class ScoreTest(APITestCase):
+
+    def test_parse_score(self):
+        parsed = parse_score('7-6(4) 0-6 7-6(3) 6-2', '5')
+        self.assertEqual([(played['games_won'], played['games_lost'], played['tiebreak_points'], played['set_winner'])
+                          for played in parsed['sets']],
+                         [(7, 6, 4, 'winner'), (0, 6, None, 'loser'), (7, 6, 3, 'winner'), (6, 2, None, 'winner')])
+        self.assertEqual((parsed['num_sets'], parsed['retired'], parsed['straight_sets']), (4, False, False))
+        self.assertTrue(parse_score('6-4 6-4 6-4', '5')['straight_sets'])
+        # a retirement is never a straight-sets win and the set stopped is counted
+        retired = parse_score('6-4 6-3 2-1 RET', '5')
+        self.assertEqual((retired['num_sets'], retired['retired'], retired['straight_sets']), (3, True, False))
+        walkover = parse_score(' W/O', '5')
+        self.assertEqual((walkover['num_sets'], walkover['walkover'], walkover['sets']), (0, True, []))
+        self.assertEqual(parse_score(None)['num_sets'], None)
+
+    # the copy of the parser in the migration of the sets gives the same result
+    def test_migration_parser(self):
+        migration = import_module('tennis.migrations.0008_match_sets')
+        for score, best_of in [('7-6(4) 0-6 7-6(3) 6-2', '5'), ('6-4 6-3 2-1 RET', '5'), ('W/O', '3'),
+                               ('6-4 7-5', '3'), ('6-4 [10-8]', None), (None, None)]:
+            self.assertEqual(migration.parse_score(score, best_of), parse_score(score, best_of))
+
+    # a match saved one at a time gets its flags and sets, and they change with the score
+    def test_saved_match(self):
+        match = MatchesFactory(score='6-7(5) 6-4 6-4', best_of='3')
+        self.assertEqual((match.num_sets, match.straight_sets), (3, False))
+        self.assertEqual(MatchSets.objects.filter(match_id=match, tiebreak=True).count(), 1)
+        match.score = '6-4 6-4'
+        match.save()
+        self.assertTrue(Matches.objects.get(pk=match.pk).straight_sets)
+        self.assertEqual(MatchSets.objects.filter(match_id=match).count(), 2)
+
+    def test_tiebreaks_and_five_sets(self):
+        winner = PlayersFactory(player_name='Winner')
+        loser = PlayersFactory(player_name='Loser')
+        for match_id, score in (('2024-1-1', '7-6(4) 6-7(2) 7-6(8) 3-6 6-2'), ('2024-1-2', '6-4 4-6 6-3 2-6 1-0 RET')):
+            match = MatchesFactory(match_id=match_id, score=score, best_of='5')
+            PlayerMatchFactory(player_id=winner, match_id=match, player_role='winner')
+            PlayerMatchFactory(player_id=loser, match_id=match, player_role='loser')
+
+        tiebreaks = self.client.get(reverse('tiebreak_records')).data
+        self.assertEqual([(row['player_name'], row['won'], row['played']) for row in tiebreaks],
+                         [('Winner', 2, 3), ('Loser', 1, 3)])
+        # the retired match is not a five-set match played to the end
+        five_sets = self.client.get(reverse('five_set_performance')).data
+        self.assertEqual([(row['player_name'], row['wins'], row['losses']) for row in five_sets],
+                         [('Winner', 1, 0), ('Loser', 0, 1)])
+
+
+# tests for the columnar engine, it must return the same rows as the SQL queries
+@skipIf(columnar.np is None, 'NumPy is not installed')
+class ColumnarTest(APITestCase):
+
+    URLS = ['players_with_most_aces', 'countries_with_most_wins', 'performance_by_hand']
+
+    def setUp(self):
+        right = HandFactory(hand='R', hand_description='Right')
+        spain = CountryFactory(ioc='ESP', country_name='Spain')
+        # same number of wins and aces, a country without name, a player without hand and one without wins
+        players = [PlayersFactory(player_name='A', hand=right, ioc=spain),
+                   PlayersFactory(player_name='B', hand=right, ioc=CountryFactory(ioc='ITA', country_name='Italy')),
+                   PlayersFactory(player_name='C', hand=None, ioc=CountryFactory(ioc='XXX', country_name=None)),
+                   PlayersFactory(player_name='D', hand=right, ioc=CountryFactory(ioc='SUI', country_name='Switzerland'))]
+        for n, (winner, loser, aces) in enumerate([(0, 1, 5), (1, 2, 5), (2, 0, None), (0, 2, 3)]):
+            match = MatchesFactory(match_id=f"2024-1-{n}")
+            PlayerMatchFactory(player_id=players[winner], match_id=match, player_role='winner')
+            PlayerMatchFactory(player_id=players[loser], match_id=match, player_role='loser')
+            MatchStatsFactory(match_stats_id=f"2024-1-{n}-w", match_id=match, ace=aces)
+            MatchStatsFactory(match_stats_id=f"2024-1-{n}-l", match_id=match, ace=1)
+        update_career_stats()
+
+    def get_all(self):
+        bump_dataset_version()
+        return [self.client.get(reverse(name)).json() for name in self.URLS]
+
+    def test_same_results(self):
+        sql = self.get_all()
+        with self.settings(TENNIS_ANALYTICS_ENGINE='numpy'):
+            self.assertEqual(self.get_all(), sql)
+
+    # the columns are read again after a change of the data
+    def test_invalidation(self):
+        with self.settings(TENNIS_ANALYTICS_ENGINE='numpy'):
+            first = columnar.get_data()
+            self.assertIs(columnar.get_data(), first)
+            PlayersFactory(player_name='E', ioc=CountryFactory(ioc='FRA', country_name='France'))
+            self.assertIsNot(columnar.get_data(), first)
+
+    # the columns are read again after a change made by another process
+    def test_change_by_another_process(self):
+        with self.settings(TENNIS_ANALYTICS_ENGINE='numpy'):
+            self.assertEqual(self.client.get(reverse('players_with_most_aces')).json()[0]['player_name'], 'A')
+            Players.objects.filter(player_name='A').update(player_name='Renamed')
+            changed_by_another_process(Players)
+            self.assertEqual(self.client.get(reverse('players_with_most_aces')).json()[0]['player_name'], 'Renamed')
+
+
+# tests for the snapshot file of the columnar engine
+@skipIf(columnar.np is None, 'NumPy is not installed')
+class SnapshotTest(ColumnarTest):
+
+    def setUp(self):
+        super().setUp()
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'tennis.columns')
+        columnar.data = None
+
+    def tearDown(self):
+        columnar.data = None
+        shutil.rmtree(self.folder)
+
+    # the columns read back from the file are the same as the ones read from the database
+    def test_export(self):
+        columnar.export_snapshot(self.path)
+        columns = columnar.read_columns()
+        for name, values in Snapshot(self.path).columns().items():
+            self.assertEqual(list(values), list(columns[name]), name)
+
+    # a new process maps the snapshot instead of reading the tables, unless the data has changed since the export
+    def test_worker_start(self):
+        columnar.export_snapshot(self.path)
+        with self.settings(TENNIS_ANALYTICS_ENGINE='numpy', TENNIS_SNAPSHOT_PATH=self.path):
+            with self.assertNumQueries(1):
+                data = columnar.get_data()
+            self.assertFalse(data.player_ids.flags.writeable)
+            columnar.data = None
+            PlayersFactory(player_name='E', ioc=CountryFactory(ioc='FRA', country_name='France'))
+            self.assertTrue(columnar.get_data().player_ids.flags.writeable)
+
+    # a change that keeps the number of rows (a player renamed) also makes the snapshot out of date
+    def test_same_counts(self):
+        columnar.export_snapshot(self.path)
+        player = Players.objects.get(player_name='A')
+        player.player_name = 'Renamed'
+        player.save()
+        with self.settings(TENNIS_ANALYTICS_ENGINE='numpy', TENNIS_SNAPSHOT_PATH=self.path):
+            self.assertIsNone(columnar.snapshot_columns())
+            self.assertEqual(self.get_all()[0][0]['player_name'], 'Renamed')
+        # the versions of the database are changed by the writes without signals too
+        columnar.export_snapshot(self.path)
+        MatchStats.objects.filter(match_stats_id='2024-1-0-w').update(ace=50)
+        bump_dataset_version(MatchStats._meta.db_table)
+        with self.settings(TENNIS_SNAPSHOT_PATH=self.path):
+            self.assertIsNone(columnar.snapshot_columns())
+
+    def test_not_a_snapshot(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a snapshot file')
+        with self.assertRaises(ValueError):
+            Snapshot(self.path)
+
+
+# three players and the matches between them, for the tests of the tables built from the match history
+class MatchHistoryMixin:
+
+    def setUp(self):
+        self.players = [PlayersFactory(player_name=name) for name in ('A', 'B', 'C')]
+        self.clay = TournamentFactory(tourney_id='2024-520', surface='Clay', tourney_date='2024-05-27')
+
+    def add_match(self, match_id, winner, loser, tournament=None, round='R128'):
+        match = MatchesFactory(match_id=match_id, tourney_id=tournament or self.clay, round=round, score='6-4 6-4 6-4')
+        PlayerMatchFactory(player_id=self.players[winner], match_id=match, player_role='winner')
+        PlayerMatchFactory(player_id=self.players[loser], match_id=match, player_role='loser')
+        return match
+
+
+# tests for the Elo ratings
+class RatingsTest(MatchHistoryMixin, APITestCase):
+
+    def ratings(self):
+        return {(rating.player_id_id, rating.surface): (round(rating.rating, 6), rating.matches)
+                for rating in PlayerRating.objects.all()}
+
+    # the first match moves the two players by the same amount, overall and on the surface
+    def test_first_match(self):
+        self.add_match('2024-520-1', 0, 1)
+        rebuild_ratings()
+        winner = PlayerRating.objects.get(player_id=self.players[0], surface='All').rating
+        loser = PlayerRating.objects.get(player_id=self.players[1], surface='Clay').rating
+        self.assertGreater(winner, INITIAL_RATING)
+        self.assertAlmostEqual(winner - INITIAL_RATING, INITIAL_RATING - loser)
+
+    # new matches after the last one rated give the same ratings as replaying everything
+    def test_incremental(self):
+        self.add_match('2024-520-1', 0, 1)
+        self.add_match('2024-520-2', 1, 2, round='QF')
+        update_ratings()
+        grass = TournamentFactory(tourney_id='2024-540', surface='Grass', tourney_date='2024-07-01')
+        self.add_match('2024-540-1', 2, 0, tournament=grass)
+        update_ratings(['2024-540-1'])
+        incremental = self.ratings()
+        rebuild_ratings()
+        self.assertEqual(incremental, self.ratings())
+
+    # a match played before the last one rated is replayed in its place
+    def test_older_match(self):
+        self.add_match('2024-520-2', 1, 2, round='QF')
+        update_ratings()
+        self.add_match('2024-520-1', 0, 1, round='R128')
+        update_ratings(['2024-520-1'])
+        history = RatingHistory.objects.filter(player_id=self.players[1], surface='All').order_by('sequence')
+        self.assertEqual([row.match_id_id for row in history], ['2024-520-1', '2024-520-2'])
+
+    # the migration that creates the tables rates the existing matches as rebuild_ratings does
+    def test_migration_backfill(self):
+        self.add_match('2024-520-1', 0, 1)
+        self.add_match('2024-520-2', 1, 2, round='QF')
+        rebuild_ratings()
+        rebuilt = self.ratings()
+        PlayerRating.objects.all().delete()
+        RatingHistory.objects.all().delete()
+        import_module('tennis.migrations.0009_elo_ratings').backfill(apps, connection.schema_editor())
+        self.assertEqual(self.ratings(), rebuilt)
+
+    def test_endpoints(self):
+        self.add_match('2024-520-1', 0, 1)
+        self.add_match('2024-520-2', 0, 2, round='QF')
+        # a GET only reads the ratings, built by the loader and the ingest command
+        self.assertEqual(self.client.get(reverse('elo_top')).data, [])
+        rebuild_ratings()
+        bump_dataset_version()
+        top = self.client.get(reverse('elo_top'), {'surface': 'Clay', 'limit': 2}).data
+        # C lost to a stronger A than B did, so C lost fewer points
+        self.assertEqual([row['player_name'] for row in top], ['A', 'C'])
+        history = self.client.get(reverse('elo_history', kwargs={'player_id': self.players[0].player_id})).data
+        self.assertEqual([row['match_id'] for row in history['history']], ['2024-520-1', '2024-520-2'])
+        response = self.client.get(reverse('elo_history', kwargs={'player_id': 999999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('elo_top'), {'limit': 'x'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+
+# tests for the head-to-head table
+class HeadToHeadTest(MatchHistoryMixin, APITestCase):
+
+    def get(self, a, b):
+        return self.client.get(reverse('head_to_head', kwargs={'player_a': self.players[a].player_id,
+                                                               'player_b': self.players[b].player_id})).data
+
+    def test_head_to_head(self):
+        self.add_match('2024-520-1', 0, 1)
+        grass = TournamentFactory(tourney_id='2024-540', surface='Grass', tourney_date='2024-07-01')
+        self.add_match('2024-540-1', 1, 0, tournament=grass)
+        self.add_match('2024-540-2', 1, 0, tournament=grass, round='F')
+        self.add_match('2024-540-3', 2, 1, tournament=grass)
+        # a GET only reads the table, built by the loader and the ingest command
+        self.assertEqual(self.get(1, 0)['matches'], 0)
+        self.assertFalse(HeadToHead.objects.exists())
+        rebuild_head_to_head()
+        bump_dataset_version()
+        data = self.get(1, 0)
+        self.assertEqual((data['player_a']['player_name'], data['player_a']['wins'], data['player_b']['wins']),
+                         ('B', 2, 1))
+        self.assertEqual(data['surfaces'], {'Clay': 1, 'Grass': 2})
+        self.assertEqual((data['last_match'], data['last_winner']), ('2024-540-2', self.players[1].player_id))
+        # the same row in the other order
+        self.assertEqual(self.get(0, 1)['player_a']['wins'], 1)
+        # players who never met
+        self.assertEqual(self.get(0, 2)['matches'], 0)
+        response = self.client.get(reverse('head_to_head', kwargs={'player_a': 999999, 'player_b': 1}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    # the new matches of a pair are counted once, even if they are refreshed twice
+    def test_incremental(self):
+        self.add_match('2024-520-1', 0, 1)
+        rebuild_head_to_head()
+        self.add_match('2024-520-2', 1, 0, round='QF')
+        refresh_after_load('PlayerMatch', [{'match_id_id': '2024-520-2'}])
+        refresh_after_load('PlayerMatch', [{'match_id_id': '2024-520-2'}])
+        row = HeadToHead.objects.get(pk=pair_key(self.players[0].player_id, self.players[1].player_id))
+        self.assertEqual(row.player_a_wins + row.player_b_wins, 2)
+        with self.assertNumQueries(1):
+            HeadToHead.objects.select_related('player_a', 'player_b').get(pk=row.pk)
+
+    # the migration that creates the table builds the same rows as rebuild_head_to_head
+    def test_migration_backfill(self):
+        self.add_match('2024-520-1', 0, 1)
+        self.add_match('2024-520-2', 1, 0, round='QF')
+        self.add_match('2024-520-3', 2, 1, round='SF')
+        fields = ('pair', 'player_a_wins', 'player_b_wins', 'surfaces', 'last_match', 'last_date', 'last_winner')
+        rebuild_head_to_head()
+        rebuilt = list(HeadToHead.objects.order_by('pair').values(*fields))
+        HeadToHead.objects.all().delete()
+        import_module('tennis.migrations.0010_head_to_head').backfill(apps, connection.schema_editor())
+        self.assertEqual(list(HeadToHead.objects.order_by('pair').values(*fields)), rebuilt)
+
+
+# tests for the typeahead search of the players
+class PlayerSearchTest(APITestCase):
+
+    def setUp(self):
+        for name in ('Rafael Nadal', 'Gaël Monfils', 'Juan Martin del Potro', 'Rafael Matos', 'Ernests Gulbis'):
+            PlayersFactory(player_name=name)
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('players_search'), {'q': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [player['player_name'] for player in response.data]
+
+    def test_normalize(self):
+        self.assertEqual(normalize("  Gaël  MONFILS "), 'gael monfils')
+        self.assertEqual(normalize("Jo-Wilfried Tsonga"), 'jo wilfried tsonga')
+        self.assertEqual(normalize("O'Connell"), 'oconnell')
+
+    # the names that start with the query come first, then the surnames, accents and case are ignored
+    def test_search(self):
+        self.assertEqual(self.search('raf'), ['Rafael Matos', 'Rafael Nadal'])
+        self.assertEqual(self.search('GAEL'), ['Gaël Monfils'])
+        self.assertEqual(self.search('monf'), ['Gaël Monfils'])
+        self.assertEqual(self.search('nadal raf'), ['Rafael Nadal'])
+        self.assertEqual(self.search('del potro'), ['Juan Martin del Potro'])
+        self.assertEqual(self.search('ma'), ['Juan Martin del Potro', 'Rafael Matos'])
+        self.assertEqual(self.search('r', limit=1), ['Rafael Matos'])
+        self.assertEqual(self.search(''), [])
+        self.assertEqual(self.search('xyz'), [])
+
+    # a player created, renamed or deleted is changed in the index without building it again
+    def test_incremental(self):
+        self.search('raf')
+        with self.captureOnCommitCallbacks(execute=True):
+            player = PlayersFactory(player_name='Raffaele Di Rafa')
+        with self.captureOnCommitCallbacks(execute=True):
+            Players.objects.filter(player_name='Rafael Matos').delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            player.player_name = 'Rafa Dos'
+            player.save()
+        # the index is not built again, only the version of the table is read
+        with self.assertNumQueries(1):
+            names = [row['player_name'] for row in player_index.search('raf')]
+        self.assertEqual(names, ['Rafa Dos', 'Rafael Nadal'])
+
+    # a bulk load doesn't send the signals, the index is built again because the version of the table changed
+    def test_bulk_load(self):
+        self.search('raf')
+        Players.objects.bulk_create([PlayersFactory.build(player_name='Rafa Bulk', hand=HandFactory(), ioc=CountryFactory())])
+        bump_dataset_version(Players._meta.db_table)
+        self.assertEqual(self.search('rafa b'), ['Rafa Bulk'])
+
+    # a player renamed by another process is found with the new name
+    def test_change_by_another_process(self):
+        self.search('raf')
+        Players.objects.filter(player_name='Rafael Matos').update(player_name='Rafa Other')
+        changed_by_another_process(Players)
+        self.assertEqual(self.search('raf'), ['Rafa Other', 'Rafael Nadal'])
+
+
+# tests for the async dashboard. The sections run in other threads with their own connection, so the data has to be
+# committed (TransactionTestCase)
+class DashboardTest(TransactionTestCase):
+
+    def setUp(self):
+        hand = HandFactory(hand='R', hand_description='Right')
+        country = CountryFactory(ioc='ESP', country_name='Spain')
+        winner = PlayersFactory(player_name='Rafael Nadal', hand=hand, ioc=country)
+        loser = PlayersFactory(player_name='Roger Federer', hand=hand, ioc=CountryFactory(ioc='SUI', country_name='Switzerland'))
+        match = MatchesFactory()
+        PlayerMatchFactory(player_id=winner, match_id=match, player_role='winner')
+        PlayerMatchFactory(player_id=loser, match_id=match, player_role='loser')
+        bump_dataset_version()
+
+    # every section has the same rows as its own endpoint
+    def test_sections(self):
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['countries_most_wins'],
+                         {'status': 'success', 'data': self.client.get(reverse('countries_with_most_wins')).json()})
+        self.assertEqual(data['performance_by_hand']['data'], self.client.get(reverse('performance_by_hand')).json())
+        self.assertEqual(data['most_aces']['status'], 'success')
+        self.assertEqual(self.client.post(reverse('dashboard')).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    # the response has the ETag of the versions of the tables of the sections, like the other read endpoints
+    def test_conditional_get(self):
+        response = self.client.get(reverse('dashboard'))
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        bump_dataset_version(PlayerMatch._meta.db_table)
+        response = self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    # a slow section is returned as a timeout without delaying the others, and its result is cached when it ends
+    @override_settings(TENNIS_DASHBOARD_TIMEOUT=0.2)
+    def test_timeout(self):
+        def slow_hand_performance():
+            time.sleep(0.5)
+            return [{'player_id__hand__hand_description': 'Right', 'wins': 1, 'losses': 1}]
+
+        sections = {**dashboard.SECTIONS, 'performance_by_hand': (slow_hand_performance, dashboard.SECTIONS['performance_by_hand'][1])}
+        with mock.patch.dict(dashboard.SECTIONS, sections):
+            start = time.perf_counter()
+            response = self.client.get(reverse('dashboard'))
+            data = response.json()
+            self.assertLess(time.perf_counter() - start, 0.5)
+            self.assertEqual(data['performance_by_hand'], {'status': 'timeout', 'data': None})
+            self.assertNotIn('ETag', response)
+            self.assertEqual(data['countries_most_wins']['status'], 'success')
+            time.sleep(0.5)
+            data = self.client.get(reverse('dashboard')).json()
+            self.assertEqual(data['performance_by_hand']['status'], 'success')
+
+    # under ASGI the queries of the sync views and of the threads of the dashboard are measured
+    async def test_asgi_metrics(self):
+        metrics.reset()
+        response = await self.async_client.get(reverse('players_list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = await self.async_client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        summary = metrics.summary()
+        self.assertGreater(summary['players_list']['queries']['p50'], 0)
+        self.assertGreater(summary['players_list']['db_ms']['sum'], 0)
+        self.assertGreaterEqual(summary['dashboard']['queries']['p50'], len(dashboard.SECTIONS))
+
+    # an error in a section doesn't fail the others
+    def test_error(self):
+        def broken():
+            raise ValueError('broken section')
+
+        with mock.patch.dict(dashboard.SECTIONS, {'most_aces': (broken, ())}):
+            with self.assertLogs('tennis.dashboard', 'ERROR'):
+                data = self.client.get(reverse('dashboard')).json()
+        self.assertEqual(data['most_aces'], {'status': 'error', 'message': dashboard.ERROR_MESSAGE, 'data': None})
+        self.assertEqual(data['countries_most_wins']['status'], 'success')
+
+
+# tests for the batch of GET requests
+class BatchTest(APITestCase):
+
+    def setUp(self):
+        TournamentFactory(tourney_name='Wimbledon')
+        PlayersFactory(player_name='Rafael Nadal')
+
+    def post(self, requests):
+        return self.client.post(reverse('batch'), {'requests': requests}, format='json')
+
+    # every key has the status and the data of its request, the same as the request alone
+    def test_batch(self):
+        response = self.post({'years': '/api/years/', 'search': '/api/players/search/?q=nad',
+                              'metrics': '/api/_metrics/prometheus/', 'letter': '/api/players/by-letter/R/'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['years'], {'status': 200, 'body': self.client.get('/api/years/').data})
+        self.assertEqual(response.data['search']['body'][0]['player_name'], 'Rafael Nadal')
+        self.assertIn('# TYPE', response.data['metrics']['body'])
+        self.assertEqual(response.data['letter']['body']['results'][0]['player_name'], 'Rafael Nadal')
+
+    # the same request is run once, even with the parameters in another order
+    def test_deduplicate(self):
+        bump_dataset_version()
+        misses = cache_stats()['misses']
+        response = self.post({'a': '/api/elo/top/?limit=2&surface=Clay', 'b': '/api/elo/top/?surface=Clay&limit=2',
+                              'c': '/api/years/', 'd': '/api/years/'})
+        self.assertEqual(cache_stats()['misses'] - misses, 2)
+        self.assertEqual(response.data['a'], response.data['b'])
+
+    # the conditional headers of the batch are not used by its requests
+    def test_conditional_headers(self):
+        etag = self.client.get('/api/years/')['ETag']
+        response = self.client.post(reverse('batch'), {'requests': ['/api/years/']}, format='json',
+                                    HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.data['/api/years/']['status'], 200)
+        self.assertEqual(len(response.data['/api/years/']['body']), 1)
+
+    # only the GET routes of the API, and a limited number of requests
+    def test_errors(self):
+        response = self.post(['/api/unknown/', '/admin/', '/api/manage-player/1/', '/api/elo/top/?limit=x'])
+        self.assertEqual([result['status'] for result in response.data.values()], [404, 400, 405, 400])
+        self.assertEqual(self.post('/api/years/').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post([f'/api/years/?page={i}' for i in range(21)]).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+
+# tests for the creation and update of many players in one request
+class PlayersBulkTest(APITestCase):
+
+    def setUp(self):
+        self.hand = HandFactory(hand='R', hand_description='Right')
+        self.country = CountryFactory(ioc='ITA', country_name='Italy')
+        self.player = PlayersFactory(player_id=100, player_name='Jannik Sinner', hand=self.hand, ioc=self.country)
+        player_ids.reset()
+        IdSequence.objects.create(name='player_id', next_value=101)
+
+    def qualifiers(self, count):
+        return [{'player_name': f'Qualifier {i}', 'height': 180, 'hand_description': 'Right', 'country_name': 'Italy'}
+                for i in range(count)]
+
+    # the queries don't depend on the number of players
+    def test_create(self):
+        with self.assertNumQueries(14):
+            response = self.client.post(reverse('players_bulk'), self.qualifiers(128), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['status'], response.data['created']), ('success', 128))
+        self.assertEqual([result['player_id'] for result in response.data['results']], list(range(101, 229)))
+        self.assertEqual(Players.objects.filter(player_name__startswith='Qualifier', ioc='ITA').count(), 128)
+        self.assertEqual(PlayerLetterCount.objects.get(letter='Q').count, 128)
+
+    # the valid rows are saved, the others are returned with their errors
+    def test_errors_and_updates(self):
+        rows = [
+            {'player_id': 100, 'height': 191, 'country_name': 'Monaco'},
+            {'player_name': 'Flavio Cobolli', 'hand_description': 'Right'},
+            {'player_id': 999, 'height': 180},
+            {'player_name': 'Lorenzo Musetti', 'hand_description': 'Left', 'country_name': 'Italy'},
+            {'player_id': 100, 'height': 150},
+            'Matteo Berrettini',
+        ]
+        data = self.client.post(reverse('players_bulk'), rows, format='json').data
+        self.assertEqual(data['status'], 'partial')
+        self.assertEqual([result['status'] for result in data['results']],
+                         ['updated', 'error', 'error', 'created', 'error', 'error'])
+        self.assertIn('country_name', data['results'][1]['errors'])
+        self.player.refresh_from_db()
+        self.assertEqual((self.player.height, self.player.ioc_id, self.player.player_name), (191, 'MON', 'Jannik Sinner'))
+        self.assertEqual(Players.objects.get(player_name='Lorenzo Musetti').hand.hand_description, 'Left')
+
+    # only the letters of the new and renamed players change, as if the counts were built again
+    def test_letter_counts(self):
+        rebuild_letter_counts()
+        rows = [{'player_id': 100, 'player_name': 'Sinner Jannik'},
+                {'player_name': 'Flavio Cobolli', 'hand_description': 'Right', 'country_name': 'Italy'},
+                {'player_name': 'Jack Draper', 'hand_description': 'Left', 'country_name': 'Great Britain'}]
+        self.assertEqual(self.client.post(reverse('players_bulk'), rows, format='json').data['status'], 'success')
+        counts = list(PlayerLetterCount.objects.order_by('letter').values('letter', 'count'))
+        self.assertEqual({row['letter']: row['count'] for row in counts if row['count']}, {'F': 1, 'J': 1, 'S': 1})
+        rebuild_letter_counts()
+        self.assertEqual(list(PlayerLetterCount.objects.order_by('letter').values('letter', 'count')), counts)
+
+    def test_ndjson(self):
+        body = '\n'.join(json.dumps(row) for row in self.qualifiers(2)) + '\n\n'
+        response = self.client.post(reverse('players_bulk'), body, content_type='application/x-ndjson')
+        self.assertEqual(response.data['created'], 2)
+        response = self.client.post(reverse('players_bulk'), '{"player_name": ', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('players_bulk'), {'player_name': 'A'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+# tests for the allocator of the player ids
+class IdSequenceTest(APITestCase):
+
+    def setUp(self):
+        PlayersFactory(player_id=500)
+        player_ids.reset()
+
+    # the ids kept in memory belong to the rolled back database of the test
+    def tearDown(self):
+        player_ids.reset()
+
+    def allocate(self, allocator=player_ids, count=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            return list(allocator.allocate(count))
+
+    # the first block starts after the last player, the next ids come from memory
+    @override_settings(TENNIS_ID_BLOCK_SIZE=5)
+    def test_blocks(self):
+        self.assertEqual(self.allocate(), [501])
+        # only the generation of the sequence is read
+        with self.assertNumQueries(1):
+            self.assertEqual(self.allocate(count=4), [502, 503, 504, 505])
+        # a request bigger than the rest of the block gets its own block
+        self.assertEqual(self.allocate(count=7), list(range(506, 513)))
+        self.assertEqual(IdSequence.objects.get(name='player_id').next_value, 513)
+
+    # two processes reserve different blocks
+    def test_processes(self):
+        other = IdAllocator('player_id', Players, 'player_id')
+        first, second = self.allocate(), self.allocate(other)
+        self.assertEqual(second[0] - first[0], settings.TENNIS_ID_BLOCK_SIZE)
+        self.assertEqual(self.allocate(), [first[0] + 1])
+
+    # the ids of a rolled back transaction are not kept
+    def test_rollback(self):
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                player_ids.allocate()
+                raise ValueError
+        self.assertEqual(self.allocate(), [501])
+
+    # a new player doesn't read the players table, the ids loaded from files move the sequence
+    def test_manage_player_and_load(self):
+        data = {'fullname': 'Player', 'country': 'Italy', 'height': 180, 'hand': 'Right'}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('manage_player'), data, format='json')
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('manage_player'), data, format='json')
+        self.assertEqual(response.data['data']['player']['player_id'], 502)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'FROM "tennis_players"' in query['sql'] and 'ORDER BY' in query['sql']])
+        PlayersFactory(player_id=1000)
+        refresh_after_load('Players')
+        self.assertEqual(self.allocate(), [1001])
+
+
+    # the ids loaded by another process drop the block of this one
+    def test_load_in_other_process(self):
+        first = self.allocate()[0]
+        other = IdAllocator('player_id', Players, 'player_id')
+        PlayersFactory(player_id=first + 1)
+        other.sync()
+        self.assertEqual(self.allocate(), [first + settings.TENNIS_ID_BLOCK_SIZE])
+
+    # a player saved with an explicit id in the block doesn't make the next player fail
+    def test_explicit_id(self):
+        first = self.allocate()[0]
+        PlayersFactory(player_id=first + 1)
+        data = {'fullname': 'Player', 'country': 'Italy', 'height': 180, 'hand': 'Right'}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('manage_player'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # the rest of the block is dropped, the player gets the first id of a new block
+        self.assertEqual(response.data['data']['player']['player_id'], first + settings.TENNIS_ID_BLOCK_SIZE)
+        PlayersFactory(player_id=first + settings.TENNIS_ID_BLOCK_SIZE + 1)
+        rows = [{'player_name': 'Qualifier', 'height': 180, 'hand_description': 'Right', 'country_name': 'Italy'}] * 2
+        response = self.client.post(reverse('players_bulk'), rows, format='json')
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(Players.objects.filter(player_name='Qualifier').count(), 2)
+
+# tests for the cache of the hands and of the countries
+class ReferenceDataTest(APITestCase):
+
+    def setUp(self):
+        HandFactory(hand='R', hand_description='Right')
+        CountryFactory(ioc='ARG', country_name='Argentina')
+        self.player = PlayersFactory(player_name='Juan Martin del Potro', hand_id='R', ioc_id='ARG')
+        self.data = {'fullname': 'Diego Schwartzman', 'country': 'Argentina', 'height': 170, 'hand': 'Right'}
+        player_ids.reset()
+
+    def reference_queries(self, queries):
+        return [query['sql'] for query in queries.captured_queries
+                if 'FROM "tennis_hand"' in query['sql'] or 'FROM "tennis_country"' in query['sql']]
+
+    # once the tables are read, creating, updating and showing players doesn't read them
+    def test_steady_state(self):
+        self.client.post(reverse('manage_player'), self.data, format='json')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('manage_player'), {**self.data, 'fullname': 'Tomas Etcheverry'},
+                                        format='json')
+            self.client.patch(reverse('update_player', kwargs={'player_id': self.player.player_id}),
+                              {'hand_description': 'Right', 'country_name': 'Argentina'}, format='json')
+            players = self.client.get(reverse('players_by_letter', kwargs={'letter': 'J'})).data['results']
+        self.assertEqual(self.reference_queries(queries), [])
+        self.assertEqual((response.data['data']['player']['hand'], response.data['data']['player']['ioc']),
+                         ('Right', 'Argentina'))
+        self.assertEqual((players[0]['hand'], players[0]['ioc']), ('Right', 'Argentina'))
+
+    # a new country is created once and the tables are read again because their version changed
+    def test_new_row(self):
+        response = self.client.post(reverse('manage_player'), {**self.data, 'country': 'Chile'}, format='json')
+        self.assertEqual(response.data['data']['player']['ioc'], 'Chile')
+        self.assertEqual(references.get('Country', 'CHI').country_name, 'Chile')
+        Country.objects.filter(ioc='CHI').update(country_name='Chile (CHI)')
+        bump_dataset_version(Country._meta.db_table)
+        self.assertEqual(references.get('Country', 'CHI').country_name, 'Chile (CHI)')
+
+    # a country added by another process is read at the next use, the cache doesn't hide it
+    def test_change_by_another_process(self):
+        self.assertIsNone(references.get('Country', 'CHI'))
+        Country.objects.bulk_create([Country(ioc='CHI', country_name='Chile')])
+        changed_by_another_process(Country)
+        self.assertEqual(references.get('Country', 'CHI').country_name, 'Chile')
+        response = self.client.post(reverse('manage_player'), {**self.data, 'country': 'Chile'}, format='json')
+        self.assertEqual(response.data['data']['player']['ioc'], 'Chile')
+        self.assertEqual(Country.objects.filter(country_name='Chile').count(), 1)
+
+
+# tests for the values_list fast path of the player lists and the orjson renderer
+class FastPathTest(APITestCase):
+
+    def setUp(self):
+        HandFactory(hand='R', hand_description='Right')
+        CountryFactory(ioc='ARG', country_name='Argentina')
+        PlayersFactory(player_name='Juan Martin del Potro', hand_id='R', ioc_id='ARG', height=198)
+        PlayersFactory(player_name='Juan Ignacio Chela', hand_id=None, ioc_id='ARG', height=None)
+        PlayersFactory(player_name='Diego Schwartzman', hand_id='R', ioc_id='ARG', height=170)
+
+    # the rows of PlayerRowSerializer are the same as the ones of PlayerSerializer, NULL hands and heights included
+    def test_same_rows(self):
+        players = Players.objects.order_by('player_name', 'player_id')
+        rows = PlayerRowSerializer.serialize(PlayerRowSerializer.values(players))
+        self.assertEqual(rows, PlayerSerializer(players, many=True).data)
+        response = self.client.get(reverse('players_by_letter', kwargs={'letter': 'J'}), {'page_size': 1})
+        self.assertEqual(response.data['results'], PlayerSerializer(players.filter(player_name__startswith='J')[:1],
+                                                                      many=True).data)
+        following = self.client.get(response.data['next'])
+        self.assertEqual(following.data['results'][0]['player_name'], 'Juan Martin del Potro')
+
+    # orjson gives the same bytes as JSONRenderer, the indented responses are rendered by JSONRenderer
+    @skipIf(renderers.orjson is None, 'orjson is not installed')
+    def test_renderer(self):
+        data = {'results': PlayerSerializer(Players.objects.all(), many=True).data, 'next': None,
+                'text': 'línea\u2028', 'date': datetime.datetime(2024, 1, 2, 3, 4, 5, 678901), 1: 2.5}
+        self.assertEqual(renderers.FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(renderers.FastJSONRenderer().render(data, 'application/json; indent=2'),
+                         JSONRenderer().render(data, 'application/json; indent=2'))
+        self.assertEqual(self.client.get(reverse('players_list')).json()['results'][0]['ioc'], 'Argentina')
+
+    # the labels of the rows follow a country renamed by another process
+    def test_change_by_another_process(self):
+        self.assertEqual(self.client.get(reverse('players_list')).json()['results'][0]['ioc'], 'Argentina')
+        Country.objects.filter(ioc='ARG').update(country_name='Argentina (ARG)')
+        changed_by_another_process(Country)
+        self.assertEqual(self.client.get(reverse('players_list')).json()['results'][0]['ioc'], 'Argentina (ARG)')
+
+    def test_serialization_benchmark(self):
+        result = serialization_benchmark(repeat=1)
+        self.assertEqual(result['rows'], 3)
+        self.assertTrue(result['same_output'])
+        report = {'scale': 1, 'loader': {'seconds': 1}, 'endpoints': {}, 'serialization': result}
+        self.assertEqual(len(compare_reports(report, report)), 3)
@@ -1,6 +1,8 @@
 from django.urls import path
 from .views import *
 from .api import *
+from .dashboard import dashboard
+from .batch import batch
 
 # list of urls for the api
 urlpatterns = [
@@ -8,10 +10,23 @@ urlpatterns = [
     path('api/tournaments/', tournaments, name='tournaments'),
     path('api/players/', players, name='players'),
     path('api/players/by-letter/<str:letter>/', players_by_letter, name='players_by_letter'),
+    path('api/players/bulk/', players_bulk, name='players_bulk'),
+    path('api/players/search/', players_search, name='players_search'),
+    path('api/players/list/', players_list, name='players_list'),
     path('api/years/', years, name='years'),
     path('api/players/most-aces/', players_with_most_aces, name='players_with_most_aces'),
     path('api/countries/most-wins/', countries_with_most_wins, name='countries_with_most_wins'),
     path('api/performance-by-hand/', performance_by_hand, name='performance_by_hand'),
+    path('api/batch/', batch, name='batch'),
+    path('api/dashboard/', dashboard, name='dashboard'),
+    path('api/tiebreaks/', tiebreak_records, name='tiebreak_records'),
+    path('api/five-set-performance/', five_set_performance, name='five_set_performance'),
+    path('api/elo/top/', elo_top, name='elo_top'),
+    path('api/elo/players/<int:player_id>/', elo_history, name='elo_history'),
+    path('api/h2h/<int:player_a>/<int:player_b>/', head_to_head, name='head_to_head'),
+    path('api/_metrics/', request_metrics, name='request_metrics'),
+    path('api/_metrics/prometheus/', request_metrics_prometheus, name='request_metrics_prometheus'),
+    path('api/cache-stats/', response_cache_stats, name='response_cache_stats'),
     path('api/manage-player/', manage_player, name='manage_player'),
     path('api/manage-player/<int:player_id>/', manage_player, name='manage_player'),
     path('api/update-player/<int:player_id>/', update_player, name='update_player'),
@@ -1,24 +1,15 @@
 from django.shortcuts import render
-from .models import *
+from .aggregates import letter_counts
+from .models import Players
 
-# it retrieves the data from all the models and it renders them on the index.html template
+# it renders the index.html template with only the data the page shows: the letters of the grid with the number of
+# players for each letter, read with one query from the PlayerLetterCount table, and the number of players, counted
+# on the table (the names that don't start with a letter from A to Z are not in the grid). The tables are not passed
+# to the template, the statistics and the players are fetched by the page through the API when the user asks for them
 def index(request):
-    tournaments = Tournament.objects.all()
-    players = Players.objects.all()
-    matches = Matches.objects.all()
-    match_stats = MatchStats.objects.all()
-    player_matches = PlayerMatch.objects.all()
-    countries = Country.objects.all()
-    hands = Hand.objects.all()
-    
     context = {
-        'tournaments': tournaments,
-        'players': players,
-        'matches': matches,
-        'match_stats': match_stats,
-        'player_matches': player_matches,
-        'countries': countries,
-        'hands': hands
+        'letters': letter_counts(),
+        'players_count': Players.objects.count(),
     }
     
-    return render(request, 'index.html', context)
\ No newline at end of file
+    return render(request, 'index.html', context)